@@ -0,0 +1,65 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from CloudServer.database_manager import auth, database_handler, db_config
+
+# Dedicated threads for database calls made from the event loop. One per pooled connection: more threads
+# would only wait on the pool, fewer would leave connections idle.
+database_executor = ThreadPoolExecutor(max_workers=db_config.POOL_SIZE, thread_name_prefix="database")
+
+
+async def run_in_database_executor(func, *args):
+    """Runs a blocking database function on the database executor and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(database_executor, func, *args)
+
+
+async def authenticate_user(username, email, password):
+    """Authenticates the user without blocking the event loop."""
+    return await run_in_database_executor(auth.authenticate_user, username, email, password)
+
+
+async def add_request(request_id, user_email, model_name, action_type):
+    """Add a new request to the database without blocking the event loop."""
+    return await run_in_database_executor(database_handler.add_request, request_id, user_email, model_name,
+                                          action_type)
+
+
+async def update_request_status(request_id, status):
+    """Update the status of a request in the database without blocking the event loop."""
+    return await run_in_database_executor(database_handler.update_request_status, request_id, status)
+
+
+async def add_result(request_id, result, user_email):
+    """Add a new result to the database without blocking the event loop."""
+    return await run_in_database_executor(database_handler.add_result, request_id, result, user_email)
+
+
+async def get_request(request_id, user_email):
+    """Get a request from the database without blocking the event loop."""
+    return await run_in_database_executor(database_handler.get_request, request_id, user_email)
+
+
+async def get_all_requests(user_email):
+    """Get all requests of a user from the database without blocking the event loop."""
+    return await run_in_database_executor(database_handler.get_all_requests, user_email)
+
+
+async def get_result_by_request_id(request_id):
+    """Retrieve the result of a request without blocking the event loop."""
+    return await run_in_database_executor(database_handler.get_result_by_request_id, request_id)
+
+
+async def delete_request(request_id, email):
+    """Delete a request and its results without blocking the event loop."""
+    return await run_in_database_executor(database_handler.delete_request, request_id, email)
+
+
+async def add_request_images(request_id, images):
+    """Record the stored images of a request without blocking the event loop."""
+    return await run_in_database_executor(database_handler.add_request_images, request_id, images)
+
+
+async def get_request_images(request_id):
+    """Get the stored images of a request without blocking the event loop."""
+    return await run_in_database_executor(database_handler.get_request_images, request_id)
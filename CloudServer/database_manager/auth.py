@@ -2,9 +2,13 @@ import configparser
 import hashlib
 
 from CloudServer.database_manager import db_config
+from CloudServer.database_manager.credential_cache import CredentialCache
 
 CONFIG_FILE = "../../auth_config.ini"
 
+# Verified credentials, so repeated calls from the same client skip the database
+credential_cache = CredentialCache()
+
 
 # Initialize config file
 def initialize_config():
@@ -25,27 +29,25 @@ def hash_password(password):
 
 def register_user(username, email, password):
     """Registers a new user in the database."""
-    connection = db_config.create_connection()
-    if not connection:
-        print("Database connection failed.")
-        return False
-
-    hashed_password = hash_password(password)
-    query = "INSERT INTO users (username, email, password) VALUES (%s, %s, %s)"
-
-    cursor = connection.cursor()
-    try:
-        cursor.execute(query, (username, email, hashed_password))
-        connection.commit()
-        print("New user registered successfully.")
-        return True
-    except Exception as e:
-        print(f"Error registering user: {e}")
-        return False
-    finally:
-        if connection.is_connected():
+    with db_config.get_connection() as connection:
+        if not connection:
+            print("Database connection failed.")
+            return False
+
+        hashed_password = hash_password(password)
+        query = "INSERT INTO users (username, email, password) VALUES (%s, %s, %s)"
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query, (username, email, hashed_password))
+            connection.commit()
+            print("New user registered successfully.")
+            return True
+        except Exception as e:
+            print(f"Error registering user: {e}")
+            return False
+        finally:
             cursor.close()
-            connection.close()
 
 
 def authenticate_user(username, email, password):
@@ -58,41 +60,49 @@ def authenticate_user(username, email, password):
         print("Error: Configure email, username, and password.")
         return False
 
-    connection = db_config.create_connection()
-    if not connection:
-        print("Database connection failed.")
-        return False
+    if credential_cache.contains(email, password):
+        return True
 
     hashed_password = hash_password(password)
     query_check_user = "SELECT * FROM users WHERE email = %s"
-    cursor = connection.cursor()
-
-    try:
-        # Check if user exists
-        cursor.execute(query_check_user, (email,))
-        user = cursor.fetchone()
-
-        if user:
-            # User exists, check password
-            if user[3] == hashed_password:  # Assuming password_hash is the 4th column
-                print("User authenticated successfully.")
-                return True
-            else:
-                print("Wrong credentials.")
-                return False
-        else:
-            # User does not exist, register new user
-            if register_user(username, email, password):
-                print("New user authenticated successfully.")
-                return True
-            else:
-                print("Failed to register new user.")
-                return False
-
-    except Exception as e:
-        print(f"Error during authentication: {e}")
-        return False
-    finally:
-        if connection.is_connected():
+
+    # The lookup connection goes back to the pool before a new user is registered on another one
+    with db_config.get_connection() as connection:
+        if not connection:
+            print("Database connection failed.")
+            return False
+
+        cursor = connection.cursor()
+        try:
+            # Check if user exists
+            cursor.execute(query_check_user, (email,))
+            user = cursor.fetchone()
+        except Exception as e:
+            print(f"Error during authentication: {e}")
+            return False
+        finally:
             cursor.close()
-            connection.close()
+
+    if user:
+        # User exists, check password
+        if user[3] == hashed_password:  # Assuming password_hash is the 4th column
+            print("User authenticated successfully.")
+            credential_cache.add(email, password)
+            return True
+        else:
+            print("Wrong credentials.")
+            return False
+    else:
+        # User does not exist, register new user
+        if register_user(username, email, password):
+            print("New user authenticated successfully.")
+            credential_cache.add(email, password)
+            return True
+        else:
+            print("Failed to register new user.")
+            return False
+
+
+def invalidate_credentials(email=None):
+    """Drops cached credentials of a user, or of every user, so they are verified against the database again."""
+    credential_cache.invalidate(email)
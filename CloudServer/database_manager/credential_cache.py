@@ -0,0 +1,71 @@
+import hashlib
+import hmac
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class CredentialCache:
+    """
+    In-process TTL/LRU cache of credentials that were verified against the database.
+
+    Entries are keyed by an HMAC-SHA256 digest of the email and password, salted with a random per-process
+    key, so neither the password nor its database hash is kept in memory. Only successful verifications
+    are cached; a wrong password always goes to the database.
+    """
+
+    def __init__(self, ttl=300, max_entries=10000):
+        """
+        Args:
+            ttl (float): Seconds a verified credential stays valid in the cache.
+            max_entries (int): Maximum number of cached credentials; the least recently used are evicted first.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._salt = os.urandom(32)
+        self._entries = OrderedDict()  # Maps digest to (email, expiry time)
+        self._lock = Lock()
+
+    def _digest(self, email, password):
+        message = email.encode() + b"\0" + password.encode()
+        return hmac.new(self._salt, message, hashlib.sha256).digest()
+
+    def contains(self, email, password):
+        """ Return True if these credentials were verified recently, counting a hit or a miss """
+        digest = self._digest(email, password)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                return False
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return True
+
+    def add(self, email, password):
+        """ Remember credentials that were just verified against the database """
+        digest = self._digest(email, password)
+        with self._lock:
+            self._entries[digest] = (email, time.monotonic() + self.ttl)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email=None):
+        """ Forget the cached credentials of one user, or of every user if no email is given """
+        with self._lock:
+            if email is None:
+                self._entries.clear()
+                return
+            for digest in [digest for digest, entry in self._entries.items() if entry[0] == email]:
+                del self._entries[digest]
+
+    def stats(self):
+        """ Return the hit and miss counters and the number of cached credentials """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -3,59 +3,69 @@ from CloudServer.database_manager import db_config
 
 def initialize_database():
     """Create the necessary tables in the MySQL database."""
-    conn = db_config.create_connection()
-    if not conn:
-        return
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS requests (
-            request_id VARCHAR(36) PRIMARY KEY,
-            request_date DATETIME NOT NULL,
-            user_email VARCHAR(255) NOT NULL
-        )
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS results (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            request_id VARCHAR(36) NOT NULL,
-            result TEXT NOT NULL,
-            processed_date DATETIME NOT NULL,
-            user_email VARCHAR(255) NOT NULL,
-            FOREIGN KEY(request_id) REFERENCES requests(request_id) ON DELETE CASCADE
-        )
-    """)
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with db_config.get_connection() as conn:
+        if not conn:
+            return
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS requests (
+                request_id VARCHAR(36) PRIMARY KEY,
+                request_date DATETIME NOT NULL,
+                user_email VARCHAR(255) NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                request_id VARCHAR(36) NOT NULL,
+                result TEXT NOT NULL,
+                processed_date DATETIME NOT NULL,
+                user_email VARCHAR(255) NOT NULL,
+                FOREIGN KEY(request_id) REFERENCES requests(request_id) ON DELETE CASCADE
+            )
+        """)
+        # Index of the stored images of each request; the rows of a digest are the reference count of its file.
+        # Images are keyed by their position in the request, as clients may give several images the same id
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS request_images (
+                request_id VARCHAR(36) NOT NULL,
+                position INT NOT NULL,
+                image_id BIGINT NOT NULL,
+                digest CHAR(64) NOT NULL,
+                size BIGINT NOT NULL,
+                PRIMARY KEY(request_id, position),
+                INDEX(digest)
+            )
+        """)
+        conn.commit()
+        cursor.close()
 
 
 def add_request(request_id, user_email, model_name, action_type):
     """Add a new request to the database."""
-    conn = db_config.create_connection()
-    if not conn:
-        return
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO requests (request_id, user_email, model_name, action_type) 
-        VALUES (%s, %s,%s,%s)
-    """, (request_id, user_email, model_name, action_type))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with db_config.get_connection() as conn:
+        if not conn:
+            return
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO requests (request_id, user_email, model_name, action_type) 
+            VALUES (%s, %s,%s,%s)
+        """, (request_id, user_email, model_name, action_type))
+        conn.commit()
+        cursor.close()
 
 
 def update_request_status(request_id, status):
     """Update the status of a request in the database."""
-    conn = db_config.create_connection()
-    if not conn:
-        return
-    cursor = conn.cursor()
-    cursor.execute("""
-    UPDATE requests SET status = %s 
-    WHERE request_id = %s""", (status, request_id))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with db_config.get_connection() as conn:
+        if not conn:
+            return
+        cursor = conn.cursor()
+        cursor.execute("""
+        UPDATE requests SET status = %s 
+        WHERE request_id = %s""", (status, request_id))
+        conn.commit()
+        cursor.close()
 
 
 def get_request(request_id, user_email):
@@ -66,23 +76,22 @@ def get_request(request_id, user_email):
         :return: (str): The requested request.
 
     """
-    conn = None
     cursor = None
     try:
-        conn = db_config.create_connection()
-        if not conn:
-            print("Failed to establish database connection.")
-            return None
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT model_name, action_type 
-            FROM requests
-            WHERE request_id = %s AND user_email = %s""", (request_id, user_email)
-        )
-        result = cursor.fetchone()
-        print(f"Query result: {result}")
-        return result
+        with db_config.get_connection() as conn:
+            if not conn:
+                print("Failed to establish database connection.")
+                return None
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT model_name, action_type 
+                FROM requests
+                WHERE request_id = %s AND user_email = %s""", (request_id, user_email)
+            )
+            result = cursor.fetchone()
+            print(f"Query result: {result}")
+            return result
     except Exception as e:
         print(f"Error for request {request_id}: {e}")
         return None
@@ -92,29 +101,23 @@ def get_request(request_id, user_email):
                 cursor.close()
             except Exception as e:
                 print(f"Error closing cursor: {e}")
-        if conn:
-            try:
-                conn.close()
-            except Exception as e:
-                print(f"Error closing connection: {e}")
 
 
 def get_all_requests(user_email):
     """Get all requests in the database for a given user."""
-    conn = None
     cursor = None
     try:
-        conn = db_config.create_connection()
-        if not conn:
-            print("Failed to establish database connection.")
-            return []
-        cursor = conn.cursor(dictionary=True)  # Use dictionary cursor
-        cursor.execute("""
-        SELECT request_id, status, request_date FROM requests 
-        WHERE user_email = %s""", user_email)
-        results = cursor.fetchall()
-        print(f"Query results: {results}")
-        return results
+        with db_config.get_connection() as conn:
+            if not conn:
+                print("Failed to establish database connection.")
+                return []
+            cursor = conn.cursor(dictionary=True)  # Use dictionary cursor
+            cursor.execute("""
+            SELECT request_id, status, request_date FROM requests 
+            WHERE user_email = %s""", (user_email,))
+            results = cursor.fetchall()
+            print(f"Query results: {results}")
+            return results
     except Exception as e:
         print(f"Error fetching requests: {e}")
         return []
@@ -124,69 +127,223 @@ def get_all_requests(user_email):
                 cursor.close()
             except Exception as e:
                 print(f"Error closing cursor: {e}")
-        if conn:
-            try:
-                conn.close()
-            except Exception as e:
-                print(f"Error closing connection: {e}")
 
 
 
 
 def add_result(request_id, result, user_email):
     """Add a new result to the database."""
-    conn = db_config.create_connection()
-    if not conn:
-        return
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO results (request_id, result, user_email) 
-        VALUES (%s, %s, %s)
-    """, (request_id, result, user_email))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with db_config.get_connection() as conn:
+        if not conn:
+            return
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO results (request_id, result, user_email) 
+            VALUES (%s, %s, %s)
+        """, (request_id, result, user_email))
+        conn.commit()
+        cursor.close()
 
 
 def get_result_by_request_id(request_id):
     """Retrieve the result associated with a specific request ID.
         Fetches the processing result for a given request_id from the database.
     """
-    connection = db_config.create_connection()
-    if not connection:
-        raise Exception("Database connection failed.")
+    with db_config.get_connection() as connection:
+        if not connection:
+            raise Exception("Database connection failed.")
 
-    query = "SELECT result FROM results WHERE request_id = %s"
-    cursor = connection.cursor()
+        query = "SELECT result FROM results WHERE request_id = %s"
+        cursor = connection.cursor()
 
-    try:
-        cursor.execute(query, (request_id,))
-        row = cursor.fetchone()  # Fetch the first result
-        # Ensure the cursor is cleared of unread results
-        cursor.fetchall()  # Clears any remaining results, if applicable
-        return row[0] if row else None
-    except Exception as e:
-        print(f"Error retrieving result from database: {e}")
-        raise
-    finally:
-        if connection.is_connected():
+        try:
+            cursor.execute(query, (request_id,))
+            row = cursor.fetchone()  # Fetch the first result
+            # Ensure the cursor is cleared of unread results
+            cursor.fetchall()  # Clears any remaining results, if applicable
+            return row[0] if row else None
+        except Exception as e:
+            print(f"Error retrieving result from database: {e}")
+            raise
+        finally:
             cursor.close()
-            connection.close()
 
 
 def delete_request(request_id, email):
-    """Delete a request and its associated results from the database."""
-    conn = db_config.create_connection()
-    if not conn:
-        return
-    cursor = conn.cursor()
-    cursor.execute("""
-        DELETE FROM requests WHERE request_id = %s AND user_email = %s
-    """, (request_id, email))
-    cursor.execute("""
-        DELETE FROM results WHERE request_id = %s AND user_email = %s
-    """, (request_id, email))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    """
+    Delete a request, its results and its image references from the database.
+
+    Returns:
+        list: Digests of the images the request referred to, whose files can be removed once no other request
+              refers to them (see get_referenced_digests), or None if the user has no such request or no
+              connection was available.
+    """
+    with db_config.get_connection() as conn:
+        if not conn:
+            return None
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM results WHERE request_id = %s AND user_email = %s
+        """, (request_id, email))
+        cursor.execute("""
+            DELETE FROM requests WHERE request_id = %s AND user_email = %s
+        """, (request_id, email))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            cursor.close()
+            return None
+
+        cursor.execute("SELECT DISTINCT digest FROM request_images WHERE request_id = %s", (request_id,))
+        digests = [row[0] for row in cursor.fetchall()]
+        cursor.execute("DELETE FROM request_images WHERE request_id = %s", (request_id,))
+        conn.commit()
+        cursor.close()
+    return sorted(digests)
+
+
+def get_referenced_digests(digests):
+    """
+    Return the digests among digests that a request still refers to, or None if no connection was available.
+
+    The read locks the rows it finds, so it sees every committed row, including rows committed after the
+    transaction's snapshot would have been taken.
+    """
+    if not digests:
+        return set()
+    with db_config.get_connection() as conn:
+        if not conn:
+            return None
+        cursor = conn.cursor()
+        placeholders = ", ".join(["%s"] * len(digests))
+        cursor.execute(
+            f"SELECT DISTINCT digest FROM request_images WHERE digest IN ({placeholders}) LOCK IN SHARE MODE",
+            tuple(digests)
+        )
+        referenced_digests = {row[0] for row in cursor.fetchall()}
+        conn.commit()  # Releases the locks
+        cursor.close()
+    return referenced_digests
+
+
+def add_request_images(request_id, images):
+    """
+    Record the stored images of a request.
+
+    Args:
+        request_id (str): The request the images belong to.
+        images (list): (image_id, digest, size) tuples, in the order of the images in the request.
+    """
+    if not images:
+        return True
+    with db_config.get_connection() as conn:
+        if not conn:
+            return False
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO request_images (request_id, position, image_id, digest, size) 
+            VALUES (%s, %s, %s, %s, %s)
+        """, [
+            (request_id, position, image_id, digest, size)
+            for position, (image_id, digest, size) in enumerate(images)
+        ])
+        conn.commit()
+        cursor.close()
     return True
+
+
+def get_request_images(request_id):
+    """Return the (image_id, digest, size) of the stored images of a request, in the order of the request."""
+    with db_config.get_connection() as conn:
+        if not conn:
+            return []
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT image_id, digest, size FROM request_images 
+            WHERE request_id = %s ORDER BY position
+        """, (request_id,))
+        images = cursor.fetchall()
+        cursor.close()
+    return images
+
+
+def _insert_results(cursor, results):
+    # Batched into one multi-row INSERT by the connector
+    cursor.executemany("""
+        INSERT INTO results (request_id, result, user_email) 
+        VALUES (%s, %s, %s)
+    """, results)
+
+
+def _update_statuses(cursor, statuses):
+    cases = " ".join(["WHEN %s THEN %s"] * len(statuses))
+    placeholders = ", ".join(["%s"] * len(statuses))
+    params = [value for status_update in statuses for value in status_update]
+    params += [request_id for request_id, _ in statuses]
+    cursor.execute(f"""
+        UPDATE requests SET status = CASE request_id {cases} END 
+        WHERE request_id IN ({placeholders})""", params)
+
+
+def save_results_and_statuses(results, statuses):
+    """
+    Insert many results and update many request statuses, in a single transaction when possible.
+
+    Writes for requests that no longer exist, e.g. because they were deleted while their results were buffered,
+    are skipped. If the batched transaction fails, every write is retried in a transaction of its own, so one
+    bad row does not fail the others.
+
+    Args:
+        results (list): (request_id, result, user_email) tuples to insert.
+        statuses (list): (request_id, status) tuples to apply.
+
+    Returns:
+        tuple: (missing_request_ids, failed_results, failed_statuses), where missing_request_ids is the set of
+               request IDs whose writes were skipped and failed_results and failed_statuses list the writes
+               that could not be saved as (write, error message) pairs. None if no connection was available.
+    """
+    with db_config.get_connection() as conn:
+        if not conn:
+            return None
+        cursor = conn.cursor()
+        try:
+            request_ids = list({request_id for request_id, *_ in results} | {request_id for request_id, _ in statuses})
+            missing_request_ids = set()
+            if request_ids:
+                placeholders = ", ".join(["%s"] * len(request_ids))
+                cursor.execute(f"SELECT request_id FROM requests WHERE request_id IN ({placeholders})",
+                               tuple(request_ids))
+                missing_request_ids = set(request_ids) - {row[0] for row in cursor.fetchall()}
+            results = [result for result in results if result[0] not in missing_request_ids]
+            statuses = [status for status in statuses if status[0] not in missing_request_ids]
+
+            try:
+                if results:
+                    _insert_results(cursor, results)
+                if statuses:
+                    _update_statuses(cursor, statuses)
+                conn.commit()
+                return missing_request_ids, [], []
+            except Exception as e:
+                conn.rollback()
+                print(f"Batched write of {len(results)} results and {len(statuses)} status updates failed, "
+                      f"writing them one by one: {e}")
+
+            failed_results = []
+            for result in results:
+                try:
+                    _insert_results(cursor, [result])
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    failed_results.append((result, str(e)))
+            failed_statuses = []
+            for status in statuses:
+                try:
+                    _update_statuses(cursor, [status])
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    failed_statuses.append((status, str(e)))
+            return missing_request_ids, failed_results, failed_statuses
+        finally:
+            cursor.close()
@@ -1,6 +1,16 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
 import mysql.connector
 from mysql.connector import Error
 
+# Connection pool settings
+POOL_SIZE = 10  # Maximum number of open connections
+POOL_TIMEOUT = 5  # Seconds to wait for a free connection before giving up
+HEALTH_CHECK_INTERVAL = 30  # Idle seconds after which a pooled connection is pinged before reuse
+
 
 def create_connection():
     """
@@ -20,3 +30,102 @@ def create_connection():
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         return None
+
+
+class ConnectionPool:
+    """
+    A bounded pool of MySQL connections.
+
+    At most `size` connections are checked out at once; further callers wait up to `timeout` seconds.
+    Connections that sat idle for longer than `health_check_interval` are pinged before being handed out
+    and replaced if they are no longer usable.
+    """
+
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT, health_check_interval=HEALTH_CHECK_INTERVAL):
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()  # (connection, last_used), most recently used first
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        """ Check out a healthy connection, or return None if none could be obtained """
+        if not self._slots.acquire(timeout=self.timeout):
+            print("Timed out waiting for a database connection.")
+            return None
+
+        while True:
+            try:
+                connection, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_healthy(connection, last_used):
+                return connection
+            self._close(connection)
+
+        connection = create_connection()
+        if not connection:
+            self._slots.release()
+        return connection
+
+    def release(self, connection, discard=False):
+        """ Return a connection to the pool, closing it instead if it is broken or discard is set """
+        if connection is None:
+            return
+        try:
+            if discard or not connection.is_connected():
+                self._close(connection)
+                return
+            if connection.in_transaction:
+                connection.rollback()  # Never hand out a connection with uncommitted work
+            self._idle.put((connection, time.monotonic()))
+        except Error:
+            self._close(connection)
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        """ Close every idle connection """
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection)
+
+    def _is_healthy(self, connection, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+
+
+connection_pool = ConnectionPool()
+
+
+@contextmanager
+def get_connection():
+    """
+    Checks a connection out of the pool for the duration of a with block.
+    Yields None if no connection could be obtained.
+    """
+    connection = connection_pool.acquire()
+    try:
+        yield connection
+    except (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError):
+        # The connection itself is broken, so do not return it to the pool
+        connection_pool.release(connection, discard=True)
+        connection = None
+        raise
+    finally:
+        connection_pool.release(connection)
@@ -0,0 +1,132 @@
+import asyncio
+from collections import Counter
+
+from CloudServer.database_manager import database_handler
+from CloudServer.database_manager.async_database_handler import run_in_database_executor
+
+
+class ResultWriteBuffer:
+    """
+    Write-behind buffer for request results and status updates.
+
+    Writes are collected in memory and flushed as multi-row statements in a single transaction, either once
+    max_batch_size writes are pending or every flush_interval seconds. Writes for requests deleted in the
+    meantime are dropped. Writes that fail are retried with the next flush, and a request's writes are dropped
+    once they have failed in max_attempts flushes; the rest of the batch is not affected.
+    """
+
+    def __init__(self, max_batch_size=100, flush_interval=0.5, max_attempts=3):
+        """
+        Args:
+            max_batch_size (int): Number of pending writes that triggers an immediate flush.
+            flush_interval (float): Maximum seconds a write waits before being flushed.
+            max_attempts (int): Failed flushes after which the failed writes of a request are dropped.
+        """
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._results = []  # (request_id, result, user_email)
+        self._statuses = {}  # Maps request_id to its latest status
+        self._attempts = Counter()  # Maps request_id to the failed flushes of its pending writes
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    @property
+    def depth(self):
+        """ Number of writes waiting to be flushed """
+        return len(self._results) + len(self._statuses)
+
+    def start(self):
+        """ Start flushing in the background on the running event loop """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def add_result(self, request_id, result, user_email):
+        """ Queue a result insert """
+        self._results.append((request_id, result, user_email))
+        self._wake_if_full()
+
+    def update_request_status(self, request_id, status):
+        """ Queue a request status update; a later update of the same request replaces it """
+        self._statuses[request_id] = status
+        self._wake_if_full()
+
+    def _wake_if_full(self):
+        if self.depth >= self.max_batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """ Write every pending result and status update, in one transaction unless a write in it fails """
+        async with self._flush_lock:
+            if not self.depth:
+                return
+            results, statuses = self._results, self._statuses
+            self._results, self._statuses = [], {}
+
+            try:
+                outcome = await run_in_database_executor(
+                    database_handler.save_results_and_statuses, results, list(statuses.items())
+                )
+            except Exception as e:
+                outcome = None
+                error = str(e)
+            else:
+                error = "no database connection"
+
+            if outcome is None:
+                print(f"Error flushing {len(results)} results and {len(statuses)} status updates: {error}")
+                missing_request_ids = set()
+                failed_results = [(result, error) for result in results]
+                failed_statuses = [(status, error) for status in statuses.items()]
+            else:
+                missing_request_ids, failed_results, failed_statuses = outcome
+
+            for request_id in sorted(missing_request_ids):
+                print(f"Dropping the buffered writes of request {request_id}: the request no longer exists.")
+            self._retry_failed(results, statuses, failed_results, failed_statuses)
+
+    def _retry_failed(self, results, statuses, failed_results, failed_statuses):
+        """ Put failed writes back in front of anything queued meanwhile, dropping those out of attempts """
+        errors = {}  # Maps request_id to the errors of its failed writes in this flush
+        for (request_id, *_), error in failed_results + failed_statuses:
+            errors.setdefault(request_id, []).append(error)
+        for request_id in {request_id for request_id, *_ in results} | set(statuses):
+            if request_id not in errors:
+                self._attempts.pop(request_id, None)
+
+        dropped = set()
+        for request_id, request_errors in errors.items():
+            self._attempts[request_id] += 1
+            if self._attempts[request_id] >= self.max_attempts:
+                result_count = sum(1 for (failed_id, *_), _ in failed_results if failed_id == request_id)
+                status_count = len(request_errors) - result_count
+                print(f"Dropping {result_count} results and {status_count} status updates of request {request_id} "
+                      f"after {self._attempts[request_id]} failed flushes: {request_errors[-1]}")
+                del self._attempts[request_id]
+                dropped.add(request_id)
+
+        self._results = [result for result, _ in failed_results if result[0] not in dropped] + self._results
+        retried_statuses = {
+            request_id: status for (request_id, status), _ in failed_statuses if request_id not in dropped
+        }
+        # Keep status updates queued meanwhile, which are newer
+        retried_statuses.update(self._statuses)
+        self._statuses = retried_statuses
+
+    async def close(self):
+        """ Stop the background flusher and write everything still pending """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+
+import image_processing_pb2
+from CloudServer.processImages.image_payload import load_image_bytes
+
+# Blocking worker RPCs run here so the event loop keeps scheduling other images while they are in flight
+dispatch_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="dispatch")
+
+
+def get_model_workers(shared_worker_state, model_requested, action_type):
+    """
+    Returns the addresses of the workers in the pool that serves the requested model and action type.
+    """
+    return shared_worker_state.get_pool(model_requested, action_type).worker_addresses()
+
+
+def send_batch(shared_worker_state, worker_address, images, action_type):
+    """
+    Sends a slice of a request's images to a worker in a single ProcessBatch call.
+    The images are read from disk here, so only the slices in flight are held in memory.
+
+    Args:
+        images (list): (position, image metadata) pairs. The position in the request is sent as the item's
+            image_id, since the ids clients give their images need not be unique.
+
+    Returns:
+        tuple: The BatchItemResult messages, one per image that could be loaded, whose image_id is its position,
+            and the version of the model the worker served them with.
+    """
+    items = []
+    for position, image_data in images:
+        try:
+            items.append(image_processing_pb2.BatchItem(image_id=position, chunk_data=load_image_bytes(image_data)))
+        except OSError as e:
+            # A missing image is not the worker's fault; leave it out instead of failing the slice
+            print(f"Failed to load image {image_data['id']} from {image_data['path']}: {e}")
+    request = image_processing_pb2.BatchRequest(items=items, action_type=action_type)
+    try:
+        with shared_worker_state.channel_pool.lease(worker_address) as stub:
+            response = stub.ProcessBatch(request, timeout=shared_worker_state.WORKER_RPC_TIMEOUT)
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.UNAVAILABLE:
+            # The connection is broken; reconnect on the next call instead of reusing it
+            shared_worker_state.channel_pool.evict(worker_address)
+        raise
+    return response.results, response.model_version
+
+
+def split_into_slices(processed_images, worker_count, max_batch_size):
+    """
+    Splits a request's images into slices so that every worker gets a share, with at most max_batch_size
+    images per slice.
+    """
+    slice_size = max(1, min(max_batch_size, math.ceil(len(processed_images) / max(1, worker_count))))
+    return [processed_images[i:i + slice_size] for i in range(0, len(processed_images), slice_size)]
+
+
+async def dispatch_images(shared_worker_state, processed_images, model_requested, action_type):
+    """
+    Sends all images of a request to every available worker for the requested model at once.
+
+    The images are shipped in slices of at most DISPATCH_BATCH_SIZE images, one ProcessBatch call per slice.
+    Each worker has at most MAX_IN_FLIGHT_PER_WORKER slices in flight. A slice whose worker fails is retried
+    on another worker, and a failed worker receives no further slices for this request.
+
+    Args:
+        shared_worker_state (SharedWorkerState): Worker registry and dispatch settings.
+        processed_images (list): Image metadata dictionaries as queued by handle_request_async.
+        model_requested (str): Model the request was made for.
+        action_type (str): Action the workers should perform.
+
+    Returns:
+        dict: Maps the position of an image in processed_images to a (parsed worker result, model version) pair,
+            where the version is the one reported by the worker that processed the image. Images that could not
+            be processed are left out.
+    """
+    workers = get_model_workers(shared_worker_state, model_requested, action_type)
+    if not workers:
+        print(f"No workers available for model {model_requested} ({action_type}).")
+        return {}
+
+    # Every worker contributes one slot per slice it may have in flight
+    slots = asyncio.Queue()
+    for worker_address in workers:
+        for _ in range(shared_worker_state.MAX_IN_FLIGHT_PER_WORKER):
+            slots.put_nowait(worker_address)
+    failed_workers = set()
+    loop = asyncio.get_running_loop()
+    results = {}
+
+    async def process(images):
+        image_ids = [image_data["id"] for _, image_data in images]
+        attempts = 0
+        while attempts < shared_worker_state.MAX_DISPATCH_ATTEMPTS:
+            worker_address = await slots.get()
+            if worker_address is None:
+                # Every worker has failed; pass the signal on to the next waiting slice
+                slots.put_nowait(None)
+                return
+            if worker_address in failed_workers:
+                continue
+
+            attempts += 1
+            print(f"Assigning images {image_ids} to worker {worker_address}...")
+            try:
+                item_results, model_version = await loop.run_in_executor(
+                    dispatch_executor, send_batch, shared_worker_state, worker_address, images, action_type
+                )
+            except Exception as e:
+                print(f"Worker {worker_address} failed: {e}")
+                failed_workers.add(worker_address)
+                if len(failed_workers) == len(workers):
+                    slots.put_nowait(None)
+                continue
+
+            with shared_worker_state.worker_lock:
+                if worker_address in shared_worker_state.worker_registry:
+                    shared_worker_state.worker_registry[worker_address]["last_active"] = time.time()
+            slots.put_nowait(worker_address)
+            print(f"Worker {worker_address} processed images {image_ids}.")
+
+            for item in item_results:
+                position = item.image_id
+                if item.error:
+                    print(f"Worker {worker_address} failed to process image {processed_images[position]['id']}: "
+                          f"{item.error}")
+                    continue
+                try:
+                    results[position] = (json.loads(item.result), model_version)
+                except json.JSONDecodeError:
+                    print(f"Failed to parse JSON response from worker {worker_address}: {item.result}")
+            return
+
+        print(f"Giving up on images {image_ids} after {attempts} attempts.")
+
+    image_slices = split_into_slices(
+        list(enumerate(processed_images)), len(workers), shared_worker_state.DISPATCH_BATCH_SIZE
+    )
+    await asyncio.gather(*(process(images) for images in image_slices))
+
+    return results
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from CloudServer.model_manager.model_manger import get_model_path, get_quantized_path, get_torchscript_path
+
+
+def model_fingerprint(model_name, action_type, model_format):
+    """
+    Returns the modification time and size of the files a worker loads a model from in the given format, so
+    the master can tell whether a newly started worker would load the same weights as the last one. Returns
+    None for models not loaded from files the master can check, such as the torchvision weights.
+    """
+    try:
+        model_path = get_model_path(model_name)
+    except FileNotFoundError:
+        return None
+    paths = [model_path]
+    if model_format == "torchscript":
+        paths.append(get_torchscript_path(action_type, model_path))
+    elif model_format == "int8_static":
+        paths.append(get_quantized_path(action_type, model_path))
+    fingerprint = []
+    for path in paths:
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(fingerprint) or None
+
+
+class ResultCache:
+    """
+    Caches worker results by (image digest, model_name, model_format, model_version, action_type), so an image
+    that has been processed before by the same weights is answered without a worker.
+
+    Model versions are reported by the workers, which derive them from the weights they have loaded, and every
+    result is cached under the version of the worker that produced it. When the workers of a model report a
+    new version, the cached results of its older versions are dropped.
+
+    The in-memory tier is an LRU bounded by the total size of the cached results. With a persist_path, results
+    are also kept in a SQLite file that survives restarts; memory misses fall through to it and its hits are
+    promoted back into memory. The SQLite tier is only used from a thread of its own: lookups are awaited
+    through it and writes are handed to it without waiting, so it never blocks the event loop.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 ** 2, persist_path=None):
+        self.MAX_BYTES = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # Maps key to the JSON text of the result, least recently used first
+        self._versions = {}  # Maps (model_name, model_format, action_type) to the model version last reported
+        self._lock = Lock()
+        self._db = None
+        self._executor = None
+        if persist_path:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-cache")
+            self._executor.submit(self._open_db, persist_path).result()
+
+    def _open_db(self, persist_path):
+        os.makedirs(os.path.dirname(os.path.abspath(persist_path)), exist_ok=True)
+        self._db = sqlite3.connect(persist_path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                digest TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                model_format TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                action_type TEXT NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (digest, model_name, model_format, model_version, action_type)
+            )
+        """)
+        self._db.commit()
+
+    def _db_get_many(self, keys):
+        rows = []
+        for key in keys:
+            row = self._db.execute(
+                "SELECT result FROM results WHERE digest = ? AND model_name = ? AND model_format = ? "
+                "AND model_version = ? AND action_type = ?", key
+            ).fetchone()
+            rows.append(row[0] if row is not None else None)
+        return rows
+
+    def _db_put(self, key, text):
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (digest, model_name, model_format, model_version, action_type, result) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (*key, text)
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"Failed to persist a cached result: {e}")
+
+    def _db_drop(self, model_name, model_format, action_type, keep_version):
+        try:
+            self._db.execute(
+                "DELETE FROM results WHERE model_name = ? AND model_format = ? AND action_type = ? "
+                "AND model_version != ?", (model_name, model_format, action_type, keep_version)
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"Failed to drop the persisted results of {model_name}: {e}")
+
+    def set_version(self, model_name, model_format, action_type, version):
+        """ Record the version a worker of a model reported, dropping the cached results of other versions """
+        with self._lock:
+            previous = self._versions.get((model_name, model_format, action_type))
+            self._versions[(model_name, model_format, action_type)] = version
+            if previous == version:
+                return
+            if previous is not None:
+                print(f"Model {model_name} ({model_format}) changed; dropping its cached results.")
+            for key in [key for key in self._entries if key[1:3] == (model_name, model_format)
+                        and key[4] == action_type and key[3] != version]:
+                self.bytes -= len(self._entries.pop(key))
+        if self._executor is not None:
+            self._executor.submit(self._db_drop, model_name, model_format, action_type, version)
+
+    def _remember(self, key, text):
+        if len(text) > self.MAX_BYTES:
+            return
+        if key in self._entries:
+            self.bytes -= len(self._entries.pop(key))
+        self._entries[key] = text
+        self.bytes += len(text)
+        while self.bytes > self.MAX_BYTES:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    async def get_many(self, keys):
+        """ Return the cached result for every key, None for the keys without one """
+        texts = [None] * len(keys)
+        missed = []
+        with self._lock:
+            for index, key in enumerate(keys):
+                text = self._entries.get(key)
+                if text is not None:
+                    self._entries.move_to_end(key)
+                    texts[index] = text
+                else:
+                    missed.append(index)
+
+        if missed and self._executor is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                rows = await loop.run_in_executor(self._executor, self._db_get_many, [keys[i] for i in missed])
+            except sqlite3.Error as e:
+                print(f"Failed to read persisted results: {e}")
+                rows = [None] * len(missed)
+            with self._lock:
+                for index, text in zip(missed, rows):
+                    if text is not None:
+                        self._remember(keys[index], text)
+                        texts[index] = text
+
+        with self._lock:
+            found = sum(1 for text in texts if text is not None)
+            self.hits += found
+            self.misses += len(keys) - found
+        return [json.loads(text) if text is not None else None for text in texts]
+
+    async def get(self, key):
+        """ Return the cached result for key, or None """
+        return (await self.get_many([key]))[0]
+
+    def put(self, key, result):
+        """ Cache the result for key; the SQLite tier is written in the background """
+        text = json.dumps(result)
+        with self._lock:
+            self._remember(key, text)
+        if self._executor is not None:
+            self._executor.submit(self._db_put, key, text)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        """ Write out the pending SQLite writes and close the file """
+        if self._executor is not None:
+            self._executor.submit(self._db.close)
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,142 @@
+import hashlib
+import os
+import tempfile
+from collections import Counter
+from threading import Lock
+
+# Root of the content-addressed image store
+IMAGE_STORE_DIR = os.path.join(os.getcwd(), "CloudServer/images")
+
+
+class ContentStore:
+    """
+    Stores every distinct image once, under the SHA-256 digest of its content.
+
+    Images live at <root>/<digest[0:2]>/<digest[2:4]>/<digest>, so no directory holds more than a small share
+    of the files. Which requests use an image is recorded in the request_images table; an image is removed
+    once no request refers to it anymore.
+
+    Between storing an image and recording it for its request the digest is pinned, so that a concurrent
+    deletion of another request using the same image cannot remove the file in that window. Whether an image
+    is pinned and whether a request refers to it are checked together under the store lock before its file is
+    removed: a request unpins an image only once its row is committed, so one of the two always holds for an
+    image a request uses.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        self._pins = Counter()  # Maps digest to the number of stores not yet recorded in request_images
+        self._lock = Lock()
+
+    def path_for(self, digest):
+        """ Return the path an image with the given digest is stored at """
+        return os.path.join(self.root, digest[0:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path_for(digest))
+
+    def _place(self, temp_path, digest):
+        """ Move a fully written temporary file to its place in the store, unless the image is stored already """
+        path = self.path_for(digest)
+        with self._lock:
+            self._pins[digest] += 1
+            if os.path.exists(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)  # Atomic, so readers never see a partly written image
+        return path
+
+    def put_bytes(self, content):
+        """
+        Store image content and pin its digest until unpin is called.
+
+        Returns:
+            tuple: (digest, path, size) of the stored image.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            with self._lock:
+                if os.path.exists(path):
+                    self._pins[digest] += 1
+                    return digest, path, len(content)
+        temp_path = self.open_temp()
+        with open(temp_path, 'wb') as file:
+            file.write(content)
+        return digest, self._place(temp_path, digest), len(content)
+
+    def open_temp(self):
+        """ Return the path of a new temporary file in the store, for content that is written piece by piece """
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        os.close(file_descriptor)
+        return temp_path
+
+    def put_file(self, temp_path, digest):
+        """
+        Store a temporary file written by the caller, whose digest the caller computed while writing it, and pin
+        the digest until unpin is called.
+
+        Returns:
+            str: Path of the stored image.
+        """
+        return self._place(temp_path, digest)
+
+    def pin(self, digest):
+        """ Keep a stored image from being removed, e.g. while another request is being recorded for it """
+        with self._lock:
+            self._pins[digest] += 1
+
+    def unpin(self, digest):
+        """ Release the pin taken by pin, put_bytes or put_file, once the image is recorded for its request """
+        with self._lock:
+            self._pins[digest] -= 1
+            if self._pins[digest] <= 0:
+                del self._pins[digest]
+
+    def remove_unreferenced(self, digests, get_referenced_digests):
+        """
+        Remove the images among digests that are neither pinned nor referred to by a request.
+
+        Args:
+            digests (list): Digests of the candidate images.
+            get_referenced_digests (callable): Returns the digests of a list that a request refers to, reading
+                the latest committed rows, or None if it cannot tell. It runs under the store lock, which keeps
+                images from being pinned or unpinned meanwhile.
+
+        Returns:
+            list: Digests of the removed images.
+        """
+        with self._lock:
+            candidates = [digest for digest in digests if not self._pins.get(digest)]
+            if not candidates:
+                return []
+            referenced_digests = get_referenced_digests(candidates)
+            if referenced_digests is None:
+                return []
+            removed = []
+            for digest in candidates:
+                if digest in referenced_digests:
+                    continue
+                try:
+                    os.remove(self.path_for(digest))
+                except FileNotFoundError:
+                    pass
+                removed.append(digest)
+            return removed
+
+    def disk_usage(self):
+        """ Return the number of stored images and their total size in bytes """
+        count = size = 0
+        for directory, _, files in os.walk(self.root):
+            if directory.startswith(self.tmp_dir):
+                continue
+            for file_name in files:
+                count += 1
+                size += os.path.getsize(os.path.join(directory, file_name))
+        return count, size
+
+
+image_store = ContentStore(IMAGE_STORE_DIR)
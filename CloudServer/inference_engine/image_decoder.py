@@ -0,0 +1,57 @@
+import io
+
+from PIL import Image, ImageOps
+
+EXIF_ORIENTATION = 0x0112
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)  # EXIF orientations that rotate the image by 90 or 270 degrees
+
+
+def decode_image(image_data, target_size=None, mode="RGB"):
+    """
+    Decodes image bytes for a model that works at target_size, the shared decode stage of the worker handlers.
+
+    JPEGs are decoded in draft mode: libjpeg scales the image down by 1/2, 1/4 or 1/8 while decoding the DCT
+    blocks, choosing the largest reduction that keeps both sides at least as large as target_size, so a
+    12-megapixel photo for a 256x256 model is decoded at around 500x375 instead of in full. Other formats are
+    decoded in full. The image is then rotated upright according to its EXIF orientation and converted to mode.
+
+    Args:
+        image_data (bytes): The encoded image.
+        target_size (tuple): (width, height) the model resizes the image to, or None to decode in full.
+        mode (str): PIL mode of the returned image.
+
+    Returns:
+        tuple: (PIL image, (x scale, y scale)), where the scales map coordinates in the decoded image to the
+            full-resolution, upright image.
+    """
+    image = Image.open(io.BytesIO(image_data))
+    full_width, full_height = image.size
+    if target_size and image.format == "JPEG":
+        image.draft(mode, target_size)
+    image.load()
+    scale = (full_width / image.width, full_height / image.height)
+
+    if image.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS:
+        scale = (scale[1], scale[0])
+    image = ImageOps.exif_transpose(image)
+    if image.mode != mode:
+        image = image.convert(mode)
+    return image, scale
+
+
+def scale_box(box, scale):
+    """ Maps an [x1, y1, x2, y2] box in a decoded image to the full-resolution image """
+    x_scale, y_scale = scale
+    return [box[0] * x_scale, box[1] * y_scale, box[2] * x_scale, box[3] * y_scale]
+
+
+def scale_detection(detection, scale):
+    """ Maps a detection record with xmin/ymin/xmax/ymax fields in a decoded image to the full-resolution image """
+    x_scale, y_scale = scale
+    return {
+        **detection,
+        "xmin": detection["xmin"] * x_scale,
+        "ymin": detection["ymin"] * y_scale,
+        "xmax": detection["xmax"] * x_scale,
+        "ymax": detection["ymax"] * y_scale,
+    }
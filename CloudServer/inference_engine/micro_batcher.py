@@ -0,0 +1,75 @@
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+from threading import Thread
+
+
+class MicroBatcher:
+    """
+    Collects inference inputs submitted concurrently by the gRPC handler threads and runs them through the
+    model as one batch.
+
+    A batch is closed as soon as it holds max_batch_size items or max_delay_ms have passed since its first
+    item arrived, whichever comes first.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_delay_ms=10, name="micro-batcher"):
+        """
+        Args:
+            batch_fn (callable): Takes a list of inputs and returns a list of outputs in the same order.
+            max_batch_size (int): Maximum number of inputs per forward pass.
+            max_delay_ms (float): Maximum time the first input of a batch waits for more inputs.
+            name (str): Name of the background batching thread.
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000
+        self._queue = Queue()
+        self._thread = Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """ Queue an input for the next batch and return a Future for its output """
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def infer(self, item, timeout=None):
+        """ Run a single input through the model as part of a batch and wait for its output """
+        return self.submit(item).result(timeout)
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run_batch(self, batch):
+        outputs = self.batch_fn([item for item, _ in batch])
+        if len(outputs) != len(batch):
+            raise ValueError(f"Batch function returned {len(outputs)} outputs for {len(batch)} inputs")
+        for (_, future), output in zip(batch, outputs):
+            future.set_result(output)
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    continue
+                # One bad input must not fail the whole batch, so retry each input on its own
+                for entry in batch:
+                    try:
+                        self._run_batch([entry])
+                    except Exception as item_error:
+                        entry[1].set_exception(item_error)
@@ -0,0 +1,66 @@
+import copy
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+from CloudServer.model_training.data_loader import get_dataloaders
+
+
+def select_quantized_engine():
+    """
+    Selects the int8 kernel library for this CPU: x86 (fbgemm with onednn where faster) when available,
+    otherwise fbgemm, otherwise qnnpack on ARM.
+
+    Returns:
+        str: The selected engine.
+    """
+    supported = torch.backends.quantized.supported_engines
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in supported:
+            torch.backends.quantized.engine = engine
+            return engine
+    raise RuntimeError("This build of PyTorch has no int8 quantized engine.")
+
+
+def quantize_dynamic_int8(model):
+    """
+    Dynamic quantization: the weights of the Linear layers are stored in int8 and activations are quantized on
+    the fly. It needs no calibration data, but leaves convolutions in fp32, so it helps the classifier heads
+    rather than the convolutional trunk.
+    """
+    select_quantized_engine()
+    return quantize_dynamic(copy.deepcopy(model).eval(), {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static_int8(model, calibration_batches, example_input):
+    """
+    Static post-training quantization in FX graph mode: convolutions, linear layers and their activations run
+    in int8, with activation ranges observed while running the calibration batches through the model.
+
+    Args:
+        model (nn.Module): fp32 model in eval mode.
+        calibration_batches (iterable): Input tensors representative of production images.
+        example_input (torch.Tensor): Input used to trace the model's graph.
+
+    Returns:
+        torch.fx.GraphModule: The quantized model.
+    """
+    engine = select_quantized_engine()
+    prepared = prepare_fx(copy.deepcopy(model).eval(), get_default_qconfig_mapping(engine), (example_input,))
+    with torch.no_grad():
+        for images in calibration_batches:
+            prepared(images)
+    return convert_fx(prepared)
+
+
+def validation_batches(data_dir, batch_size=32, max_batches=10):
+    """
+    Yields up to max_batches image batches of the validation split of get_dataloaders, for calibration.
+    """
+    _, val_loader, _ = get_dataloaders(data_dir, batch_size)
+    for index, (images, _) in enumerate(val_loader):
+        if index >= max_batches:
+            break
+        yield images
@@ -0,0 +1,100 @@
+import json
+
+import torch
+import torchvision
+from torchvision.transforms import functional as f
+
+
+class TorchScriptYoloV5:
+    """
+    Runs a YOLOv5 detection network exported to TorchScript by export_torchscript.
+
+    The traced network only maps a fixed-size image batch to raw predictions, so the steps the hub model's
+    AutoShape wrapper normally performs are done here: letterboxing every image to img_size x img_size,
+    confidence filtering, class-aware non-maximum suppression and mapping the boxes back to the original
+    image. The detections have the same fields as the records of results.pandas().xyxy.
+    """
+
+    def __init__(self, module, names, img_size=640, conf_thres=0.25, iou_thres=0.45, max_det=1000):
+        self.module = module
+        self.names = names
+        self.img_size = img_size
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+        self.max_det = max_det
+
+    @classmethod
+    def load(cls, path):
+        """ Loads an exported network together with the class names saved alongside it """
+        extra_files = {"names.json": ""}
+        module = torch.jit.load(path, map_location="cpu", _extra_files=extra_files)
+        module.eval()
+        names = json.loads(extra_files["names.json"] or "{}")
+        return cls(module, {int(index): name for index, name in names.items()})
+
+    def letterbox(self, image):
+        """
+        Resizes a PIL image to fit img_size x img_size without distortion and pads the rest with grey.
+
+        Returns:
+            tuple: (CHW tensor, scale ratio, (left padding, top padding))
+        """
+        width, height = image.size
+        ratio = min(self.img_size / width, self.img_size / height)
+        new_width, new_height = round(width * ratio), round(height * ratio)
+        resized = f.to_tensor(image.convert("RGB").resize((new_width, new_height)))
+        left = (self.img_size - new_width) // 2
+        top = (self.img_size - new_height) // 2
+        padded = torch.full((3, self.img_size, self.img_size), 114 / 255)
+        padded[:, top:top + new_height, left:left + new_width] = resized
+        return padded, ratio, (left, top)
+
+    def detect(self, images):
+        """
+        Detects objects in a batch of PIL images.
+
+        Returns:
+            list: Detection records for each image, in input order.
+        """
+        letterboxed = [self.letterbox(image) for image in images]
+        with torch.no_grad():
+            predictions = self.module(torch.stack([tensor for tensor, _, _ in letterboxed]))
+        if isinstance(predictions, (tuple, list)):
+            predictions = predictions[0]
+
+        detections = []
+        for image, (_, ratio, (left, top)), prediction in zip(images, letterboxed, predictions):
+            detections.append(self._postprocess(prediction, image.size, ratio, left, top))
+        return detections
+
+    def _postprocess(self, prediction, image_size, ratio, left, top):
+        # prediction rows are (x, y, w, h, objectness, class scores...)
+        prediction = prediction[prediction[:, 4] > self.conf_thres]
+        if not len(prediction):
+            return []
+        scores = prediction[:, 5:] * prediction[:, 4:5]
+        confidence, classes = scores.max(dim=1)
+        keep = confidence > self.conf_thres
+        prediction, confidence, classes = prediction[keep], confidence[keep], classes[keep]
+
+        boxes = torch.empty((len(prediction), 4))
+        boxes[:, 0] = prediction[:, 0] - prediction[:, 2] / 2
+        boxes[:, 1] = prediction[:, 1] - prediction[:, 3] / 2
+        boxes[:, 2] = prediction[:, 0] + prediction[:, 2] / 2
+        boxes[:, 3] = prediction[:, 1] + prediction[:, 3] / 2
+
+        kept = torchvision.ops.batched_nms(boxes, confidence, classes, self.iou_thres)[:self.max_det]
+
+        # Undo the letterbox: remove the padding, undo the scaling and clip to the original image
+        width, height = image_size
+        boxes = boxes[kept]
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - left) / ratio).clamp(0, width)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - top) / ratio).clamp(0, height)
+
+        records = []
+        for box, score, label in zip(boxes.tolist(), confidence[kept].tolist(), classes[kept].tolist()):
+            records.append({
+                "xmin": box[0], "ymin": box[1], "xmax": box[2], "ymax": box[3],
+                "confidence": score, "class": label, "name": self.names.get(label, str(label)),
+            })
+        return records
@@ -0,0 +1,106 @@
+"""
+Exports the worker models to TorchScript artifacts in CloudServer/models, which workers load when the master
+starts them with WORKER_MODEL_FORMAT = "torchscript".
+
+Usage:
+    python -m CloudServer.model_manager.export_torchscript [--models yolov5 melanoma faster_rcnn resnet]
+"""
+import argparse
+import json
+
+import torch
+import torchvision
+
+from CloudServer.model_manager.model_manger import get_model_path, get_torchscript_path
+from CloudServer.model_training.melanoma_model import create_model
+
+YOLO_IMAGE_SIZE = 640  # Input size the YOLOv5 network is traced at; the worker letterboxes images to it
+MELANOMA_IMAGE_SIZE = 256  # Input size of the melanoma classifier, as in preprocess_image_for_melanoma
+
+
+def freeze(module):
+    """
+    Freezes a TorchScript module: parameters and attributes are inlined as constants, which lets the JIT fold
+    and fuse operations. Modules the freezer cannot handle are returned as they are.
+    """
+    try:
+        return torch.jit.freeze(module.eval())
+    except Exception as e:
+        print(f"Could not freeze {module.original_name}, saving it unfrozen: {e}")
+        return module
+
+
+def export_melanoma():
+    model_path = get_model_path("melanoma_model")
+    model = create_model(num_classes=3)
+    model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
+    model.eval()
+    example = torch.rand(1, 3, MELANOMA_IMAGE_SIZE, MELANOMA_IMAGE_SIZE)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+    output_path = get_torchscript_path("detect_melanoma", model_path)
+    torch.jit.save(freeze(traced), output_path)
+    return output_path
+
+
+def export_yolov5():
+    model_path = get_model_path("yolov5")
+    # Only the detection network is traced; AutoShape's pre- and post-processing is done by TorchScriptYoloV5
+    hub_model = torch.hub.load('ultralytics/yolov5', 'custom', path=model_path)
+    network = hub_model.model.model if hasattr(hub_model.model, "model") else hub_model.model
+    network = network.float().eval()
+    names = hub_model.names
+    if isinstance(names, (list, tuple)):
+        names = dict(enumerate(names))
+    example = torch.rand(1, 3, YOLO_IMAGE_SIZE, YOLO_IMAGE_SIZE)
+    with torch.no_grad():
+        traced = torch.jit.trace(network, example, strict=False)
+    output_path = get_torchscript_path("detect_objects", model_path)
+    torch.jit.save(freeze(traced), output_path, _extra_files={"names.json": json.dumps(names)})
+    return output_path
+
+
+def export_faster_rcnn():
+    # Faster R-CNN takes lists of differently sized images, so it is scripted rather than traced
+    model = torchvision.models.detection.fasterrcnn_resnet50_fpn(pretrained=True)
+    model.eval()
+    scripted = torch.jit.script(model)
+    output_path = get_torchscript_path("detect_defect", "faster_rcnn")
+    torch.jit.save(freeze(scripted), output_path)
+    return output_path
+
+
+def export_resnet():
+    model = torchvision.models.resnet18(pretrained=True)
+    model.eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(model, torch.rand(1, 3, 224, 224))
+    output_path = get_torchscript_path("detect_crop_disease", "resnet18")
+    torch.jit.save(freeze(traced), output_path)
+    return output_path
+
+
+EXPORTERS = {
+    "yolov5": export_yolov5,
+    "melanoma": export_melanoma,
+    "faster_rcnn": export_faster_rcnn,
+    "resnet": export_resnet,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the worker models to TorchScript.")
+    parser.add_argument("--models", nargs="+", choices=sorted(EXPORTERS), default=sorted(EXPORTERS),
+                        help="Models to export (default: all)")
+    args = parser.parse_args()
+
+    for name in args.models:
+        print(f"Exporting {name}...")
+        try:
+            print(f"Exported {name} to {EXPORTERS[name]()}")
+        except Exception as e:
+            print(f"Failed to export {name}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,3 +27,22 @@ def get_model_name(model_requested):
     else:
         return model_requested
     # continue to include all models
+
+
+def get_torchscript_path(action_type, model_path):
+    """
+    Retrieve the path of the TorchScript artifact exported for a worker's model by export_torchscript.
+    File-based models have theirs next to the .pt file; the torchvision models have theirs in MODELS_DIR.
+    """
+    if action_type == "detect_defect":
+        return os.path.join(MODELS_DIR, "faster_rcnn.torchscript")
+    if action_type == "detect_crop_disease":
+        return os.path.join(MODELS_DIR, "resnet18.torchscript")
+    return f"{os.path.splitext(model_path)[0]}.torchscript"
+
+
+def get_quantized_path(action_type, model_path):
+    """
+    Retrieve the path of the statically quantized int8 TorchScript artifact written by quantization_report.
+    """
+    return get_torchscript_path(action_type, model_path).replace(".torchscript", ".int8.torchscript")
@@ -0,0 +1,61 @@
+import hashlib
+import io
+
+import torch
+
+
+def _update_with_tensor(hasher, tensor):
+    tensor = tensor.detach().cpu()
+    if tensor.is_quantized:
+        if tensor.qscheme() in (torch.per_tensor_affine, torch.per_tensor_symmetric):
+            hasher.update(f"{tensor.q_scale()},{tensor.q_zero_point()}".encode())
+        else:
+            _update_with_tensor(hasher, tensor.q_per_channel_scales())
+            _update_with_tensor(hasher, tensor.q_per_channel_zero_points())
+        tensor = tensor.int_repr()
+    hasher.update(str(tensor.dtype).encode())
+    hasher.update(tensor.contiguous().view(-1).view(torch.uint8).numpy().tobytes())
+
+
+def _update_with_value(hasher, value):
+    if isinstance(value, torch.Tensor):
+        _update_with_tensor(hasher, value)
+    elif isinstance(value, (tuple, list)):
+        # Packed parameters of quantized layers are stored as tuples of tensors
+        for item in value:
+            _update_with_value(hasher, item)
+    else:
+        hasher.update(repr(value).encode())
+
+
+def _update_with_model(hasher, model):
+    module = getattr(model, "module", model)  # TorchScriptYoloV5 wraps the exported network
+    if isinstance(module, torch.jit.ScriptModule):
+        # Frozen modules keep their weights as graph constants rather than in their state dict
+        buffer = io.BytesIO()
+        torch.jit.save(module, buffer)
+        hasher.update(buffer.getvalue())
+        return
+    for name, value in module.state_dict().items():
+        hasher.update(name.encode())
+        _update_with_value(hasher, value)
+
+
+def models_version(models):
+    """
+    Derives a version from the weights of the models a worker has loaded, as returned by worker.load_models.
+
+    The version is read from the loaded models rather than from the files they came from, so it changes
+    whenever the weights a worker serves change, whatever their source: a replaced .pt file, new torchvision
+    or hub weights, or a TorchScript or quantized artifact. It takes a few hundred milliseconds for the
+    larger models, so the fork server computes it once per model for all the workers it forks; a worker
+    started as a process of its own computes it when it starts.
+
+    Returns:
+        str: Hex digest identifying the weights.
+    """
+    hasher = hashlib.sha256()
+    for name in sorted(models):
+        hasher.update(name.encode())
+        _update_with_model(hasher, models[name])
+    return hasher.hexdigest()[:32]
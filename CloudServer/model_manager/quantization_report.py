@@ -0,0 +1,126 @@
+"""
+Compares int8 quantized variants of the melanoma DenseNet121 and the crop disease ResNet18 with their fp32
+models, so the inference mode can be chosen per model with SharedWorkerState.MODEL_FORMATS.
+
+For every model and mode the report gives the top-1 accuracy on the test split (melanoma only; the ResNet18
+is an ImageNet classifier without matching labels), the top-1 agreement with the fp32 model and the
+throughput at batch sizes 1 and 8. With --save the statically quantized models are written next to the
+TorchScript artifacts, where workers started with the "int8_static" format load them.
+
+Usage:
+    python -m CloudServer.model_manager.quantization_report --data_dir CloudServer/dataset/skin-lesions
+"""
+import argparse
+import json
+import os
+import time
+
+import torch
+import torchvision
+
+from CloudServer.inference_engine.quantization import quantize_dynamic_int8, quantize_static_int8, \
+    validation_batches
+from CloudServer.model_manager.model_manger import get_model_path, get_quantized_path
+from CloudServer.model_training.data_loader import get_dataloaders
+from CloudServer.model_training.melanoma_model import create_model
+
+IMAGE_SIZE = 256  # Size the data loaders resize images to
+
+
+def load_fp32_models():
+    melanoma_model = create_model(num_classes=3)
+    melanoma_model.load_state_dict(torch.load(get_model_path("melanoma_model"), map_location=torch.device('cpu')))
+    resnet = torchvision.models.resnet18(pretrained=True)
+    return {
+        "melanoma": (melanoma_model.eval(), "detect_melanoma", get_model_path("melanoma_model")),
+        "resnet": (resnet.eval(), "detect_crop_disease", "resnet18"),
+    }
+
+
+def evaluate(model, reference, test_loader, check_labels):
+    """
+    Returns:
+        tuple: (accuracy, agreement) in percent, accuracy None if check_labels is False.
+    """
+    correct = agreed = total = 0
+    with torch.no_grad():
+        for images, labels in test_loader:
+            predicted = model(images).argmax(dim=1)
+            agreed += int((predicted == reference(images).argmax(dim=1)).sum())
+            correct += int((predicted == labels).sum())
+            total += labels.size(0)
+    accuracy = correct / total * 100 if check_labels else None
+    return accuracy, agreed / total * 100
+
+
+def throughput(model, batch_size, iterations=20, warmup=3):
+    """ Returns images per second for random inputs of the given batch size """
+    images = torch.rand(batch_size, 3, IMAGE_SIZE, IMAGE_SIZE)
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(images)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            model(images)
+    return batch_size * iterations / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the accuracy and speed of int8 quantized worker models.")
+    parser.add_argument("--data_dir", type=str, default=os.path.join(os.getcwd(), "CloudServer/dataset/skin-lesions"),
+                        help="Dataset with train/valid/test splits, used for calibration and evaluation")
+    parser.add_argument("--batch_size", type=int, default=32, help="Batch size for calibration and evaluation")
+    parser.add_argument("--calibration_batches", type=int, default=10, help="Validation batches used to calibrate")
+    parser.add_argument("--save", action="store_true", help="Save the statically quantized models for the workers")
+    parser.add_argument("--output", type=str, help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    _, _, test_loader = get_dataloaders(args.data_dir, args.batch_size)
+    example_input = torch.rand(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+    report = []
+
+    for name, (fp32_model, action_type, model_path) in load_fp32_models().items():
+        print(f"Quantizing {name}...")
+        variants = {
+            "fp32": fp32_model,
+            "int8_dynamic": quantize_dynamic_int8(fp32_model),
+            "int8_static": quantize_static_int8(
+                fp32_model, validation_batches(args.data_dir, args.batch_size, args.calibration_batches),
+                example_input
+            ),
+        }
+
+        for mode, model in variants.items():
+            accuracy, agreement = evaluate(model, fp32_model, test_loader, check_labels=name == "melanoma")
+            report.append({
+                "model": name,
+                "mode": mode,
+                "accuracy": accuracy,
+                "agreement_with_fp32": agreement,
+                "images_per_second_batch_1": throughput(model, 1),
+                "images_per_second_batch_8": throughput(model, 8),
+            })
+
+        if args.save:
+            quantized_path = get_quantized_path(action_type, model_path)
+            with torch.no_grad():
+                torch.jit.save(torch.jit.freeze(torch.jit.trace(variants["int8_static"], example_input)), quantized_path)
+            print(f"Saved the int8 {name} model to {quantized_path}")
+
+    baseline = {row["model"]: row for row in report if row["mode"] == "fp32"}
+    print(f"{'model':<10}{'mode':<14}{'accuracy':>10}{'delta':>8}{'agreement':>11}{'img/s b1':>10}{'img/s b8':>10}{'speedup':>9}")
+    for row in report:
+        fp32 = baseline[row["model"]]
+        delta = "" if row["accuracy"] is None else f"{row['accuracy'] - fp32['accuracy']:+.2f}"
+        accuracy = "-" if row["accuracy"] is None else f"{row['accuracy']:.2f}"
+        speedup = row["images_per_second_batch_8"] / fp32["images_per_second_batch_8"]
+        print(f"{row['model']:<10}{row['mode']:<14}{accuracy:>10}{delta:>8}{row['agreement_with_fp32']:>10.2f}%"
+              f"{row['images_per_second_batch_1']:>10.1f}{row['images_per_second_batch_8']:>10.1f}{speedup:>8.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,95 +1,395 @@
 import os
 import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from uuid import uuid4
 
+import grpc
 
 import image_processing_pb2
-from CloudServer.database_manager import database_handler
-from CloudServer.remote_object_handler.remote_object_handler import download_image_async
+from CloudServer.database_manager import async_database_handler, database_handler
+from CloudServer.image_store.content_store import image_store
+from CloudServer.processImages.image_payload import image_reference
+from CloudServer.remote_object_handler.remote_object_handler import fetch_image_async
+from CloudServer.state_manager.admission_control import AdmissionRejected
 
-# Define the directory for saving images
-IMAGE_STORAGE_DIR = os.path.join(os.getcwd(), "CloudServer/images")
+# Image files are hashed and written on these threads, so large images do not stall the other calls on the
+# event loop
+storage_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="image-store")
 
 
-async def handle_image_download(images, request_id):
+async def run_in_storage_executor(func, *args):
+    """Runs a blocking image store function on the storage executor and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(storage_executor, func, *args)
+
+
+async def save_image_async(image):
+    """Stores the byte data of a local image in the image store and returns its digest, path and size."""
+    return await run_in_storage_executor(image_store.put_bytes, image.image_data)
+
+
+async def download_to_store_async(image_url, max_bytes=None, reserve_bytes=None):
+    """Downloads a remote image into the image store and returns its digest, path and size."""
+    content = await fetch_image_async(image_url, max_bytes, reserve_bytes)
+    return await run_in_storage_executor(image_store.put_bytes, content)
+
+
+async def remove_unreferenced_images(digests):
+    """Removes the stored images among digests that no request refers to anymore and that are not pinned."""
+    return await run_in_storage_executor(
+        image_store.remove_unreferenced, sorted(set(digests)), database_handler.get_referenced_digests
+    )
+
+
+async def release_stored_images(digests, recorded):
+    """Releases the pins a request holds on its stored images.
+
+    Images that could not be recorded for the request are removed unless another request refers to them, so
+    a request that fails before it is recorded leaves no files behind.
+    """
+    for digest in digests:
+        image_store.unpin(digest)
+    if not recorded and digests:
+        try:
+            await remove_unreferenced_images(digests)
+        except Exception as e:
+            print(f"Failed to remove {len(digests)} unrecorded images: {e}")
+
+
+async def abort_rejected(context, rejection):
+    """Ends the call with RESOURCE_EXHAUSTED, telling the client when to retry in the retry-after metadata."""
+    print(f"Request rejected: {rejection.reason}.")
+    await context.abort(
+        grpc.StatusCode.RESOURCE_EXHAUSTED,
+        f"{rejection.reason}. Retry after {rejection.retry_after} seconds.",
+        trailing_metadata=(("retry-after", str(rejection.retry_after)),)
+    )
+
+
+async def handle_image_download(images, request_id, max_remote_bytes=None, reserve_remote_bytes=None):
     """Handles image download for remote images and processes byte data images.
 
+    Images are stored by content, so an image submitted many times is stored once. Every stored image is
+    pinned in the store until it is recorded for its request.
+
     Args:
         images (list): List of images to download or process.
         request_id (str): Request ID.
+        max_remote_bytes (int): Largest remote image accepted.
+        reserve_remote_bytes (callable): Called without arguments for every remote image, returns the
+            reserve_bytes callback its download is made with.
 
     Returns:
-        List of tuples containing the image path and byte data or error details.
+        List with one entry per image, in the order of images: a (digest, path, size) tuple of the stored
+        image, or the exception raised while storing the image.
     """
     tasks = []
-    results = []
 
     for image in images:
         if image.location != "local":
             # Create a task to download the image from the URL
-            task = download_image_async(image.image_url, f"{request_id}_{image.image_id}", IMAGE_STORAGE_DIR)
-            tasks.append(task)
+            reserve_bytes = reserve_remote_bytes() if reserve_remote_bytes is not None else None
+            tasks.append(download_to_store_async(image.image_url, max_remote_bytes, reserve_bytes))
         else:
-            # Process image in byte data directly
-            image_path = os.path.join(IMAGE_STORAGE_DIR, f"{request_id}_{image.image_id}.jpg")
-            try:
-                # Save the byte data to a file
-                with open(image_path, 'wb') as file:
-                    file.write(image.image_data)
-                results.append((image_path, image.image_data))
-            except Exception as e:
-                results.append((None, str(e)))
+            # Save the byte data to a file
+            tasks.append(save_image_async(image))
+
+    # Gather the results of all tasks, keeping them aligned with images
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def queue_request(shared_state, request_id, processed_images, model_name, action_type, user_email,
+                        priority=0):
+    """Marks a request as queued and adds its stored images to the user's share of the processing queue."""
+    # Add to request state
+    async with shared_state.state_lock:
+        shared_state.request_state[request_id] = {"status": "queued", "result": None}
 
-    # Gather the results of all download tasks
-    download_results = await asyncio.gather(*tasks, return_exceptions=True)
-    results.extend(download_results)
+    # Add to processing queue
+    shared_state.load_metrics.record_arrival((model_name, action_type), request_id, len(processed_images))
+    await shared_state.request_queue.put(
+        (request_id, processed_images, model_name, action_type, user_email),
+        user_email,
+        priority=max(0, min(shared_state.MAX_PRIORITY, priority)),
+        cost=len(processed_images)
+    )
+    print(f"Request {request_id} added to the queue.")
 
-    return results
 
+async def handle_request_async(shared_state, request_id, images, model_name, action_type, user_email,
+                               stored_images=None, priority=0, reserved_bytes=0):
+    """
+    Downloads the remote images of an admitted request, records its stored images and queues it.
+
+    Every remote image was admitted with REMOTE_IMAGE_SIZE_ESTIMATE bytes. Bytes downloaded beyond the estimate
+    are reserved as they arrive, so remote images cannot take a user or the master over their limits. If they
+    do not fit, the request fails and AdmissionRejected is raised for the caller to reject the call.
+    """
+    def reserve_remote_bytes():
+        downloaded = 0
+
+        def reserve_bytes(size):
+            nonlocal downloaded, reserved_bytes
+            excess = max(0, downloaded + size - shared_state.REMOTE_IMAGE_SIZE_ESTIMATE) \
+                - max(0, downloaded - shared_state.REMOTE_IMAGE_SIZE_ESTIMATE)
+            if excess:
+                shared_state.admission.grow(user_email, excess)
+                reserved_bytes += excess
+            downloaded += size
+
+        return reserve_bytes
 
-async def handle_request_async(shared_state, request_id, images, model_name, action_type, user_email):
     try:
-        # Download images asynchronously
-        download_results = await handle_image_download(images, request_id)
-
-        # Prepare the data for the queue
-        processed_images = []
-        for idx, result in enumerate(download_results):
-            if isinstance(result, tuple):
-                file_path, content = result
-                image_metadata = {
-                    "id": images[idx].image_id,
-                    "size": len(content),
-                    "path": file_path,
-                    "image_bytes": content,
-                }
-                processed_images.append(image_metadata)
-
-        # Add to request state
-        async with shared_state.state_lock:
-            shared_state.request_state[request_id] = {"status": "queued", "result": None}
+        # Prepare the data for the queue. Entries only reference the stored files; the bytes are loaded when
+        # the images are dispatched
+        processed_images = list(stored_images or [])
+        recorded = False
+        try:
+            # Download images asynchronously
+            download_results = await handle_image_download(
+                images, request_id, shared_state.MAX_REMOTE_IMAGE_BYTES, reserve_remote_bytes
+            )
+
+            rejection = None
+            for image, result in zip(images, download_results):
+                if isinstance(result, tuple):
+                    digest, file_path, size = result
+                    processed_images.append(image_reference(image.image_id, digest, file_path, size))
+                elif isinstance(result, AdmissionRejected):
+                    rejection = rejection or result
+                else:
+                    print(f"Failed to store image {image.image_id} of request {request_id}: {result}")
+            if rejection is not None:
+                raise rejection
+
+            # Uploaded images come first and downloaded ones after; results are returned in the order the
+            # request is queued in, so restore the order of the image ids. The sort is stable, so images with
+            # the same id keep the order they were sent in
+            processed_images.sort(key=lambda image: image["id"])
+
+            # Record which stored images the request uses, then release their pins: from here on the
+            # request_images rows keep the files from being removed
+            await async_database_handler.add_request_images(
+                request_id, [(image["id"], image["digest"], image["size"]) for image in processed_images]
+            )
+            recorded = True
+        finally:
+            await release_stored_images([image["digest"] for image in processed_images], recorded)
 
-        # Add to processing queue
-        await shared_state.request_queue.put((request_id, processed_images, model_name, action_type, user_email))
-        print(f"Request {request_id} added to the queue.")
+        # The reservation covers every stored byte; return what the estimates of remote images overstated
+        stored_bytes = sum(image["size"] for image in processed_images)
+        shared_state.admission.adjust(user_email, stored_bytes - reserved_bytes)
+        reserved_bytes = stored_bytes
+
+        await queue_request(
+            shared_state, request_id, processed_images, model_name, action_type, user_email, priority
+        )
 
     except Exception as e:
         print(f"Error handling request {request_id}: {e}")
+        shared_state.admission.release(user_email, reserved_bytes)
         async with shared_state.state_lock:
             shared_state.request_state[request_id] = {"status": "failed", "error": str(e)}
+        if isinstance(e, AdmissionRejected):
+            raise
 
 
 async def process_image(shared_state, request, context):
-    request_id = str(uuid4())
     images = request.images
 
-    # Add request to the database immediately
-    database_handler.add_request(request_id, request.user.email, request.model_name, request.action_type)
+    # Reserve room for the request before doing any work for it, so an overloaded master refuses it at once
+    reserved_bytes = sum(
+        len(image.image_data) if image.location == "local" else shared_state.REMOTE_IMAGE_SIZE_ESTIMATE
+        for image in images
+    )
+    try:
+        shared_state.admission.admit(request.user.email, reserved_bytes)
+    except AdmissionRejected as rejection:
+        await abort_rejected(context, rejection)
+
+    request_id = str(uuid4())
+
+    # Add request to the database immediately. From here on handle_request_async releases the reservation
+    # if the request fails
+    try:
+        await async_database_handler.add_request(
+            request_id, request.user.email, request.model_name, request.action_type
+        )
+    except BaseException:
+        shared_state.admission.release(request.user.email, reserved_bytes)
+        raise
 
     # Response to client immediately with request_id
     response = image_processing_pb2.ProcessImageResponse(request_id=request_id)
 
     # Start asynchronous image download and processing
-    await asyncio.create_task(handle_request_async(shared_state, request_id, images, request.model_name, request.action_type, request.user.email))
+    try:
+        await asyncio.create_task(handle_request_async(shared_state, request_id, images, request.model_name, request.action_type, request.user.email, priority=request.priority, reserved_bytes=reserved_bytes))
+    except AdmissionRejected as rejection:
+        await abort_rejected(context, rejection)
 
     return response
+
+
+async def receive_uploaded_images(request_id, first_chunk, request_iterator, reserve_bytes=None,
+                                  remote_image_size=0):
+    """Writes streamed image chunks straight to the image store as they arrive.
+
+    Every image is written to a temporary file in the image store and hashed as it arrives, then moved to its
+    place in the store, where it is pinned until it is recorded for its request. The writes run on the storage
+    executor, one chunk at a time so the chunks of an image are written in order.
+
+    Clients send images one after another, so an image's file is closed once the first chunk of the next image
+    arrives, and an upload holds a single open file however many images it has. A chunk of an image whose file
+    was closed already is refused with a ValueError instead of being appended to it.
+
+    Args:
+        request_id (str): Request ID.
+        first_chunk (ImageUploadChunk): First message of the stream, already read by the caller.
+        request_iterator: Async iterator over the remaining ImageUploadChunk messages.
+        reserve_bytes (callable): Called with the size of every chunk before it is written, and with
+            remote_image_size for every image url; may raise to stop the upload, in which case the files written
+            so far are removed.
+        remote_image_size (int): Bytes reserved for a remote image until it is downloaded.
+
+    Returns:
+        tuple: (stored_images, remote_images) where stored_images are the queue metadata of the uploaded
+               images and remote_images are ImageData messages for the image urls that still need downloading.
+    """
+    uploaded_files = {}  # Maps image_id to (temporary path, file or None once closed, running SHA-256, size)
+    current_image_id = None  # Image whose file is open
+    remote_images = []
+    loop = asyncio.get_running_loop()
+    pending_write = None  # Write on the storage executor, which outlives the upload if the call is cancelled
+
+    def close_current_file():
+        nonlocal current_image_id
+        if current_image_id is not None:
+            entry = uploaded_files[current_image_id]
+            entry[1].close()
+            entry[1] = None
+            current_image_id = None
+
+    def write_data(image_id, chunk_data):
+        nonlocal current_image_id
+        if image_id != current_image_id:
+            if image_id in uploaded_files:
+                raise ValueError(f"Chunk of image {image_id} arrived after the upload of the image ended")
+            close_current_file()
+            temp_path = image_store.open_temp()
+            uploaded_files[image_id] = [temp_path, open(temp_path, 'wb'), hashlib.sha256(), 0]
+            current_image_id = image_id
+        entry = uploaded_files[image_id]
+        entry[1].write(chunk_data)
+        entry[2].update(chunk_data)
+        entry[3] += len(chunk_data)
+
+    def close_files(remove):
+        close_current_file()
+        if remove:
+            for file_path, _, _, _ in uploaded_files.values():
+                os.remove(file_path)
+
+    def store_files():
+        # The digests were computed as the chunks arrived, so the files are not read back here
+        stored_images = []
+        for image_id, (temp_path, _, digest, size) in sorted(uploaded_files.items()):
+            digest = digest.hexdigest()
+            stored_images.append(image_reference(image_id, digest, image_store.put_file(temp_path, digest), size))
+        return stored_images
+
+    async def write_chunk(chunk):
+        if chunk.image_url:
+            if reserve_bytes is not None:
+                reserve_bytes(remote_image_size)
+            remote_images.append(
+                image_processing_pb2.ImageData(image_id=chunk.image_id, image_url=chunk.image_url, location="remote")
+            )
+            return
+        if not chunk.chunk_data:
+            return  # The first message only carries the request details
+        if reserve_bytes is not None:
+            reserve_bytes(len(chunk.chunk_data))
+        nonlocal pending_write
+        pending_write = loop.run_in_executor(storage_executor, write_data, chunk.image_id, chunk.chunk_data)
+        await pending_write
+
+    try:
+        await write_chunk(first_chunk)
+        async for chunk in request_iterator:
+            await write_chunk(chunk)
+    except BaseException:
+        if pending_write is not None:
+            await asyncio.wait([pending_write])  # Let an interrupted write finish before its file is removed
+        await run_in_storage_executor(close_files, True)
+        raise
+    await run_in_storage_executor(close_files, False)
+
+    stored_images = await run_in_storage_executor(store_files)
+    return stored_images, remote_images
+
+
+async def process_image_stream(shared_state, first_chunk, request_iterator, context):
+    """Handles a request whose images are streamed by the client instead of sent in one message.
+
+    Args:
+        shared_state (SharedState): Request queue and state.
+        first_chunk (ImageUploadChunk): First message of the stream, carrying the request details.
+        request_iterator: Async iterator over the remaining ImageUploadChunk messages.
+        context: gRPC context.
+
+    Returns:
+        ProcessImageResponse with the ID of the new request.
+    """
+    user_email = first_chunk.user.email
+
+    # The size of a streamed request is not known up front: admit the request, then reserve its bytes chunk by
+    # chunk, refusing the rest of the upload once the user or the master runs out of room
+    reserved = {"bytes": 0}
+
+    def reserve_bytes(size):
+        shared_state.admission.grow(user_email, size)
+        reserved["bytes"] += size
+
+    try:
+        shared_state.admission.admit(user_email, 0)
+    except AdmissionRejected as rejection:
+        await abort_rejected(context, rejection)
+
+    request_id = str(uuid4())
+    try:
+        stored_images, remote_images = await receive_uploaded_images(
+            request_id, first_chunk, request_iterator, reserve_bytes, shared_state.REMOTE_IMAGE_SIZE_ESTIMATE
+        )
+    except AdmissionRejected as rejection:
+        shared_state.admission.release(user_email, reserved["bytes"])
+        await abort_rejected(context, rejection)
+    except ValueError as e:
+        # The chunks of the images were interleaved
+        shared_state.admission.release(user_email, reserved["bytes"])
+        await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+    except BaseException:
+        shared_state.admission.release(user_email, reserved["bytes"])
+        raise
+
+    # Add request to the database once the upload has been accepted. From here on handle_request_async
+    # releases the reservation and the pins of the stored images
+    try:
+        await async_database_handler.add_request(
+            request_id, user_email, first_chunk.model_name, first_chunk.action_type
+        )
+    except BaseException:
+        shared_state.admission.release(user_email, reserved["bytes"])
+        await release_stored_images([image["digest"] for image in stored_images], recorded=False)
+        raise
+
+    try:
+        await handle_request_async(
+            shared_state, request_id, remote_images, first_chunk.model_name, first_chunk.action_type, user_email,
+            stored_images=stored_images, priority=first_chunk.priority, reserved_bytes=reserved["bytes"]
+        )
+    except AdmissionRejected as rejection:
+        await abort_rejected(context, rejection)
+
+    return image_processing_pb2.ProcessImageResponse(request_id=request_id)
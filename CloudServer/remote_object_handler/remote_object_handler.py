@@ -60,6 +60,38 @@ def download_image(url, file_name, save_path, timeout=10, max_retries=3, backoff
         session.close()
 
 
+async def fetch_image_async(url, max_bytes=None, reserve_bytes=None):
+    """
+    Asynchronously downloads an image from a URL and returns its content without saving it.
+
+    Args:
+        url (str): URL of the image to download.
+        max_bytes (int): Largest image accepted; larger images are refused without reading the rest of them.
+        reserve_bytes (callable): Called with the size of every piece of the image before it is kept in memory;
+            may raise to stop the download.
+
+    Raises:
+        ValueError: If the URL does not point to a valid image, or the image is larger than max_bytes.
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            if response.status != 200 or not response.content_type.startswith('image/'):
+                raise ValueError("URL does not point to a valid image.")
+            if max_bytes is not None and response.content_length is not None \
+                    and response.content_length > max_bytes:
+                raise ValueError(f"Image of {response.content_length} bytes exceeds the limit of {max_bytes} bytes.")
+
+            # The declared length may be missing or wrong, so the limit is also enforced while reading
+            content = bytearray()
+            async for data in response.content.iter_chunked(64 * 1024):
+                if max_bytes is not None and len(content) + len(data) > max_bytes:
+                    raise ValueError(f"Image exceeds the limit of {max_bytes} bytes.")
+                if reserve_bytes is not None:
+                    reserve_bytes(len(data))
+                content.extend(data)
+            return bytes(content)
+
+
 async def download_image_async(url, file_name, save_path):
     """
     Asynchronously downloads an image from a URL, saves it to a specified path, and returns its content.
@@ -73,14 +105,9 @@ async def download_image_async(url, file_name, save_path):
     tuple: (bool, bytes or str) where bool indicates success or failure,
 
     """
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200 and response.content_type.startswith('image/'):
-                content = await response.read()
-                os.makedirs(save_path, exist_ok=True)
-                file_path = os.path.join(save_path, f"{file_name}.jpg")
-                with open(file_path, 'wb') as f:
-                    f.write(content)
-                return file_path, content
-            else:
-                raise ValueError("URL does not point to a valid image.")
+    content = await fetch_image_async(url)
+    os.makedirs(save_path, exist_ok=True)
+    file_path = os.path.join(save_path, f"{file_name}.jpg")
+    with open(file_path, 'wb') as f:
+        f.write(content)
+    return file_path, content
@@ -0,0 +1,125 @@
+import time
+from collections import deque
+from threading import Lock
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request would take the master over its queue or a user over their quota."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after  # Seconds after which the client may try again
+
+
+class AdmissionController:
+    """
+    Bounds the work the master holds in memory.
+
+    Every request is admitted before its images are accepted and holds its request slot and image bytes
+    until it has been processed. Requests that would take the master over its total request or byte limit,
+    or a user over their own quota, are rejected at once with an estimate of when to retry, based on how
+    fast the admitted work has recently been drained.
+    """
+
+    def __init__(self, max_requests=10000, max_bytes=2 * 1024 ** 3, max_user_requests=100,
+                 max_user_bytes=512 * 1024 ** 2, default_retry_after=5, drain_window=60):
+        self.MAX_REQUESTS = max_requests
+        self.MAX_BYTES = max_bytes
+        self.MAX_USER_REQUESTS = max_user_requests
+        self.MAX_USER_BYTES = max_user_bytes
+        self.DEFAULT_RETRY_AFTER = default_retry_after  # Seconds suggested while no drain rate is known
+        self.DRAIN_WINDOW = drain_window  # Seconds of releases the drain rate is measured over
+        self.requests = 0
+        self.bytes = 0
+        self._user_requests = {}
+        self._user_bytes = {}
+        self._releases = deque()  # (time, bytes) of recently released requests
+        self._lock = Lock()
+
+    def _retry_after(self, excess_requests, excess_bytes):
+        """ Seconds until the given excess is likely to have drained """
+        cutoff = time.time() - self.DRAIN_WINDOW
+        while self._releases and self._releases[0][0] < cutoff:
+            self._releases.popleft()
+        if not self._releases:
+            return self.DEFAULT_RETRY_AFTER
+        request_rate = len(self._releases) / self.DRAIN_WINDOW
+        byte_rate = sum(size for _, size in self._releases) / self.DRAIN_WINDOW
+        estimate = max(
+            excess_requests / request_rate if excess_requests > 0 else 0,
+            excess_bytes / byte_rate if excess_bytes > 0 and byte_rate else 0,
+        )
+        return max(1, min(300, round(estimate)))
+
+    def _check(self, user_email, requests, size):
+        user_requests = self._user_requests.get(user_email, 0) + requests
+        user_bytes = self._user_bytes.get(user_email, 0) + size
+        if user_requests > self.MAX_USER_REQUESTS:
+            raise AdmissionRejected(
+                f"User {user_email} has {self.MAX_USER_REQUESTS} requests waiting already",
+                self._retry_after(user_requests - self.MAX_USER_REQUESTS, 0)
+            )
+        if user_bytes > self.MAX_USER_BYTES:
+            raise AdmissionRejected(
+                f"User {user_email} has exceeded their quota of queued image data",
+                self._retry_after(0, user_bytes - self.MAX_USER_BYTES)
+            )
+        if self.requests + requests > self.MAX_REQUESTS or self.bytes + size > self.MAX_BYTES:
+            raise AdmissionRejected(
+                "The server is overloaded",
+                self._retry_after(self.requests + requests - self.MAX_REQUESTS, self.bytes + size - self.MAX_BYTES)
+            )
+
+    def _add(self, user_email, requests, size):
+        self.requests += requests
+        self.bytes += size
+        self._user_requests[user_email] = self._user_requests.get(user_email, 0) + requests
+        self._user_bytes[user_email] = self._user_bytes.get(user_email, 0) + size
+        if self._user_requests[user_email] <= 0 and self._user_bytes[user_email] <= 0:
+            del self._user_requests[user_email]
+            del self._user_bytes[user_email]
+
+    def admit(self, user_email, size):
+        """
+        Reserve a request slot and size bytes for a new request.
+
+        Raises:
+            AdmissionRejected: If the request does not fit in the limits.
+        """
+        with self._lock:
+            self._check(user_email, 1, size)
+            self._add(user_email, 1, size)
+
+    def grow(self, user_email, size):
+        """
+        Reserve size more bytes for an admitted request, e.g. for the next chunk of a streamed image.
+
+        Raises:
+            AdmissionRejected: If the bytes do not fit in the limits.
+        """
+        with self._lock:
+            self._check(user_email, 0, size)
+            self._add(user_email, 0, size)
+
+    def adjust(self, user_email, size):
+        """
+        Correct the bytes reserved for an admitted request by size, without checking the limits. Only for
+        lowering a reservation to the actual size of the request; more bytes are reserved with grow.
+        """
+        with self._lock:
+            self._add(user_email, 0, size)
+
+    def release(self, user_email, size):
+        """ Free the request slot and size bytes of a request that has been processed or has failed """
+        with self._lock:
+            self._add(user_email, -1, -size)
+            self._releases.append((time.time(), size))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "bytes": self.bytes,
+                "users": len(self._user_requests),
+            }
@@ -0,0 +1,109 @@
+import math
+import time
+from collections import deque
+from threading import Lock
+
+
+class LoadMetrics:
+    """
+    Sliding-window load statistics for every (model_name, action_type), fed by the request path and read by
+    the autoscaler.
+
+    Arrivals are recorded when a request is queued, starts when the dispatch loop takes it off the queue and
+    completions once its results are in, so the autoscaler can see the arrival rate, the backlog and its age,
+    the per-image service time of a worker and the end-to-end latency of each model.
+    """
+
+    def __init__(self, window=60):
+        self.WINDOW = window  # Seconds of history the rates and percentiles are computed over
+        self._arrivals = {}  # Maps key to a deque of (time, image count)
+        self._completions = {}  # Maps key to a deque of (time, latency, seconds per image on one worker)
+        self._pending = {}  # Maps request_id to (key, enqueued at, image count) while it waits in the queue
+        self._running = {}  # Maps request_id to (key, enqueued at) while it is being dispatched
+        self._last_arrival = {}  # Maps key to the time of its most recent arrival
+        self._lock = Lock()
+
+    def record_arrival(self, key, request_id, image_count):
+        """ Record a request entering the queue """
+        now = time.time()
+        with self._lock:
+            self._arrivals.setdefault(key, deque()).append((now, image_count))
+            self._pending[request_id] = (key, now, image_count)
+            self._last_arrival[key] = now
+
+    def record_start(self, request_id):
+        """ Record a request leaving the queue for dispatch """
+        with self._lock:
+            entry = self._pending.pop(request_id, None)
+            if entry is not None:
+                key, enqueued_at, _ = entry
+                self._running[request_id] = (key, enqueued_at)
+
+    def record_completion(self, request_id, image_count, dispatch_seconds, worker_count):
+        """
+        Record a finished request.
+
+        Args:
+            request_id: The finished request.
+            image_count: Number of images in the request.
+            dispatch_seconds: Time spent dispatching the images to the workers.
+            worker_count: Number of workers the images were spread over.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._running.pop(request_id, None)
+            if entry is None:
+                return
+            key, enqueued_at = entry
+            service_time = None
+            if image_count and worker_count:
+                service_time = dispatch_seconds * worker_count / image_count
+            self._completions.setdefault(key, deque()).append((now, now - enqueued_at, service_time))
+
+    def keys(self):
+        """ Return every (model_name, action_type) that has seen traffic """
+        with self._lock:
+            return list(self._last_arrival)
+
+    def snapshot(self, key):
+        """
+        Summarise the load of one (model_name, action_type) over the window.
+
+        Returns:
+            dict: arrival_rate (images per second), queued_images, queued_requests, oldest_queue_age (seconds),
+                running_requests, service_time (seconds per image on one worker, None before the first
+                completion), p95_latency (seconds, None before the first completion) and idle_for (seconds
+                since the last arrival).
+        """
+        now = time.time()
+        cutoff = now - self.WINDOW
+        with self._lock:
+            arrivals = self._arrivals.get(key, deque())
+            while arrivals and arrivals[0][0] < cutoff:
+                arrivals.popleft()
+            completions = self._completions.get(key, deque())
+            while completions and completions[0][0] < cutoff:
+                completions.popleft()
+
+            queued = [(enqueued_at, count) for k, enqueued_at, count in self._pending.values() if k == key]
+            running_requests = sum(1 for k, _ in self._running.values() if k == key)
+            latencies = sorted(latency for _, latency, _ in completions)
+            service_times = [service_time for _, _, service_time in completions if service_time is not None]
+            last_arrival = self._last_arrival.get(key)
+
+        # Rates are measured over the time traffic has actually been seen, so the first minute of traffic is
+        # not diluted by an empty window, but over at least a sixth of the window so one burst is not taken
+        # for a sustained rate
+        observed = min(self.WINDOW, now - arrivals[0][0]) if arrivals else self.WINDOW
+        arrival_rate = sum(count for _, count in arrivals) / max(observed, self.WINDOW / 6)
+
+        return {
+            "arrival_rate": arrival_rate,
+            "queued_images": sum(count for _, count in queued),
+            "queued_requests": len(queued),
+            "oldest_queue_age": now - min(enqueued_at for enqueued_at, _ in queued) if queued else 0.0,
+            "running_requests": running_requests,
+            "service_time": sum(service_times) / len(service_times) if service_times else None,
+            "p95_latency": latencies[max(0, math.ceil(len(latencies) * 0.95) - 1)] if latencies else None,
+            "idle_for": now - last_arrival if last_arrival is not None else math.inf,
+        }
@@ -0,0 +1,142 @@
+import asyncio
+import heapq
+import itertools
+
+
+class FairRequestScheduler:
+    """
+    Request queue that serves users fairly instead of first come, first served.
+
+    Every user has a queue of their own, ordered by request priority (higher first) and then by arrival. The
+    users compete through a heap holding the head request of every user that has work waiting and is below
+    their concurrency cap. The heap is ordered by a self-clocked weighted fair queuing finish tag: a request's
+    tag is its cost (its image count) divided by the user's weight, added to the later of the user's previous
+    tag and the scheduler's virtual time. A user submitting thousands of images therefore takes turns with
+    everyone else rather than being served before them, and a user with twice the weight gets twice the
+    images through. Priorities only order the requests within a user's own share, so no user can take
+    precedence over the others by marking all their requests urgent.
+
+    put and get are O(log n). All methods must be called from the event loop that owns the scheduler.
+    """
+
+    def __init__(self, max_concurrent_per_user=2, user_weights=None, default_weight=1.0):
+        """
+        Args:
+            max_concurrent_per_user (int): Requests of one user that may be dispatched at once.
+            user_weights (dict): Maps user_email to a share weight; users not in it get default_weight.
+            default_weight (float): Share weight of users without an entry in user_weights.
+        """
+        self.MAX_CONCURRENT_PER_USER = max_concurrent_per_user
+        self.user_weights = user_weights if user_weights is not None else {}
+        self.default_weight = default_weight
+        self._user_queues = {}  # Maps user_email to a heap of (-priority, seq, cost, item)
+        self._active_heap = []  # (finish tag, seq, user_email) of each eligible user's head request
+        self._active = {}  # Maps user_email to (seq, start tag) of their valid entry in the active heap
+        self._running = {}  # Maps user_email to the number of their requests being dispatched
+        self._last_finish = {}  # Maps user_email to the finish tag of their last scheduled request
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._size = 0
+        self._unfinished = 0
+        self._condition = asyncio.Condition()
+        self._all_done = asyncio.Event()
+        self._all_done.set()
+
+    def qsize(self):
+        """ Number of requests waiting to be dispatched """
+        return self._size
+
+    def empty(self):
+        return self._size == 0
+
+    def user_qsize(self, user_email):
+        """ Number of requests of one user waiting to be dispatched """
+        return len(self._user_queues.get(user_email, ()))
+
+    def _weight(self, user_email):
+        return self.user_weights.get(user_email, self.default_weight)
+
+    def _activate(self, user_email, start=None):
+        """ Put the head request of a user in the active heap if the user may be served """
+        if user_email in self._active:
+            return
+        queue = self._user_queues.get(user_email)
+        if not queue or self._running.get(user_email, 0) >= self.MAX_CONCURRENT_PER_USER:
+            return
+        _, seq, cost, _ = queue[0]
+        if start is None:
+            start = max(self._virtual_time, self._last_finish.get(user_email, 0.0))
+        finish = start + cost / self._weight(user_email)
+        self._last_finish[user_email] = finish
+        heapq.heappush(self._active_heap, (finish, seq, user_email))
+        self._active[user_email] = (seq, start)
+
+    async def put(self, item, user_email, priority=0, cost=1):
+        """
+        Queue a request.
+
+        Args:
+            item: The queue entry handed back by get.
+            user_email (str): The user the request is accounted to.
+            priority (int): Requests with a higher priority are dispatched before the user's other requests.
+            cost (int): Share of the workers the request takes, e.g. its number of images.
+        """
+        async with self._condition:
+            queue = self._user_queues.setdefault(user_email, [])
+            entry = (-priority, next(self._sequence), max(cost, 1), item)
+            heapq.heappush(queue, entry)
+            self._size += 1
+            self._unfinished += 1
+            self._all_done.clear()
+
+            # A new head with a higher priority than the one in the active heap takes over its start tag, so it
+            # takes the user's turn rather than an extra one; the old heap entry is left behind and skipped by get
+            if user_email in self._active and queue[0] is entry:
+                _, start = self._active.pop(user_email)
+                self._activate(user_email, start)
+            else:
+                self._activate(user_email)
+            self._condition.notify()
+
+    async def get(self):
+        """
+        Wait for the next request to dispatch and return (item, user_email).
+        The caller must call complete(user_email) once the request is done.
+        """
+        async with self._condition:
+            while not self._active:
+                await self._condition.wait()
+            while True:
+                finish, seq, user_email = heapq.heappop(self._active_heap)
+                if self._active.get(user_email, (None,))[0] == seq:
+                    break
+            del self._active[user_email]
+            _, _, _, item = heapq.heappop(self._user_queues[user_email])
+            if not self._user_queues[user_email]:
+                del self._user_queues[user_email]
+            self._size -= 1
+            # Self-clocked fair queuing: the virtual time is the finish tag of the request taken into service,
+            # so a user who returns after a pause starts level with the others instead of far ahead of them
+            self._virtual_time = max(self._virtual_time, finish)
+            self._running[user_email] = self._running.get(user_email, 0) + 1
+            self._activate(user_email)
+            return item, user_email
+
+    async def complete(self, user_email):
+        """ Release the concurrency slot of a finished request and let the user's next request compete """
+        async with self._condition:
+            running = self._running.get(user_email, 0) - 1
+            if running > 0:
+                self._running[user_email] = running
+            else:
+                self._running.pop(user_email, None)
+            self._unfinished -= 1
+            if self._unfinished <= 0:
+                self._unfinished = 0
+                self._all_done.set()
+            self._activate(user_email)
+            self._condition.notify()
+
+    async def join(self):
+        """ Wait until every queued request has been completed """
+        await self._all_done.wait()
@@ -1,8 +1,38 @@
 import asyncio
 
+from CloudServer.dispatch_manager.result_cache import ResultCache
+from CloudServer.state_manager.admission_control import AdmissionController
+from CloudServer.state_manager.load_metrics import LoadMetrics
+from CloudServer.state_manager.request_scheduler import FairRequestScheduler
+
 
 class SharedState:
     def __init__(self):
         self.request_state = {}
-        self.request_queue = asyncio.Queue()
+
+        # Constants
+        self.MAX_CONCURRENT_REQUESTS = 8  # Requests dispatched to the workers at once, over all users
+        self.MAX_CONCURRENT_PER_USER = 2  # Requests of a single user dispatched at once
+        self.USER_WEIGHTS = {}  # Maps user_email to their share weight in the fair queue, 1 by default
+        self.MAX_PRIORITY = 9  # Highest request priority a client may ask for
+        self.MAX_QUEUED_REQUESTS = 10000  # Requests admitted but not yet processed, over all users
+        self.MAX_QUEUED_BYTES = 2 * 1024 ** 3  # Image bytes held for admitted requests, over all users
+        self.MAX_USER_QUEUED_REQUESTS = 100  # Requests a single user may have admitted but not yet processed
+        self.MAX_USER_QUEUED_BYTES = 512 * 1024 ** 2  # Image bytes a single user may have held for their requests
+        self.REMOTE_IMAGE_SIZE_ESTIMATE = 1024 ** 2  # Bytes reserved for a remote image until it is downloaded
+        self.MAX_REMOTE_IMAGE_BYTES = 64 * 1024 ** 2  # Largest remote image downloaded; larger ones are refused
+        self.RESULT_CACHE_BYTES = 64 * 1024 ** 2  # Size of the in-memory tier of the result cache
+        self.RESULT_CACHE_PATH = None  # SQLite file for the persistent tier of the result cache, None to disable
+
+        # Rejects requests that do not fit in the limits above instead of letting the queue grow without bound
+        self.admission = AdmissionController(
+            self.MAX_QUEUED_REQUESTS, self.MAX_QUEUED_BYTES, self.MAX_USER_QUEUED_REQUESTS, self.MAX_USER_QUEUED_BYTES
+        )
+
+        # Answers images that were processed before by the same version of a model without a worker
+        self.result_cache = ResultCache(self.RESULT_CACHE_BYTES, self.RESULT_CACHE_PATH)
+
+        # Serves users in weighted fair shares instead of in arrival order
+        self.request_queue = FairRequestScheduler(self.MAX_CONCURRENT_PER_USER, self.USER_WEIGHTS)
         self.state_lock = asyncio.Lock()
+        self.load_metrics = LoadMetrics()  # Arrival, backlog and latency statistics read by the autoscaler
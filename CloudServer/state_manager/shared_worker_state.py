@@ -1,18 +1,54 @@
-from threading import Lock
+from threading import Event, RLock
 from queue import Queue
 
+from CloudServer.state_manager.worker_channel_pool import WorkerChannelPool
+from CloudServer.state_manager.worker_pool import WorkerPool
+from CloudServer.worker_manager.fork_server import ForkServer
+
 
 class SharedWorkerState:
     def __init__(self):
         self.worker_registry = {}  # Maps worker_id to worker information (including VM data)
         self.available_workers = Queue()
-        self.worker_lock = Lock()
+        self.worker_lock = RLock()  # Re-entrant: stop_worker and VirtualMachine.stop_vm both take it
+        self.channel_pool = WorkerChannelPool()  # Long-lived gRPC channels keyed by worker address
+        self.pending_workers = {}  # Maps the address of a starting worker to an Event set when it registers
+        self.worker_pools = {}  # Maps (model_name, action_type) to the WorkerPool serving it
+        self.fork_servers = {}  # Maps host ID to the ForkServer that launches workers on that host
+        self.placement_scheduler = None  # PlacementScheduler over the worker hosts, set up by the master
 
         # Constants
         self.BASE_WORKER_PORT = 50052
         self.MAX_WORKERS = 10
         self.MIN_WORKERS = 2
-        self.WORKER_IDLE_TIMEOUT = 360
+        self.POOL_LIMITS = {}  # Maps (model_name, action_type) to (min, max) workers, overriding the defaults
+        self.MIN_STANDBY_WORKERS = 0  # Warm standby workers every pool keeps, even without recent demand
+        self.MAX_STANDBY_WORKERS = 2  # Upper bound on the warm standby workers of a pool
+        self.STANDBY_LIMITS = {}  # Maps (model_name, action_type) to (min, max) standby workers
+        self.WORKER_IDLE_TIMEOUT = 360  # Seconds without requests after which a pool is scaled to zero
+        self.AUTOSCALE_INTERVAL = 1  # Seconds between autoscaler evaluations
+        self.TARGET_UTILIZATION = 0.7  # Share of its time a worker should spend processing at steady load
+        self.BACKLOG_DRAIN_TIME = 10  # Seconds the workers added for a backlog should take to clear it
+        self.LATENCY_TARGET = 15  # p95 seconds from queueing to results before a pool is grown regardless
+        self.QUEUE_AGE_TARGET = 5  # Seconds the oldest queued request may wait before a pool is grown
+        self.SCALE_UP_COOLDOWN = 10  # Minimum seconds between scale actions that add workers to a pool
+        self.SCALE_DOWN_DELAY = 60  # Seconds a pool's target must stay below its size before it shrinks
+        self.SCALE_DOWN_COOLDOWN = 30  # Minimum seconds after any scale action before a pool shrinks
+        self.MAX_IN_FLIGHT_PER_WORKER = 4  # Batches a single worker may be processing at once
+        self.DISPATCH_BATCH_SIZE = 8  # Images shipped to a worker per ProcessBatch call
+        self.MAX_DISPATCH_ATTEMPTS = 3  # Workers tried for an image before it is dropped
+        self.WORKER_RPC_TIMEOUT = 60  # Seconds to wait for a worker to process an image
+        self.WORKER_START_TIMEOUT = 120  # Seconds a starting worker has to load its model and register
+        self.MASTER_ADDRESS = "localhost:50051"  # Address workers register with once they are ready
+        self.WORKER_VM_CPU = 4  # CPU cores declared by every worker VM
+        self.WORKER_VM_RAM = 8  # GB of RAM declared by every worker VM
+        self.PLACEMENT_POLICY = "spread"  # "spread" balances worker VMs over the hosts, "pack" fills hosts in turn
+        self.PLACEMENT_TIMEOUT = 30  # Seconds a worker VM waits for host capacity before its start is refused
+        self.WORKER_MODEL_FORMAT = "eager"  # "torchscript" loads the artifacts of export_torchscript instead
+        self.MODEL_FORMATS = {}  # Per model name overrides of WORKER_MODEL_FORMAT, e.g. "int8_static" for models
+        # whose quantization_report shows an acceptable accuracy loss
+        self.WORKER_LAUNCH_MODE = "subprocess"  # "subprocess" starts worker.py per worker, "fork" forks them from
+        # a per-host fork server that has torch and the model weights loaded already
 
         # New VM registry (tracks the VM ID and status)
         self.vm_registry = {}  # Maps VM ID to VM status
@@ -41,6 +77,69 @@ class SharedWorkerState:
                 self.available_workers.queue = [worker for worker in self.available_workers.queue if worker["worker_id"] != worker_id]  # Remove from queue
                 self.vm_registry[vm_id] = "stopped"  # Mark the VM as stopped
 
+    def get_pool(self, model_name, action_type):
+        """ Return the worker pool for a model and action type, creating it on first use """
+        key = (model_name, action_type)
+        with self.worker_lock:
+            pool = self.worker_pools.get(key)
+            if pool is None:
+                min_workers, max_workers = self.POOL_LIMITS.get(key, (self.MIN_WORKERS, self.MAX_WORKERS))
+                min_standby, max_standby = self.STANDBY_LIMITS.get(
+                    key, (self.MIN_STANDBY_WORKERS, self.MAX_STANDBY_WORKERS)
+                )
+                pool = WorkerPool(model_name, action_type, min_workers, max_workers, min_standby, max_standby)
+                self.worker_pools[key] = pool
+            return pool
+
+    def snapshot_pools(self):
+        """ Return the current worker pools as a list, safe to iterate while RPC handlers create new pools """
+        with self.worker_lock:
+            return list(self.worker_pools.values())
+
+    def get_fork_server(self, host):
+        """ Return the fork server of a worker host, starting it on first use """
+        with self.worker_lock:
+            fork_server = self.fork_servers.get(host.host_id)
+            if fork_server is None or not fork_server.is_alive():
+                fork_server = ForkServer()
+                self.fork_servers[host.host_id] = fork_server
+            return fork_server
+
+    def expect_worker(self, worker_address):
+        """ Record that a worker is starting and return the Event set once it registers """
+        with self.worker_lock:
+            ready_event = self.pending_workers.get(worker_address)
+            if ready_event is None or ready_event.is_set():
+                ready_event = Event()
+                self.pending_workers[worker_address] = ready_event
+            return ready_event
+
+    def mark_worker_ready(self, worker_address):
+        """ Signal that a starting worker registered itself. Returns False if no worker was expected there """
+        with self.worker_lock:
+            ready_event = self.pending_workers.get(worker_address)
+        if ready_event is None:
+            return False
+        ready_event.set()
+        return True
+
+    def allocate_worker_ports(self, count):
+        """
+        Reserve the lowest ports that are neither used by a registered worker nor by a starting one.
+        The ports stay reserved until the workers started on them register or fail.
+        """
+        ports = []
+        with self.worker_lock:
+            used_addresses = set(self.worker_registry) | set(self.pending_workers)
+            port = self.BASE_WORKER_PORT
+            while len(ports) < count:
+                worker_address = f"localhost:{port}"
+                if worker_address not in used_addresses:
+                    self.pending_workers[worker_address] = Event()
+                    ports.append(port)
+                port += 1
+        return ports
+
     def get_worker_info(self, worker_id):
         """ Retrieve information about a specific worker """
         with self.worker_lock:
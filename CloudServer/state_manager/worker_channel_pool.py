@@ -0,0 +1,89 @@
+from contextlib import contextmanager
+from threading import Lock
+
+import grpc
+
+import image_processing_pb2_grpc
+
+# Keep idle connections to workers warm and detect dead peers without waiting for a request to fail
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.initial_reconnect_backoff_ms", 500),
+    ("grpc.max_reconnect_backoff_ms", 2000),
+]
+
+
+class PooledChannel:
+    """
+    A pooled channel with its stub and the number of calls in flight on it.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.stub = image_processing_pb2_grpc.WorkerServiceStub(channel)
+        self.in_flight = 0
+        self.evicted = False  # Set once the channel is dropped from the pool; it closes when in_flight reaches 0
+
+
+class WorkerChannelPool:
+    """
+    Keeps one long-lived gRPC channel and WorkerService stub per worker address.
+
+    Calls are made through lease, so that an evicted channel is only closed once the calls in flight on it
+    have finished, instead of cancelling them.
+    """
+
+    def __init__(self, options=None):
+        self.options = options if options is not None else CHANNEL_OPTIONS
+        self._channels = {}  # Maps worker address to its PooledChannel
+        self._lock = Lock()
+
+    def _get_entry(self, worker_address):
+        entry = self._channels.get(worker_address)
+        if entry is None:
+            entry = PooledChannel(grpc.insecure_channel(worker_address, options=self.options))
+            self._channels[worker_address] = entry
+        return entry
+
+    @contextmanager
+    def lease(self, worker_address):
+        """ Yield the pooled stub for a worker, opening a channel on first use, for the duration of a call """
+        with self._lock:
+            entry = self._get_entry(worker_address)
+            entry.in_flight += 1
+        try:
+            yield entry.stub
+        finally:
+            with self._lock:
+                entry.in_flight -= 1
+                close = entry.evicted and entry.in_flight == 0
+            if close:
+                entry.channel.close()
+
+    def evict(self, worker_address):
+        """
+        Forget the channel of a worker, so the next call reconnects from scratch. The channel is closed once
+        the calls in flight on it have finished.
+        """
+        with self._lock:
+            entry = self._channels.pop(worker_address, None)
+            if entry is None:
+                return
+            entry.evicted = True
+            close = entry.in_flight == 0
+        if close:
+            entry.channel.close()
+
+    def close_all(self):
+        """ Evict every pooled channel """
+        with self._lock:
+            addresses = list(self._channels)
+        for worker_address in addresses:
+            self.evict(worker_address)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._channels)
@@ -0,0 +1,134 @@
+import time
+from collections import deque
+from threading import Lock
+
+
+class WorkerPool:
+    """
+    The workers that serve one (model_name, action_type) pair.
+
+    Every pool has its own worker limits and workers and is scaled on its own, so
+    requests for one model are never sent to, and never stop, the workers of another.
+
+    Next to its active workers a pool keeps warm standby workers: started workers with their model loaded
+    that receive no requests until a scale-up promotes them. The number of standby workers follows the
+    largest scale-up of the last demand window, within the pool's standby limits.
+    """
+
+    def __init__(self, model_name, action_type, min_workers, max_workers, min_standby=0, max_standby=0,
+                 demand_window=600):
+        self.model_name = model_name
+        self.action_type = action_type
+        self.MIN_WORKERS = min_workers
+        self.MAX_WORKERS = max_workers
+        self.MIN_STANDBY = min_standby
+        self.MAX_STANDBY = max_standby
+        self.DEMAND_WINDOW = demand_window  # Seconds of scale-ups considered when sizing the standby workers
+        self.starting_standby = 0  # Standby workers that are still loading their model
+        self._workers = []  # Worker addresses, in the order they were started
+        self._standby = []  # Warm standby worker addresses, oldest first
+        self._scale_ups = deque()  # (time, workers added) of recent scale-ups
+        # Model format and weights version reported by the most recently registered worker, and the
+        # fingerprint of the model's files at that time
+        self.model_format = None
+        self.model_version = None
+        self.model_fingerprint = None
+        self._lock = Lock()
+
+    @property
+    def key(self):
+        return self.model_name, self.action_type
+
+    def record_model_version(self, model_format, model_version, fingerprint):
+        """
+        Remember the model a newly registered worker serves.
+
+        Returns:
+            bool: True if it differs from the model the pool's workers served so far.
+        """
+        with self._lock:
+            changed = (model_format, model_version) != (self.model_format, self.model_version)
+            self.model_format = model_format
+            self.model_version = model_version
+            self.model_fingerprint = fingerprint
+            return changed
+
+    def served_model(self, fingerprint):
+        """
+        Return (model_format, model_version) of the model requests to this pool are served with, or None if it
+        is unknown: no worker has registered yet, or the pool has no active worker and the model's files have
+        changed since (or cannot be checked), so the next worker may load different weights.
+        """
+        with self._lock:
+            if self.model_version is None:
+                return None
+            if not self._workers and (fingerprint is None or fingerprint != self.model_fingerprint):
+                return None
+            return self.model_format, self.model_version
+
+    def add_worker(self, worker_address):
+        """ Add a ready worker to the pool """
+        with self._lock:
+            if worker_address not in self._workers:
+                self._workers.append(worker_address)
+
+    def add_standby(self, worker_address):
+        """ Add a ready worker to the warm standby workers """
+        with self._lock:
+            if worker_address not in self._standby:
+                self._standby.append(worker_address)
+
+    def promote_standby(self, count):
+        """ Move up to count standby workers into the active pool and return their addresses """
+        with self._lock:
+            promoted = self._standby[:count]
+            del self._standby[:count]
+            for worker_address in promoted:
+                self._workers.append(worker_address)
+            return promoted
+
+    def standby_addresses(self):
+        """ Return the addresses of the warm standby workers """
+        with self._lock:
+            return list(self._standby)
+
+    def record_scale_up(self, workers_added):
+        """ Remember how many workers a scale-up needed, for sizing the standby workers """
+        with self._lock:
+            self._scale_ups.append((time.time(), workers_added))
+
+    def standby_target(self):
+        """ Number of standby workers to keep, based on the largest scale-up in the demand window """
+        with self._lock:
+            cutoff = time.time() - self.DEMAND_WINDOW
+            while self._scale_ups and self._scale_ups[0][0] < cutoff:
+                self._scale_ups.popleft()
+            recent_demand = max((workers_added for _, workers_added in self._scale_ups), default=0)
+            return max(self.MIN_STANDBY, min(self.MAX_STANDBY, recent_demand))
+
+    def standby_shortfall(self):
+        """ Number of standby workers to start so that the standby target is met """
+        with self._lock:
+            current_standby = len(self._standby) + self.starting_standby
+        return max(0, self.standby_target() - current_standby)
+
+    def remove_worker(self, worker_address):
+        """ Remove a stopped worker from the pool """
+        with self._lock:
+            if worker_address in self._workers:
+                self._workers.remove(worker_address)
+            if worker_address in self._standby:
+                self._standby.remove(worker_address)
+
+    def worker_addresses(self):
+        """ Return the addresses of the workers in the pool """
+        with self._lock:
+            return list(self._workers)
+
+    def required_workers(self, demand):
+        """ Clamp a desired worker count to the limits of the pool """
+        return max(self.MIN_WORKERS, min(self.MAX_WORKERS, demand))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._workers)
@@ -6,14 +6,49 @@ class Host:
         self.cpu = cpu
         self.ram_capacity = ram_capacity
         self.vm_list = []
+        self.core_assignments = {}  # Maps VM ID to the cores of this host reserved for the VM
+
+    def used_cpu(self):
+        """Returns the CPU cores claimed by the VMs on this host."""
+        return sum(vm.cpu for vm in self.vm_list)
+
+    def used_ram(self):
+        """Returns the RAM in GB claimed by the VMs on this host."""
+        return sum(vm.ram for vm in self.vm_list)
+
+    def free_cores(self):
+        """Returns the cores of this host not reserved by any VM, lowest first."""
+        reserved = {core for cores in self.core_assignments.values() for core in cores}
+        return [core for core in range(self.cpu) if core not in reserved]
+
+    def can_host(self, vm):
+        """Checks whether the VM fits in the CPU and RAM this host has left."""
+        return self.used_cpu() + vm.cpu <= self.cpu and self.used_ram() + vm.ram <= self.ram_capacity
 
     def allocate_vm(self, vm):
-        """Assigns a VM to this host."""
+        """
+        Assigns a VM to this host if it has the capacity for it.
+
+        Returns:
+            bool: True if the VM was allocated, False if the host lacks the CPU or RAM.
+        """
+        if not self.can_host(vm):
+            print(f"Host {self.host_id} lacks the capacity for VM {vm.vm_id} ({vm.cpu} CPUs, {vm.ram}GB RAM).")
+            return False
         self.vm_list.append(vm)
-        print(f"VM {vm.vm_id} allocated to Host {self.host_id}.")
+        vm.host = self
+        # Each VM gets its own cores, so the workers of co-located VMs do not compete for the same ones
+        vm.cores = self.free_cores()[:vm.cpu]
+        self.core_assignments[vm.vm_id] = vm.cores
+        print(f"VM {vm.vm_id} allocated to Host {self.host_id} on cores {vm.cores}.")
+        return True
 
     def deallocate_vm(self, vm):
         """Deallocates a VM from this host."""
+        if vm not in self.vm_list:
+            return
         self.vm_list.remove(vm)
+        self.core_assignments.pop(vm.vm_id, None)
+        vm.host = None
+        vm.cores = []
         print(f"VM {vm.vm_id} deallocated from Host {self.host_id}.")
-
@@ -0,0 +1,100 @@
+import time
+from threading import Condition
+
+
+class PlacementScheduler:
+    """
+    Places worker VMs on the hosts of a datacenter according to their declared CPU and RAM.
+
+    Two policies are supported:
+        spread: put each VM on the host that is least utilized once the VM is added, so the load of the
+            workers is balanced over all hosts.
+        pack: put each VM on the most utilized host it still fits on (best fit), so the workers occupy as few
+            hosts as possible.
+
+    A VM that fits on no host waits, up to a timeout, for another VM to be released and is refused after it.
+    """
+
+    POLICIES = ("spread", "pack")
+
+    def __init__(self, datacenter, policy="spread", eligible=None):
+        """
+        Args:
+            datacenter (Datacenter): The datacenter whose hosts VMs are placed on.
+            policy (str): "spread" or "pack".
+            eligible (callable): Optional predicate selecting the hosts worker VMs may be placed on.
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown placement policy: {policy}")
+        self.datacenter = datacenter
+        self.policy = policy
+        self.eligible = eligible or (lambda host: True)
+        self._condition = Condition()
+
+    @staticmethod
+    def _utilization_with(host, vm):
+        """ The larger of the CPU and RAM utilization of a host once the VM is added to it """
+        return max((host.used_cpu() + vm.cpu) / host.cpu, (host.used_ram() + vm.ram) / host.ram_capacity)
+
+    def select_host(self, vm):
+        """ Return the host the policy picks for the VM, or None if it fits nowhere """
+        candidates = [host for host in self.datacenter.host_list if self.eligible(host) and host.can_host(vm)]
+        if not candidates:
+            return None
+        if self.policy == "pack":
+            return max(candidates, key=lambda host: self._utilization_with(host, vm))
+        return min(candidates, key=lambda host: self._utilization_with(host, vm))
+
+    def place(self, vm, timeout=0):
+        """
+        Allocate the VM to a host, waiting up to timeout seconds for capacity to be released.
+
+        Returns:
+            Host: The host the VM was allocated to, or None if no host had the capacity in time.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                host = self.select_host(vm)
+                if host is not None and host.allocate_vm(vm):
+                    print(self.report())
+                    return host
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"No host has the capacity for VM {vm.vm_id} ({vm.cpu} CPUs, {vm.ram}GB RAM).")
+                    return None
+                self._condition.wait(remaining)
+
+    def release(self, vm):
+        """ Free the capacity held by the VM and wake placements waiting for it """
+        with self._condition:
+            if vm.host is not None:
+                vm.host.deallocate_vm(vm)
+            self._condition.notify_all()
+
+    def utilization(self):
+        """
+        Returns:
+            list: Per-host dicts with the VM count and the used and total CPU and RAM of every eligible host.
+        """
+        with self._condition:
+            return [
+                {
+                    "host_id": host.host_id,
+                    "vms": len(host.vm_list),
+                    "cpu_used": host.used_cpu(),
+                    "cpu_total": host.cpu,
+                    "ram_used": host.used_ram(),
+                    "ram_total": host.ram_capacity,
+                }
+                for host in self.datacenter.host_list if self.eligible(host)
+            ]
+
+    def report(self):
+        """ Human-readable summary of the utilization of every eligible host """
+        lines = [
+            f"Host {usage['host_id']}: {usage['vms']} VMs, "
+            f"{usage['cpu_used']}/{usage['cpu_total']} CPUs, {usage['ram_used']}/{usage['ram_total']}GB RAM"
+            for usage in self.utilization()
+        ]
+        return "Host utilization:\n  " + "\n  ".join(lines)
@@ -1,13 +1,14 @@
 import sys
 import os
+import asyncio
 
 import grpc
 import random
 import subprocess
-from concurrent import futures
 from threading import Thread
 
 import image_processing_pb2_grpc
+from CloudServer.worker_manager.thread_budget import thread_environment
 
 
 class VirtualMachine:
@@ -30,6 +31,8 @@ class VirtualMachine:
         self.status = "stopped"
         self.ip_address = self.assign_ip()
         self.applications = []
+        self.host = None  # Host the VM is allocated to, set by Host.allocate_vm
+        self.cores = []  # Cores of the host reserved for the VM, set by Host.allocate_vm
 
     def assign_ip(self):
         """Assigns a random IP address for networking simulation."""
@@ -61,8 +64,15 @@ class VirtualMachine:
         self.status = "stopped"
         print(f"VM {self.vm_id} stopped.")
 
-    def start_worker_application(self, action_type, model_requested, port, model_path, worker_address):
-        """Simulates running an application inside the VM."""
+    def start_worker_application(self, action_type, model_requested, port, model_path, worker_address,
+                                 master_address, fork_server=None, model_format="eager"):
+        """
+        Simulates running an application inside the VM. The worker registers with master_address once ready.
+        With a fork_server the worker is forked from it instead of being started as a new Python process.
+
+        The worker sizes its torch and gRPC thread pools to the VM's cpu and is pinned to the VM's cores, so
+        that workers of VMs sharing a host do not oversubscribe it.
+        """
         if self.status != "running":
             print(f"Cannot start {self.app_name}. VM {self.vm_id} is not running.")
             return
@@ -70,12 +80,23 @@ class VirtualMachine:
 
         print(f"Starting new worker at {worker_address}...")
 
+        if fork_server is not None:
+            process = fork_server.spawn_worker(
+                port, self.vm_id, master_address, action_type, model_path, model_requested, model_format,
+                cpu=self.cpu, cores=self.cores
+            )
+            print(f"Worker application {self.app_name} forked in VM {self.vm_id}.")
+            return process
+
         python_executable = sys.executable
         worker_script = os.path.abspath("worker.py")
 
-        process = subprocess.Popen(
-            [python_executable, worker_script, str(port), self.vm_id, model_requested, action_type, model_path]
-        )
+        command = [python_executable, worker_script, str(port), self.vm_id, master_address, action_type, model_path,
+                   model_requested, model_format, "--cpu", str(self.cpu)]
+        if self.cores:
+            command += ["--cores", ",".join(str(core) for core in self.cores)]
+        # OpenMP and MKL size their thread pools when they start, before the worker can configure torch
+        process = subprocess.Popen(command, env={**os.environ, **thread_environment(self.cpu)})
 
         print(f"Worker application {self.app_name} started in VM {self.vm_id}.")
         return process
@@ -106,17 +127,42 @@ class VirtualMachine:
 
     def run_master_application(self, auto_scaling_process, request_process, service_servicer_class, shared_worker_state,
                                app_name, port):
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+        """
+        Runs the asyncio-native master gRPC server inside the VM.
+
+        The servicer and the request consumer coroutine share a single event loop, so requests queued by the
+        servicer are consumed on the loop that owns the request queue.
+
+        Args:
+            auto_scaling_process (callable): Blocking worker monitor, run in a background thread.
+            request_process (callable): Coroutine function that consumes the request queue.
+            service_servicer_class (type): MasterService servicer implementation.
+            shared_worker_state (SharedWorkerState): Worker state passed to the auto-scaling process.
+            app_name (str): Name under which the master application is registered in the VM.
+            port (int): Port on which the master listens.
+        """
+        asyncio.run(self._run_master_application_async(
+            auto_scaling_process, request_process, service_servicer_class, shared_worker_state, app_name, port
+        ))
+
+    async def _run_master_application_async(self, auto_scaling_process, request_process, service_servicer_class,
+                                            shared_worker_state, app_name, port):
+        server = grpc.aio.server()
         image_processing_pb2_grpc.add_MasterServiceServicer_to_server(service_servicer_class(), server)
         server.add_insecure_port(f"[::]:{port}")
 
         # start master application processes for autoscaling and processing request
-        Thread(target=request_process, daemon=True).start()
         Thread(target=auto_scaling_process, args=(shared_worker_state,), daemon=True).start()
 
         # Add the master application to the application registry of the VM
         self.applications.append(app_name)
 
+        await server.start()
         print(f"Master server started on port {port}")
-        server.start()
-        server.wait_for_termination()
+        request_task = asyncio.create_task(request_process())
+        try:
+            await server.wait_for_termination()
+        finally:
+            # Let the request consumer finish its shutdown work before the loop closes
+            request_task.cancel()
+            await asyncio.gather(request_task, return_exceptions=True)
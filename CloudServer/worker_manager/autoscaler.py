@@ -0,0 +1,122 @@
+import math
+import time
+from threading import Event, Thread
+
+from CloudServer.worker_manager.scale_worker import scale_workers
+
+
+class Autoscaler:
+    """
+    Sizes every worker pool from its recent load, on a thread of its own so that scaling never delays the
+    dispatch of a request.
+
+    The target size of a pool covers its arrival rate at the target utilization (arrival rate x service time
+    per image / utilization) plus enough workers to drain the backlog within BACKLOG_DRAIN_TIME. While the
+    p95 latency or the age of the oldest queued request is over target, one worker more than the current
+    size is asked for. Scale-ups happen as soon as the scale-up cooldown allows; scale-downs only after the
+    target has stayed below the current size for SCALE_DOWN_DELAY seconds, one worker at a time. A pool that
+    has seen no requests for WORKER_IDLE_TIMEOUT seconds is scaled to zero.
+    """
+
+    def __init__(self, shared_worker_state, load_metrics):
+        self.shared_worker_state = shared_worker_state
+        self.load_metrics = load_metrics
+        self._wake = Event()
+        self._stopped = Event()
+        self._scaling = {}  # Maps pool key to the thread currently resizing that pool
+        self._last_scale = {}  # Maps pool key to the time of its last scale action
+        self._below_since = {}  # Maps pool key to the time its target first dropped below its size
+
+    def start(self):
+        Thread(target=self.run, name="autoscaler", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def wake(self):
+        """ Evaluate the pools now instead of at the next interval, e.g. when a request for a cold pool arrives """
+        self._wake.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.shared_worker_state.AUTOSCALE_INTERVAL)
+            self._wake.clear()
+            try:
+                self.evaluate()
+            except Exception as e:
+                print(f"Autoscaler evaluation failed: {e}")
+
+    def evaluate(self):
+        """ Compute the target size of every pool and start resizing the pools that are off target """
+        sws = self.shared_worker_state
+        keys = set(self.load_metrics.keys()) | {pool.key for pool in sws.snapshot_pools()}
+        for model_name, action_type in keys:
+            pool = sws.get_pool(model_name, action_type)
+            scaling = self._scaling.get(pool.key)
+            if scaling is not None and scaling.is_alive():
+                continue  # The previous resize of this pool is still starting or stopping workers
+
+            current = len(pool)
+            target = self.target_workers(pool, self.load_metrics.snapshot(pool.key))
+            decision = self.decide(pool.key, current, target)
+            if decision is None:
+                continue
+
+            print(f"Autoscaling {model_name} ({action_type}) workers from {current} to {decision}.")
+            self._last_scale[pool.key] = time.time()
+            thread = Thread(
+                target=scale_workers, args=(sws, decision, model_name, action_type),
+                name=f"scale-{model_name}-{action_type}", daemon=True
+            )
+            self._scaling[pool.key] = thread
+            thread.start()
+
+    def target_workers(self, pool, load):
+        """ Number of workers a pool needs for its current load, within the pool's limits """
+        sws = self.shared_worker_state
+        if load["idle_for"] > sws.WORKER_IDLE_TIMEOUT and not load["queued_requests"] \
+                and not load["running_requests"]:
+            return 0
+
+        current = len(pool)
+        service_time = load["service_time"]
+        if service_time is None:
+            # Nothing has completed yet, so there is no service time to size the pool with; fall back to one
+            # worker per waiting request
+            desired = load["queued_requests"] + load["running_requests"]
+        else:
+            rate_workers = load["arrival_rate"] * service_time / sws.TARGET_UTILIZATION
+            backlog_workers = load["queued_images"] * service_time / sws.BACKLOG_DRAIN_TIME
+            desired = math.ceil(rate_workers + backlog_workers)
+
+        over_target = (load["p95_latency"] is not None and load["p95_latency"] > sws.LATENCY_TARGET) \
+            or load["oldest_queue_age"] > sws.QUEUE_AGE_TARGET
+        if over_target and load["queued_requests"]:
+            desired = max(desired, current + 1)
+
+        return pool.required_workers(desired)
+
+    def decide(self, key, current, target):
+        """ Apply hysteresis and cooldowns to a target size. Returns the size to scale to, or None """
+        sws = self.shared_worker_state
+        now = time.time()
+        since_last = now - self._last_scale.get(key, 0)
+
+        if target > current:
+            self._below_since.pop(key, None)
+            # A pool without workers cannot serve anything, so it is never held back by the cooldown
+            if current == 0 or since_last >= sws.SCALE_UP_COOLDOWN:
+                return target
+            return None
+
+        if target < current:
+            below_since = self._below_since.setdefault(key, now)
+            if now - below_since < sws.SCALE_DOWN_DELAY or since_last < sws.SCALE_DOWN_COOLDOWN:
+                return None
+            self._below_since.pop(key, None)
+            # An idle pool is released at once, a busy one shrinks a worker at a time
+            return target if target == 0 else current - 1
+
+        self._below_since.pop(key, None)
+        return None
@@ -0,0 +1,151 @@
+"""
+Fork server for workers: a process that loads torch and model weights once and forks every worker from itself.
+
+Forking a process whose OpenMP or MKL thread pools are already running is unsafe: the children inherit the
+pools' locks but not their threads, and can deadlock on their first parallel operation. The fork server
+therefore limits torch and the math libraries to a single thread before importing them and only loads model
+weights, never running inference. Each forked worker sizes its own thread pools after the fork, see
+worker.apply_thread_budget. Code added to the fork server must not run models or start thread pools either.
+"""
+import gc
+import multiprocessing
+import os
+import signal
+from threading import Lock
+
+
+def zygote_main(conn):
+    """
+    Entry point of the fork server process.
+
+    Imports torch and the worker module once, loads the weights of each model and hashes them into its version
+    the first time a worker for it is requested, and forks every worker from this process so that the libraries and weights are shared
+    copy-on-write instead of being loaded again per worker.
+    """
+    # Forked workers are reaped automatically, so their pids disappear once they exit
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    # No thread pool may exist when a worker is forked, so the libraries start single-threaded here
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = "1"
+
+    import torch
+    import worker  # Imports torch and torchvision once for every worker forked from here
+
+    torch.set_num_threads(1)
+
+    models = {}  # Maps (action_type, model_path, model_format) to the models loaded for it
+    versions = {}  # Maps the same keys to the version of the loaded models, hashed once for all their workers
+    while True:
+        try:
+            command, args = conn.recv()
+        except EOFError:
+            break
+        if command == "stop":
+            break
+
+        port, worker_id, master_address, action_type, model_path, model_name, model_format, cpu, cores = args
+        key = (action_type, model_path, model_format)
+        try:
+            if key not in models:
+                models[key] = worker.load_models(action_type, model_path, model_format)
+                versions[key] = worker.models_version(models[key])
+                # Keep the loaded objects out of the collector's reach, so collections in the workers do not
+                # write to (and thereby copy) the pages they share with this process
+                gc.freeze()
+        except Exception as e:
+            conn.send(("error", f"Failed to load models for {action_type}: {e}"))
+            continue
+
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                conn.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                # The worker starts its own thread pools, sized to its VM or else to the machine
+                worker.serve(port, worker_id, master_address, action_type, model_path, model_name,
+                             models=models[key], model_format=model_format, cpu=cpu or os.cpu_count(), cores=cores,
+                             model_version=versions[key])
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else 1
+            except BaseException as e:
+                print(f"Forked worker {worker_id} failed: {e}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        conn.send(("ok", pid))
+
+
+class ForkedWorkerProcess:
+    """
+    Process handle for a worker forked by the fork server, mirroring the parts of subprocess.Popen the
+    worker manager uses.
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+
+    def poll(self):
+        """ Returns None while the worker is running, and 0 once it has exited """
+        try:
+            os.kill(self.pid, 0)
+            return None
+        except ProcessLookupError:
+            return 0
+        except PermissionError:
+            return None
+
+    def terminate(self):
+        """ Asks the worker to shut down """
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+class ForkServer:
+    """
+    Launches workers by forking them from a long-lived process that has the heavy libraries and model weights
+    loaded already, so that a new worker starts in milliseconds and shares most of its memory.
+    """
+
+    def __init__(self):
+        # The fork server itself is spawned, not forked, so that it does not inherit the master's threads
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=zygote_main, args=(child_conn,), name="worker-fork-server",
+                                        daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._lock = Lock()
+
+    def spawn_worker(self, port, worker_id, master_address, action_type, model_path, model_name,
+                     model_format="eager", cpu=None, cores=None):
+        """
+        Forks a worker serving the given model, with its thread pools sized to cpu cores and pinned to cores.
+
+        Returns:
+            ForkedWorkerProcess: Handle of the forked worker.
+        """
+        with self._lock:
+            self._conn.send(
+                ("spawn", (port, worker_id, master_address, action_type, model_path, model_name, model_format, cpu,
+                           cores))
+            )
+            status, payload = self._conn.recv()
+        if status != "ok":
+            raise RuntimeError(payload)
+        return ForkedWorkerProcess(payload)
+
+    def is_alive(self):
+        return self._process.is_alive()
+
+    def shutdown(self):
+        """ Stops the fork server. Workers forked from it keep running """
+        with self._lock:
+            try:
+                self._conn.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+        self._process.join(timeout=5)
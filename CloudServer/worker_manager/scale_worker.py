@@ -1,13 +1,14 @@
 import time
+from threading import Thread
+
 import grpc
 
 import image_processing_pb2
-import image_processing_pb2_grpc
 from CloudServer.model_manager.model_manger import get_model_path
 from CloudServer.virtualization.virtual_machine import VirtualMachine
 
 
-def check_worker_ready(worker_address, timeout=15):
+def check_worker_ready(shared_worker_state, worker_address, timeout=15):
     """
     Waits for a worker to signal readiness by sending a HealthCheck.
     """
@@ -15,20 +16,38 @@ def check_worker_ready(worker_address, timeout=15):
     deadline = time.time() + timeout
     while time.time() < deadline:
         try:
-            with grpc.insecure_channel(worker_address) as channel:
-                stub = image_processing_pb2_grpc.WorkerServiceStub(channel)
-                stub.HealthCheck(image_processing_pb2.HealthRequest())
-                print(f"Worker {worker_address} is ready.")
-                return True
+            with shared_worker_state.channel_pool.lease(worker_address) as stub:
+                stub.HealthCheck(image_processing_pb2.HealthRequest(), timeout=1)
+            print(f"Worker {worker_address} is ready.")
+            return True
         except grpc.RpcError:
             time.sleep(1)
     print(f"Worker {worker_address} failed to respond.")
     return False
 
 
-def start_worker(shared_worker_state, port, model_requested, action_type):
+def wait_for_worker_registration(shared_worker_state, worker_address, ready_event, process):
+    """
+    Waits until a starting worker registers itself with the master through RegisterWorker.
+
+    Gives up early if the worker process exits, and falls back to a HealthCheck probe if the worker did not
+    register within WORKER_START_TIMEOUT.
+    """
+    deadline = time.time() + shared_worker_state.WORKER_START_TIMEOUT
+    while time.time() < deadline:
+        if ready_event.wait(timeout=0.5):
+            print(f"Worker {worker_address} registered.")
+            return True
+        if process is None or process.poll() is not None:
+            print(f"Worker process for {worker_address} exited before registering.")
+            return False
+    return check_worker_ready(shared_worker_state, worker_address, timeout=2)
+
+
+def start_worker(shared_worker_state, port, model_requested, action_type, standby=False):
     """
     Start a worker process in a new VM at the specified port.
+    A standby worker joins the warm standby workers of its pool instead of receiving requests right away.
     """
     worker_id = f"worker_{port}"
     app_name = f"worker_{model_requested}"
@@ -36,32 +55,60 @@ def start_worker(shared_worker_state, port, model_requested, action_type):
     worker_address = f"localhost:{port}"
 
     # Create a new VM using the VirtualMachine class
-    vm = VirtualMachine(app_name, worker_id)
+    vm = VirtualMachine(app_name, worker_id, ram=shared_worker_state.WORKER_VM_RAM, cpu=shared_worker_state.WORKER_VM_CPU)
+    ready_event = shared_worker_state.expect_worker(worker_address)
 
-    # Ge worker host for worker VMs
-    worker_host = shared_worker_state.worker_host_registry[2]["worker_host"]
-    worker_host.allocate_vm(vm) # add vm to worker host
+    # Place the VM on a worker host with the capacity for it
+    placement_scheduler = shared_worker_state.placement_scheduler
+    worker_host = placement_scheduler.place(vm, timeout=shared_worker_state.PLACEMENT_TIMEOUT)
+    if worker_host is None:
+        with shared_worker_state.worker_lock:
+            shared_worker_state.pending_workers.pop(worker_address, None)
+        print(f"Failed to start worker at {worker_address}: no worker host has capacity left.")
+        return
     vm.start_vm()  # Start VM and load application within the VM
-    process = vm.start_worker_application(
-        action_type,model_requested,port, model_path, worker_address
-    )  # start worker app in VM and load the model
-
-    # Wait a short time to allow the worker to initialize and respond to health checks
-    time.sleep(6)
-
-    if check_worker_ready(worker_address):
+    fork_server = None
+    if shared_worker_state.WORKER_LAUNCH_MODE == "fork":
+        fork_server = shared_worker_state.get_fork_server(worker_host)
+    model_format = shared_worker_state.MODEL_FORMATS.get(model_requested, shared_worker_state.WORKER_MODEL_FORMAT)
+    try:
+        process = vm.start_worker_application(
+            action_type, model_requested, port, model_path, worker_address, shared_worker_state.MASTER_ADDRESS,
+            fork_server=fork_server, model_format=model_format
+        )  # start worker app in VM and load the model
+    except Exception as e:
+        print(f"Failed to launch worker at {worker_address}: {e}")
+        process = None
+
+    # The worker calls RegisterWorker on the master as soon as its model is loaded and it is serving
+    is_ready = wait_for_worker_registration(shared_worker_state, worker_address, ready_event, process)
+
+    if is_ready:
         with shared_worker_state.worker_lock:
+            shared_worker_state.pending_workers.pop(worker_address, None)
             shared_worker_state.worker_registry[worker_address] = {
                 "vm": vm,  # Store the VM instance
                 "process": process, # store worker process within VM
                 "last_active": time.time(),
                 "model_name": model_requested,  # This is the tag. Used during monitoring to start up the workers with
                 # the appropriate models
-                "action_type": action_type
+                "action_type": action_type,
+                "standby": standby,  # Standby workers are kept warm and are not stopped for being idle
             }
-            shared_worker_state.available_workers.put(worker_address)
-        print(f"Worker at {worker_address} is ready.")
+        pool = shared_worker_state.get_pool(model_requested, action_type)
+        if standby:
+            pool.add_standby(worker_address)
+        else:
+            pool.add_worker(worker_address)
+        print(f"Worker at {worker_address} is ready{' on standby' if standby else ''}.")
     else:
+        with shared_worker_state.worker_lock:
+            shared_worker_state.pending_workers.pop(worker_address, None)
+        if process is not None:
+            process.terminate()
+        vm.status = "stopped"
+        placement_scheduler.release(vm)
+        shared_worker_state.channel_pool.evict(worker_address)
         print(f"Failed to start worker at {worker_address}.")
 
 
@@ -70,45 +117,131 @@ def stop_worker(shared_worker_state, worker_address):
     Stop the worker VM and remove it from the registry.
     """
     with shared_worker_state.worker_lock:
-        vm = shared_worker_state.worker_registry[worker_address]["vm"]
+        info = shared_worker_state.worker_registry[worker_address]
+        shared_worker_state.get_pool(info["model_name"], info["action_type"]).remove_worker(worker_address)
+        vm = info["vm"]
         print(f"Stopping virtual machine: {vm.vm_id}")
         vm.stop_vm(worker_address, shared_worker_state)  # Stop the VM
-        del shared_worker_state.worker_registry[worker_address]
+        shared_worker_state.worker_registry.pop(worker_address, None)
+    shared_worker_state.placement_scheduler.release(vm)  # Return the VM's CPU and RAM to its host
+    shared_worker_state.channel_pool.evict(worker_address)  # Close the pooled connection to the stopped worker
+
+
+def promote_standby_workers(shared_worker_state, pool, count):
+    """
+    Promote up to count warm standby workers of a pool into active service.
+    """
+    promoted = pool.promote_standby(count)
+    with shared_worker_state.worker_lock:
+        for worker_address in promoted:
+            info = shared_worker_state.worker_registry.get(worker_address)
+            if info is not None:
+                info["standby"] = False
+                info["last_active"] = time.time()
+    if promoted:
+        print(f"Promoted standby workers {promoted} for {pool.model_name} ({pool.action_type}).")
+    return promoted
+
+
+def refill_standby_workers(shared_worker_state, pool):
+    """
+    Start standby workers until the pool has as many as its recent demand calls for.
+    """
+    with shared_worker_state.worker_lock:
+        shortfall = pool.standby_shortfall()
+        pool.starting_standby += shortfall
+    if not shortfall:
+        return
+
+    print(f"Starting {shortfall} standby workers for {pool.model_name} ({pool.action_type}).")
+
+    def start_standby_worker(port):
+        try:
+            start_worker(shared_worker_state, port, pool.model_name, pool.action_type, standby=True)
+        finally:
+            with shared_worker_state.worker_lock:
+                pool.starting_standby -= 1
+
+    threads = [
+        Thread(target=start_standby_worker, args=(port,), daemon=True)
+        for port in shared_worker_state.allocate_worker_ports(shortfall)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
 
 
 def scale_workers(shared_worker_state, required_workers, model_requested, action_type):
     """
-    Adjust the number of active workers to match the required count.
+    Adjust the number of workers in the pool of the requested model to match the required count.
+    Workers of other models are never started or stopped here. The count is decided by the Autoscaler and may
+    be zero for an idle pool; only the pool's maximum is enforced here.
     """
-    current_workers = len(shared_worker_state.worker_registry)
+    pool = shared_worker_state.get_pool(model_requested, action_type)
+    required_workers = max(0, min(pool.MAX_WORKERS, required_workers))
+    current_workers = len(pool)
 
-    print(f"Scaling workers. Current: {current_workers}, Required: {required_workers}")
+    print(f"Scaling {model_requested} ({action_type}) workers. Current: {current_workers}, Required: {required_workers}")
 
-    # Start new workers if needed
+    # Start new workers if needed. Warm standby workers are promoted first; the rest load their models
+    # concurrently, so scaling up takes about as long as the slowest single worker start
     if current_workers < required_workers:
-        print(f"Starting new workers to reach {required_workers} workers.")
-        for port in range(shared_worker_state.BASE_WORKER_PORT + current_workers, shared_worker_state.BASE_WORKER_PORT + required_workers):
-            start_worker(shared_worker_state, port, model_requested, action_type)
+        missing_workers = required_workers - current_workers
+        pool.record_scale_up(missing_workers)
+        promoted = promote_standby_workers(shared_worker_state, pool, missing_workers)
+        missing_workers -= len(promoted)
+
+        # Replace the promoted workers in the background
+        Thread(target=refill_standby_workers, args=(shared_worker_state, pool), daemon=True).start()
+
+        print(f"Starting {missing_workers} new workers to reach {required_workers} workers.")
+        ports = shared_worker_state.allocate_worker_ports(missing_workers)
+        threads = [
+            Thread(target=start_worker, args=(shared_worker_state, port, model_requested, action_type), daemon=True)
+            for port in ports
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
 
     # Stop excess workers
     if current_workers > required_workers:
-        excess_workers = list(shared_worker_state.worker_registry.keys())[required_workers:]
+        excess_workers = pool.worker_addresses()[required_workers:]
         for worker_address in excess_workers:
             stop_worker(shared_worker_state, worker_address)
 
 
 def monitor_workers(shared_worker_state):
     """
-    Monitors workers, restarts them if they stop unexpectedly or become idle.
+    Monitors workers and restarts them if they stop unexpectedly. Sizing the pools, including stopping idle
+    workers, is left to the Autoscaler.
     """
     while True:
         time.sleep(10)
+        # Only collect the crashed workers under the lock: restarting one takes up to the placement and start
+        # timeouts, and the restarted worker needs the lock to register
+        crashed_workers = []
         with shared_worker_state.worker_lock:
             for worker_address, info in list(shared_worker_state.worker_registry.items()):
                 if info["vm"].health_check() != "running":  # Check if the VM is still running
-                    print(f"Worker {worker_address} stopped unexpectedly.")
-                    port = int(worker_address.split(":")[1])
-                    start_worker(shared_worker_state, port, info["model_name"], info["action_type"])
-                elif time.time() - info["last_active"] > shared_worker_state.WORKER_IDLE_TIMEOUT:
-                    print(f"Worker {worker_address} idle for too long. Stopping.")
-                    stop_worker(shared_worker_state, worker_address)
+                    crashed_workers.append((worker_address, info))
+                    del shared_worker_state.worker_registry[worker_address]
+                    shared_worker_state.get_pool(info["model_name"], info["action_type"]).remove_worker(worker_address)
+
+        for worker_address, info in crashed_workers:
+            print(f"Worker {worker_address} stopped unexpectedly.")
+            shared_worker_state.placement_scheduler.release(info["vm"])
+            shared_worker_state.channel_pool.evict(worker_address)
+            port = int(worker_address.split(":")[1])
+            Thread(
+                target=start_worker,
+                args=(shared_worker_state, port, info["model_name"], info["action_type"], info.get("standby", False)),
+                daemon=True
+            ).start()
+
+        # Keep the warm standby workers of every pool topped up
+        for pool in shared_worker_state.snapshot_pools():
+            if pool.standby_shortfall():
+                Thread(target=refill_standby_workers, args=(shared_worker_state, pool), daemon=True).start()
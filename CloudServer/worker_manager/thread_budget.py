@@ -0,0 +1,53 @@
+import os
+
+
+def thread_budget(cpu):
+    """
+    Derives the thread pool sizes of a worker from the CPU cores of its VM.
+
+    Torch's intra-op pool gets one thread per core, since a forward pass of the micro-batcher is the work that
+    keeps the cores busy. Inter-op parallelism is only used by forked TorchScript graphs, so it gets a small
+    share. The gRPC handlers mostly decode images and wait for their batch, so one per core plus two for
+    health checks and batch calls keeps every core decoding without a pool of idle threads.
+
+    Args:
+        cpu (int): Number of CPU cores of the worker's VM.
+
+    Returns:
+        dict: Sizes of the "intra_op", "inter_op" and "grpc" thread pools.
+    """
+    cpu = max(1, int(cpu))
+    return {
+        "intra_op": cpu,
+        "inter_op": max(1, cpu // 4),
+        "grpc": cpu + 2,
+    }
+
+
+def thread_environment(cpu):
+    """
+    Returns the environment variables that size the OpenMP and BLAS thread pools of a worker process to its
+    VM's cores. They are read when the libraries start, so they must be set when the process is launched.
+    """
+    threads = str(thread_budget(cpu)["intra_op"])
+    return {
+        "OMP_NUM_THREADS": threads,
+        "MKL_NUM_THREADS": threads,
+        "OPENBLAS_NUM_THREADS": threads,
+    }
+
+
+def physical_cores(cores):
+    """
+    Maps the host cores reserved for a VM to CPUs this machine lets the process run on.
+
+    The hosts of the simulated datacenter may declare more cores than the machine has; their cores then wrap
+    around the available CPUs, so VMs only share CPUs once the machine's cores are all reserved.
+
+    Returns:
+        set: The CPU ids to pin the worker to, or an empty set if CPU affinity is not supported.
+    """
+    if not cores or not hasattr(os, "sched_getaffinity"):
+        return set()
+    available = sorted(os.sched_getaffinity(0))
+    return {available[core % len(available)] for core in cores}
@@ -9,6 +9,7 @@ from tabulate import tabulate
 from urllib.parse import urlparse
 
 CONFIG_FILE = "auth_config.ini"
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes of a local image sent per streamed message
 
 
 def initialize_config():
@@ -100,6 +101,43 @@ def parse_image_paths(image_paths):
     return images
 
 
+def stream_image_chunks(image_paths, model_name, action_type, user_credentials, priority=0):
+    """
+    Yields ImageUploadChunk messages for the given images, reading local files from disk piece by piece.
+    The first message carries the user credentials and request details.
+    """
+    yield image_processing_pb2.ImageUploadChunk(
+        user=user_credentials, model_name=model_name, action_type=action_type, priority=priority
+    )
+
+    image_id = 1
+    for path in image_paths:
+        if is_remote_image(path):
+            yield image_processing_pb2.ImageUploadChunk(image_id=image_id, image_url=path)
+        else:
+            try:
+                with open(path, 'rb') as f:
+                    while True:
+                        chunk_data = f.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk_data:
+                            break
+                        yield image_processing_pb2.ImageUploadChunk(image_id=image_id, chunk_data=chunk_data)
+            except FileNotFoundError:
+                print(f"Error: File '{path}' not found.")
+        image_id += 1
+
+
+def report_submission_error(error):
+    """Prints why the master did not accept a request, including when to retry if it was overloaded."""
+    if error.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+        retry_after = dict(error.trailing_metadata() or ()).get("retry-after")
+        print(f"Request rejected: {error.details()}")
+        if retry_after:
+            print(f"Please try again in {retry_after} seconds.")
+        return
+    print(f"Error communicating with master: {str(error)}")
+
+
 def process_image(args):
     """Send a request to process images."""
     image_paths = []
@@ -121,22 +159,27 @@ def process_image(args):
                     'password': data['password']
                 }
 
+    # Use credentials from JSON if available, otherwise use config file
+    user_credentials = json_user_credentials or get_user_credentials()
+
+    if not args.no_stream:
+        upload_images(image_paths, args.model_name, args.action_type, user_credentials, args.priority)
+        return
+
     # Parse images into ImageData messages
     images = parse_image_paths(image_paths)
     if not images:
         print("Error: No valid images found.")
         return
 
-    # Use credentials from JSON if available, otherwise use config file
-    user_credentials = json_user_credentials or get_user_credentials()
-
     # Build request
     request = image_processing_pb2.ProcessImageRequest(
         user=user_credentials,
         images=images,
         model_name=args.model_name,
         action_type=args.action_type,
-        number_of_remote_images=sum(1 for img in images if img.location == "remote")
+        number_of_remote_images=sum(1 for img in images if img.location == "remote"),
+        priority=args.priority
     )
 
     # Send request
@@ -146,9 +189,25 @@ def process_image(args):
             response = stub.ProcessImage(request)
             print(f"Request submitted. Request ID: {response.request_id}")
         except grpc.RpcError as e:
-            print(f"Error communicating with master: {str(e)}")
+            report_submission_error(e)
+
 
+def upload_images(image_paths, model_name, action_type, user_credentials, priority=0):
+    """Stream images to the master in chunks instead of sending them in a single message."""
+    image_paths = [path for path in image_paths if path and (is_remote_image(path) or os.path.isfile(path))]
+    if not image_paths:
+        print("Error: No valid images found.")
+        return
 
+    with grpc.insecure_channel('localhost:50051') as channel:
+        stub = image_processing_pb2_grpc.MasterServiceStub(channel)
+        try:
+            response = stub.UploadImages(
+                stream_image_chunks(image_paths, model_name, action_type, user_credentials, priority)
+            )
+            print(f"Request submitted. Request ID: {response.request_id}")
+        except grpc.RpcError as e:
+            report_submission_error(e)
 
 
 def detect_remote_image(image_url):
@@ -263,7 +322,7 @@ def model_details(model_name):
             print(f"Error fetching model details: {str(e)}")
 
 
-def reprocess_request(request_id):
+def reprocess_request(request_id, priority=0):
     """
     Sends a reprocessing request for an existing image.
     """
@@ -273,7 +332,7 @@ def reprocess_request(request_id):
         stub = image_processing_pb2_grpc.MasterServiceStub(channel)
         try:
             response = stub.ReprocessImage(
-                image_processing_pb2.ReprocessRequest(user=user_credentials, request_id=request_id)
+                image_processing_pb2.ReprocessRequest(user=user_credentials, request_id=request_id, priority=priority)
             )
             if response.status == "success":
                 print(f"Reprocessing initiated. New Request ID: {response.request_id}")
@@ -301,6 +360,8 @@ def main():
     detect_parser.add_argument("-t", "--text_file", type=str, help="Path to a text file with image paths")
     detect_parser.add_argument("--model_name", type=str, required=True, help="Name of the model to use")
     detect_parser.add_argument("--action_type", type=str, required=True, help="Action to perform (e.g., categorize, count_objects)")
+    detect_parser.add_argument("--no_stream", action="store_true", help="Send all images in a single message instead of streaming them")
+    detect_parser.add_argument("--priority", type=int, default=0, help="Priority of the request among your own requests (0-9, higher first)")
 
     # Result command
     result_parser = subparsers.add_parser("result", help="Fetch the result of a request")
@@ -316,6 +377,7 @@ def main():
     # Reprocess command
     reprocess_parser = subparsers.add_parser("reprocess", help="Reprocess an existing request")
     reprocess_parser.add_argument("request_id", type=str, help="Request ID to reprocess")
+    reprocess_parser.add_argument("--priority", type=int, default=0, help="Priority of the new request (0-9, higher first)")
 
     # Get requests command
     subparsers.add_parser("get_requests", help="List all user requests")
@@ -342,7 +404,7 @@ def main():
     elif args.command == "model":
         model_details(args.model_name)
     elif args.command == "reprocess":
-        reprocess_request(args.request_id)
+        reprocess_request(args.request_id, args.priority)
     else:
         parser.print_help()
 
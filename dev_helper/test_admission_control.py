@@ -0,0 +1,167 @@
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import image_processing_pb2
+from CloudServer.image_store.content_store import ContentStore
+from CloudServer.processImages import process_image
+from CloudServer.remote_object_handler.remote_object_handler import fetch_image_async
+from CloudServer.state_manager.admission_control import AdmissionController, AdmissionRejected
+from CloudServer.state_manager.shared_request_state import SharedState
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def test_user_quota_rejects_with_retry_after(self):
+        admission = AdmissionController(max_user_requests=1)
+        admission.admit("a", 10)
+        with self.assertRaises(AdmissionRejected) as rejection:
+            admission.admit("a", 10)
+        self.assertGreaterEqual(rejection.exception.retry_after, 1)
+        admission.admit("b", 10)  # Other users keep their own quota
+
+    def test_master_byte_limit(self):
+        admission = AdmissionController(max_bytes=100)
+        admission.admit("a", 60)
+        with self.assertRaises(AdmissionRejected):
+            admission.admit("b", 60)
+        with self.assertRaises(AdmissionRejected):
+            admission.grow("a", 50)
+
+    def test_release_returns_the_reservation(self):
+        admission = AdmissionController()
+        admission.admit("a", 10)
+        admission.grow("a", 5)
+        admission.release("a", 15)
+        self.assertEqual(admission.stats(), {"requests": 0, "bytes": 0, "users": 0})
+
+
+async def chunks(messages):
+    for message in messages:
+        yield message
+
+
+class TestReleaseOnError(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.shared_state = SharedState()
+        self.image_store = ContentStore(tempfile.mkdtemp())
+        patch.object(process_image, "image_store", self.image_store).start()
+        self.add_request = patch.object(
+            process_image.async_database_handler, "add_request", AsyncMock(side_effect=RuntimeError("database down"))
+        ).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def user(self):
+        return image_processing_pb2.UserCredentials(email="a@example.com")
+
+    async def test_process_image_releases_reservation_when_add_request_fails(self):
+        request = image_processing_pb2.ProcessImageRequest(
+            user=self.user(), model_name="m", action_type="detect_objects",
+            images=[image_processing_pb2.ImageData(image_id=1, image_data=b"x" * 100, location="local")]
+        )
+        with self.assertRaises(RuntimeError):
+            await process_image.process_image(self.shared_state, request, AsyncMock())
+        self.assertEqual(self.shared_state.admission.stats(), {"requests": 0, "bytes": 0, "users": 0})
+
+    async def test_stream_releases_reservation_and_pins_when_add_request_fails(self):
+        first_chunk = image_processing_pb2.ImageUploadChunk(
+            user=self.user(), model_name="m", action_type="detect_objects"
+        )
+        uploaded = [image_processing_pb2.ImageUploadChunk(image_id=1, chunk_data=b"y" * 50)]
+        with self.assertRaises(RuntimeError):
+            await process_image.process_image_stream(self.shared_state, first_chunk, chunks(uploaded), AsyncMock())
+        self.assertEqual(self.shared_state.admission.stats(), {"requests": 0, "bytes": 0, "users": 0})
+        self.assertFalse(self.image_store._pins)
+
+
+class TestRemoteImageLimits(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        async def declared(request):
+            return web.Response(body=b"x" * 1000, content_type="image/jpeg")
+
+        async def undeclared(request):
+            # Chunked, so the client does not learn the size before reading the body
+            response = web.StreamResponse(headers={"Content-Type": "image/jpeg"})
+            response.enable_chunked_encoding()
+            await response.prepare(request)
+            for _ in range(10):
+                await response.write(b"x" * 100)
+            await response.write_eof()
+            return response
+
+        app = web.Application()
+        app.router.add_get("/declared", declared)
+        app.router.add_get("/undeclared", undeclared)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def test_download_is_capped(self):
+        for path in ("/declared", "/undeclared"):
+            with self.assertRaises(ValueError):
+                await fetch_image_async(str(self.server.make_url(path)), max_bytes=500)
+        self.assertEqual(len(await fetch_image_async(str(self.server.make_url("/undeclared")), max_bytes=1000)), 1000)
+
+    async def test_download_reserves_its_pieces(self):
+        reserved = []
+        await fetch_image_async(str(self.server.make_url("/declared")), reserve_bytes=reserved.append)
+        self.assertEqual(sum(reserved), 1000)
+
+
+class TestRemoteImageReservation(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.shared_state = SharedState()
+        self.shared_state.REMOTE_IMAGE_SIZE_ESTIMATE = 100
+        self.shared_state.admission = AdmissionController(max_user_bytes=250)
+        self.image_store = ContentStore(tempfile.mkdtemp())
+        patch.object(process_image, "image_store", self.image_store).start()
+        patch.object(process_image.async_database_handler, "add_request_images", AsyncMock()).start()
+        patch.object(process_image, "fetch_image_async", self.fake_fetch).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    async def fake_fetch(self, url, max_bytes=None, reserve_bytes=None):
+        size = int(url.rsplit("/", 1)[1])
+        for _ in range(size // 50):
+            reserve_bytes(50)
+        return (url.encode() * size)[:size]
+
+    def remote(self, image_id, size):
+        return image_processing_pb2.ImageData(image_id=image_id, image_url=f"http://images/{size}", location="remote")
+
+    async def test_growth_beyond_the_estimate_is_reserved(self):
+        admission = self.shared_state.admission
+        admission.admit("a", 200)
+        await process_image.handle_request_async(
+            self.shared_state, "r", [self.remote(1, 50), self.remote(2, 150)], "m", "detect_objects", "a",
+            reserved_bytes=200
+        )
+        self.assertEqual(self.shared_state.request_queue.user_qsize("a"), 1)
+        self.assertEqual(admission.stats()["bytes"], 200)  # The actual size of the images is held
+
+    async def test_remote_images_over_the_quota_reject_the_request(self):
+        admission = self.shared_state.admission
+        admission.admit("a", 200)
+        with self.assertRaises(AdmissionRejected):
+            await process_image.handle_request_async(
+                self.shared_state, "r", [self.remote(1, 1000), self.remote(2, 50)], "m", "detect_objects", "a",
+                reserved_bytes=200
+            )
+        self.assertEqual(admission.stats(), {"requests": 0, "bytes": 0, "users": 0})
+        self.assertEqual(self.shared_state.request_state["r"]["status"], "failed")
+        self.assertFalse(self.image_store._pins)
+
+
+if __name__ == "__main__":
+    unittest.main()
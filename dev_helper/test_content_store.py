@@ -0,0 +1,114 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import image_processing_pb2
+from CloudServer.database_manager import database_handler
+from CloudServer.image_store.content_store import ContentStore
+from CloudServer.processImages import process_image
+from CloudServer.state_manager.shared_request_state import SharedState
+
+
+class TestRemoveUnreferenced(unittest.TestCase):
+
+    def setUp(self):
+        self.image_store = ContentStore(tempfile.mkdtemp())
+        self.referenced = set()
+
+    def get_referenced_digests(self, digests):
+        return {digest for digest in digests if digest in self.referenced}
+
+    def store(self, content):
+        digest, path, _ = self.image_store.put_bytes(content)
+        return digest, path
+
+    def test_keeps_pinned_and_referenced_images(self):
+        pinned, pinned_path = self.store(b"pinned")
+        referenced, referenced_path = self.store(b"referenced")
+        orphaned, orphaned_path = self.store(b"orphaned")
+        self.image_store.unpin(referenced)
+        self.image_store.unpin(orphaned)
+        self.referenced.add(referenced)
+
+        removed = self.image_store.remove_unreferenced(
+            [pinned, referenced, orphaned], self.get_referenced_digests
+        )
+        self.assertEqual(removed, [orphaned])
+        self.assertTrue(os.path.exists(pinned_path))
+        self.assertTrue(os.path.exists(referenced_path))
+        self.assertFalse(os.path.exists(orphaned_path))
+
+    def test_keeps_images_when_references_cannot_be_checked(self):
+        digest, path = self.store(b"image")
+        self.image_store.unpin(digest)
+        self.assertEqual(self.image_store.remove_unreferenced([digest], lambda digests: None), [])
+        self.assertTrue(os.path.exists(path))
+
+    def test_image_recorded_by_a_concurrent_request_is_kept(self):
+        # A deleted request referred to the image; another request stores it again and records it
+        digest, path = self.store(b"shared")
+        self.image_store.unpin(digest)
+        self.store(b"shared")
+        self.referenced.add(digest)  # Its row is committed before it unpins
+        self.image_store.unpin(digest)
+        self.assertEqual(self.image_store.remove_unreferenced([digest], self.get_referenced_digests), [])
+        self.assertTrue(os.path.exists(path))
+
+
+class TestFailedRequestsLeaveNoFiles(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.shared_state = SharedState()
+        self.image_store = ContentStore(tempfile.mkdtemp())
+        self.referenced = set()
+        patch.object(process_image, "image_store", self.image_store).start()
+        patch.object(
+            process_image.database_handler, "get_referenced_digests",
+            lambda digests: {digest for digest in digests if digest in self.referenced}
+        ).start()
+        patch.object(
+            process_image.async_database_handler, "add_request_images",
+            AsyncMock(side_effect=RuntimeError("database down"))
+        ).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    async def test_unrecorded_images_are_removed_unless_referenced(self):
+        shared, shared_path, _ = self.image_store.put_bytes(b"shared")
+        self.image_store.unpin(shared)
+        self.referenced.add(shared)  # Another request refers to this image
+        images = [
+            image_processing_pb2.ImageData(image_id=1, image_data=b"shared", location="local"),
+            image_processing_pb2.ImageData(image_id=2, image_data=b"new", location="local"),
+        ]
+        self.shared_state.admission.admit("a", 9)
+        await process_image.handle_request_async(
+            self.shared_state, "r", images, "m", "detect_objects", "a", reserved_bytes=9
+        )
+        self.assertEqual(self.shared_state.request_state["r"]["status"], "failed")
+        self.assertTrue(os.path.exists(shared_path))
+        self.assertFalse(os.path.exists(self.image_store.path_for(hashlib.sha256(b"new").hexdigest())))
+        self.assertFalse(self.image_store._pins)
+
+
+class TestAddRequestImages(unittest.TestCase):
+
+    def test_repeated_image_ids_are_kept_apart_by_position(self):
+        connection = MagicMock()
+
+        @contextmanager
+        def get_connection():
+            yield connection
+
+        with patch.object(database_handler.db_config, "get_connection", get_connection):
+            database_handler.add_request_images("r", [(7, "d1", 1), (7, "d2", 2)])
+        rows = connection.cursor().executemany.call_args[0][1]
+        self.assertEqual(rows, [("r", 0, 7, "d1", 1), ("r", 1, 7, "d2", 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import builtins
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import image_processing_pb2
+from CloudServer.image_store.content_store import ContentStore
+from CloudServer.processImages import process_image
+from CloudServer.state_manager.shared_request_state import SharedState
+
+
+async def chunks(messages):
+    for message in messages:
+        yield message
+
+
+class TestReceiveUploadedImages(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.image_store = ContentStore(tempfile.mkdtemp())
+        patch.object(process_image, "image_store", self.image_store).start()
+        self.open_files = set()
+        self.most_open_files = 0
+        patch.object(process_image, "open", self.tracking_open, create=True).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def tracking_open(self, path, mode="r"):
+        file = builtins.open(path, mode)
+        close = file.close
+
+        def tracked_close():
+            self.open_files.discard(path)
+            close()
+
+        file.close = tracked_close
+        self.open_files.add(path)
+        self.most_open_files = max(self.most_open_files, len(self.open_files))
+        return file
+
+    async def test_holds_one_open_file_however_many_images(self):
+        first_chunk = image_processing_pb2.ImageUploadChunk(model_name="m", action_type="detect_objects")
+        uploaded = []
+        for image_id in range(300):
+            uploaded.append(image_processing_pb2.ImageUploadChunk(image_id=image_id, chunk_data=b"a%d" % image_id))
+            uploaded.append(image_processing_pb2.ImageUploadChunk(image_id=image_id, chunk_data=b"b"))
+        stored_images, _ = await process_image.receive_uploaded_images("r", first_chunk, chunks(uploaded))
+
+        self.assertEqual(self.most_open_files, 1)
+        self.assertFalse(self.open_files)
+        self.assertEqual(len(stored_images), 300)
+        with open(stored_images[7]["path"], "rb") as file:
+            self.assertEqual(file.read(), b"a7b")
+
+    async def test_refuses_a_chunk_of_a_finished_image(self):
+        first_chunk = image_processing_pb2.ImageUploadChunk(model_name="m", action_type="detect_objects")
+        uploaded = [
+            image_processing_pb2.ImageUploadChunk(image_id=1, chunk_data=b"a"),
+            image_processing_pb2.ImageUploadChunk(image_id=2, chunk_data=b"b"),
+            image_processing_pb2.ImageUploadChunk(image_id=1, chunk_data=b"c"),
+        ]
+        with self.assertRaises(ValueError):
+            await process_image.receive_uploaded_images("r", first_chunk, chunks(uploaded))
+        self.assertFalse(self.open_files)
+        self.assertEqual(os.listdir(self.image_store.tmp_dir), [])  # The partial files are removed
+
+
+class TestImageOrder(unittest.IsolatedAsyncioTestCase):
+
+    async def test_uploaded_and_downloaded_images_are_queued_in_id_order(self):
+        shared_state = SharedState()
+        image_store = ContentStore(tempfile.mkdtemp())
+        patch.object(process_image, "image_store", image_store).start()
+        patch.object(process_image.async_database_handler, "add_request_images", AsyncMock()).start()
+        patch.object(process_image, "fetch_image_async", AsyncMock(return_value=b"remote")).start()
+        self.addCleanup(patch.stopall)
+
+        uploaded = [image_store.put_bytes(b"local")]
+        stored_images = [process_image.image_reference(2, *uploaded[0])]
+        remote = [image_processing_pb2.ImageData(image_id=1, image_url="http://images/1", location="remote")]
+        shared_state.admission.admit("a", 100)
+        await process_image.handle_request_async(
+            shared_state, "r", remote, "m", "detect_objects", "a", stored_images=stored_images, reserved_bytes=100
+        )
+        (_, processed_images, *_), _ = await shared_state.request_queue.get()
+        self.assertEqual([image["id"] for image in processed_images], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
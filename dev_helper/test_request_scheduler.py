@@ -0,0 +1,65 @@
+import unittest
+
+from CloudServer.state_manager.request_scheduler import FairRequestScheduler
+
+
+class TestFairRequestScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def drain(self, scheduler, count):
+        """Dispatches and completes count requests, returning their items in dispatch order"""
+        order = []
+        for _ in range(count):
+            item, user_email = await scheduler.get()
+            order.append(item)
+            await scheduler.complete(user_email)
+        return order
+
+    async def test_priority_orders_requests_within_a_user(self):
+        scheduler = FairRequestScheduler()
+        await scheduler.put("low", "a", priority=0)
+        await scheduler.put("high", "a", priority=5)
+        self.assertEqual(await self.drain(scheduler, 2), ["high", "low"])
+
+    async def test_high_priority_user_does_not_starve_others(self):
+        scheduler = FairRequestScheduler()
+        for index in range(4):
+            await scheduler.put(f"a{index}", "a", priority=9)
+        for index in range(4):
+            await scheduler.put(f"b{index}", "b", priority=0)
+        order = await self.drain(scheduler, 8)
+        # The users alternate, whatever priority their requests claim
+        self.assertEqual([item[0] for item in order], ["a", "b"] * 4)
+
+    async def test_large_requests_take_turns_by_cost(self):
+        scheduler = FairRequestScheduler()
+        await scheduler.put("big", "a", cost=100)
+        await scheduler.put("big2", "a", cost=100)
+        for index in range(3):
+            await scheduler.put(f"small{index}", "b", cost=1)
+        order = await self.drain(scheduler, 5)
+        self.assertLess(order.index("small2"), order.index("big2"))
+
+    async def test_weights_share_images_proportionally(self):
+        scheduler = FairRequestScheduler(user_weights={"a": 2.0})
+        for index in range(6):
+            await scheduler.put(f"a{index}", "a")
+            await scheduler.put(f"b{index}", "b")
+        order = await self.drain(scheduler, 6)
+        self.assertEqual(sum(1 for item in order if item.startswith("a")), 4)
+
+    async def test_per_user_concurrency_cap(self):
+        scheduler = FairRequestScheduler(max_concurrent_per_user=1)
+        await scheduler.put("a0", "a")
+        await scheduler.put("a1", "a")
+        await scheduler.put("b0", "b")
+        first, _ = await scheduler.get()
+        second, _ = await scheduler.get()
+        self.assertEqual((first, second), ("a0", "b0"))  # a1 waits for a0 to complete
+        self.assertEqual(scheduler.user_qsize("a"), 1)
+        await scheduler.complete("a")
+        third, _ = await scheduler.get()
+        self.assertEqual(third, "a1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from CloudServer.dispatch_manager.result_cache import ResultCache
+from CloudServer.state_manager.worker_pool import WorkerPool
+
+
+def key(digest, model_format="eager", version="v1"):
+    return digest, "yolov5", model_format, version, "detect_objects"
+
+
+class TestResultCache(unittest.IsolatedAsyncioTestCase):
+
+    async def test_hit_and_miss(self):
+        cache = ResultCache()
+        cache.put(key("a"), {"boxes": [1]})
+        self.assertEqual(await cache.get_many([key("a"), key("b")]), [{"boxes": [1]}, None])
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (1, 1))
+
+    async def test_evicts_least_recently_used_entries(self):
+        cache = ResultCache(max_bytes=20)
+        cache.put(key("a"), "x" * 6)
+        cache.put(key("b"), "y" * 6)
+        await cache.get(key("a"))  # a is now more recently used than b
+        cache.put(key("c"), "z" * 6)
+        self.assertIsNone(await cache.get(key("b")))
+        self.assertIsNotNone(await cache.get(key("a")))
+        self.assertLessEqual(cache.stats()["bytes"], 20)
+
+    async def test_formats_are_cached_separately(self):
+        cache = ResultCache()
+        cache.put(key("a", model_format="eager"), "eager result")
+        self.assertIsNone(await cache.get(key("a", model_format="int8_static")))
+
+    async def test_new_version_drops_results_of_other_versions(self):
+        cache = ResultCache()
+        cache.set_version("yolov5", "eager", "detect_objects", "v1")
+        cache.put(key("a", version="v1"), "old")
+        cache.put(key("a", model_format="torchscript", version="v1"), "other format")
+        cache.set_version("yolov5", "eager", "detect_objects", "v2")
+        self.assertIsNone(await cache.get(key("a", version="v1")))
+        self.assertEqual(await cache.get(key("a", model_format="torchscript", version="v1")), "other format")
+
+    async def test_persistent_tier_survives_a_restart(self):
+        path = os.path.join(tempfile.mkdtemp(), "results.sqlite")
+        cache = ResultCache(persist_path=path)
+        cache.set_version("yolov5", "eager", "detect_objects", "v1")
+        cache.put(key("a"), {"boxes": [1]})
+        cache.close()
+
+        cache = ResultCache(persist_path=path)
+        self.assertEqual(await cache.get(key("a")), {"boxes": [1]})
+        cache.set_version("yolov5", "eager", "detect_objects", "v2")
+        self.assertIsNone(await cache.get(key("a")))  # Dropped from memory and from the file
+        cache.close()
+
+        cache = ResultCache(persist_path=path)
+        self.assertIsNone(await cache.get(key("a")))
+        cache.close()
+
+
+class TestServedModel(unittest.TestCase):
+
+    def test_unknown_until_a_worker_reports_its_version(self):
+        pool = WorkerPool("yolov5", "detect_objects", 0, 1, 0, 0)
+        self.assertIsNone(pool.served_model(None))
+        self.assertTrue(pool.record_model_version("eager", "v1", None))
+        self.assertFalse(pool.record_model_version("eager", "v1", None))
+
+    def test_idle_pool_is_trusted_only_while_its_files_are_unchanged(self):
+        pool = WorkerPool("yolov5", "detect_objects", 0, 1, 0, 0)
+        pool.record_model_version("eager", "v1", (("model.pt", 1, 10),))
+        self.assertEqual(pool.served_model((("model.pt", 1, 10),)), ("eager", "v1"))
+        self.assertIsNone(pool.served_model((("model.pt", 2, 10),)))
+        self.assertIsNone(pool.served_model(None))
+
+    def test_active_pool_serves_the_reported_version(self):
+        pool = WorkerPool("yolov5", "detect_objects", 0, 1, 0, 0)
+        pool.record_model_version("eager", "v1", None)
+        pool.add_worker("localhost:6000")
+        self.assertEqual(pool.served_model(None), ("eager", "v1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
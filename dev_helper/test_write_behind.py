@@ -0,0 +1,155 @@
+import unittest
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from CloudServer.database_manager import database_handler
+from CloudServer.database_manager.write_behind import ResultWriteBuffer
+
+
+async def run_inline(func, *args):
+    """Runs a database function on the calling thread instead of the database executor"""
+    return func(*args)
+
+
+class FakeCursor:
+    """Cursor that fails any statement touching a request ID in failing_ids"""
+
+    def __init__(self, existing_ids, failing_ids):
+        self.existing_ids = existing_ids
+        self.failing_ids = failing_ids
+        self.pending = []
+        self.rows = []
+
+    def execute(self, query, params=()):
+        if query.strip().startswith("SELECT"):
+            self.rows = [(request_id,) for request_id in params if request_id in self.existing_ids]
+            return
+        if any(value in self.failing_ids for value in params):
+            raise RuntimeError("foreign key constraint fails")
+        self.pending.append(("update", list(params)))
+
+    def executemany(self, query, rows):
+        if any(row[0] in self.failing_ids for row in rows):
+            raise RuntimeError("foreign key constraint fails")
+        self.pending.extend(("insert", row) for row in rows)
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.committed = []
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.committed.extend(self._cursor.pending)
+        self._cursor.pending = []
+
+    def rollback(self):
+        self._cursor.pending = []
+
+
+class TestSaveResultsAndStatuses(unittest.TestCase):
+
+    def save(self, results, statuses, existing_ids, failing_ids=()):
+        connection = FakeConnection(FakeCursor(set(existing_ids), set(failing_ids)))
+
+        @contextmanager
+        def get_connection():
+            yield connection
+
+        with patch.object(database_handler.db_config, "get_connection", get_connection):
+            outcome = database_handler.save_results_and_statuses(results, statuses)
+        return outcome, connection.committed
+
+    def test_skips_writes_of_deleted_requests(self):
+        outcome, committed = self.save([("a", "{}", "u"), ("gone", "{}", "u")], [("gone", "Success")], {"a"})
+        self.assertEqual(outcome, ({"gone"}, [], []))
+        self.assertEqual(committed, [("insert", ("a", "{}", "u"))])
+
+    def test_falls_back_to_row_writes_when_the_batch_fails(self):
+        results = [("a", "{}", "u"), ("bad", "{}", "u"), ("b", "{}", "u")]
+        outcome, committed = self.save(results, [("a", "Success")], {"a", "b", "bad"}, failing_ids={"bad"})
+        missing_request_ids, failed_results, failed_statuses = outcome
+        self.assertEqual(missing_request_ids, set())
+        self.assertEqual([result for result, _ in failed_results], [("bad", "{}", "u")])
+        self.assertEqual(failed_statuses, [])
+        self.assertIn(("insert", ("a", "{}", "u")), committed)
+        self.assertIn(("insert", ("b", "{}", "u")), committed)
+        self.assertIn(("update", ["a", "Success", "a"]), committed)
+
+
+class TestResultWriteBuffer(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.outcomes = []
+        patch("CloudServer.database_manager.write_behind.run_in_database_executor", run_inline).start()
+        patch.object(database_handler, "save_results_and_statuses", self.fake_save).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def fake_save(self, results, statuses):
+        self.calls.append((list(results), list(statuses)))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def test_successful_flush_empties_the_buffer(self):
+        buffer = ResultWriteBuffer()
+        buffer.add_result("a", "{}", "u")
+        buffer.update_request_status("a", "Success")
+        self.outcomes = [(set(), [], [])]
+        await buffer.flush()
+        self.assertEqual(buffer.depth, 0)
+        self.assertEqual(self.calls, [([("a", "{}", "u")], [("a", "Success")])])
+
+    async def test_only_failed_rows_are_retried_and_then_dropped(self):
+        buffer = ResultWriteBuffer(max_attempts=2)
+        buffer.add_result("a", "{}", "u")
+        buffer.add_result("bad", "{}", "u")
+        buffer.update_request_status("a", "Success")
+        failure = [(("bad", "{}", "u"), "foreign key constraint fails")]
+        self.outcomes = [(set(), failure, []), (set(), failure, [])]
+
+        await buffer.flush()
+        self.assertEqual(self.calls[-1][0], [("a", "{}", "u"), ("bad", "{}", "u")])
+        self.assertEqual(buffer.depth, 1)  # Only the failed result is pending again
+
+        await buffer.flush()
+        self.assertEqual(self.calls[-1], ([("bad", "{}", "u")], []))
+        self.assertEqual(buffer.depth, 0)  # Dropped after max_attempts failed flushes
+
+    async def test_unavailable_database_retries_everything_keeping_newer_statuses(self):
+        buffer = ResultWriteBuffer(max_attempts=3)
+        buffer.add_result("a", "{}", "u")
+        buffer.update_request_status("a", "Processing")
+        self.outcomes = [None]
+        await buffer.flush()
+        self.assertEqual(buffer.depth, 2)
+
+        buffer.update_request_status("a", "Success")
+        self.outcomes = [(set(), [], [])]
+        await buffer.flush()
+        self.assertEqual(self.calls[-1], ([("a", "{}", "u")], [("a", "Success")]))
+        self.assertEqual(buffer.depth, 0)
+
+    async def test_raising_flush_counts_as_a_failed_attempt(self):
+        buffer = ResultWriteBuffer(max_attempts=1)
+        buffer.add_result("a", "{}", "u")
+        self.outcomes = [RuntimeError("connection lost")]
+        await buffer.flush()
+        self.assertEqual(buffer.depth, 0)  # One attempt allowed, so the write is dropped
+
+
+if __name__ == "__main__":
+    unittest.main()
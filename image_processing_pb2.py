@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16image_processing.proto\"D\n\x0fUserCredentials\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08username\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\"\x9b\x01\n\x13ProcessImageRequest\x12\x1e\n\x04user\x18\x02 \x01(\x0b\x32\x10.UserCredentials\x12\x1a\n\x06images\x18\x03 \x03(\x0b\x32\n.ImageData\x12\x12\n\nmodel_name\x18\x04 \x01(\t\x12\x13\n\x0b\x61\x63tion_type\x18\x05 \x01(\t\x12\x1f\n\x17number_of_remote_images\x18\x06 \x01(\x03\"V\n\tImageData\x12\x12\n\nimage_data\x18\x02 \x01(\x0c\x12\x10\n\x08image_id\x18\x01 \x01(\x03\x12\x11\n\timage_url\x18\x03 \x01(\t\x12\x10\n\x08location\x18\x04 \x01(\t\"G\n\x12RemoteImageRequest\x12\x1e\n\x04user\x18\x01 \x01(\x0b\x32\x10.UserCredentials\x12\x11\n\timage_url\x18\x02 \x01(\t\"*\n\x14ProcessImageResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\t\"B\n\x0cQueryRequest\x12\x1e\n\x04user\x18\x01 \x01(\x0b\x32\x10.UserCredentials\x12\x12\n\nrequest_id\x18\x02 \x01(\t\"5\n\x0eResultResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x13\n\x0bresult_data\x18\x02 \x01(\t\"\x0e\n\x0c\x45mptyRequest\"F\n\x10ReprocessRequest\x12\x1e\n\x04user\x18\x01 \x01(\x0b\x32\x10.UserCredentials\x12\x12\n\nrequest_id\x18\x02 \x01(\t\"N\n\x17ReprocessResultResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x12\n\nrequest_id\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\".\n\x0cModelRequest\x12\x1e\n\x04user\x18\x01 \x01(\x0b\x32\x10.UserCredentials\"r\n\tModelInfo\x12\x12\n\nmodel_name\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\x12\x0f\n\x07version\x18\x03 \x01(\t\x12\x19\n\x11supported_actions\x18\x04 \x01(\t\x12\x10\n\x08\x61\x63\x63uracy\x18\x05 \x01(\x01\"H\n\x12ModelDetailRequest\x12\x1e\n\x04user\x18\x01 \x01(\x0b\x32\x10.UserCredentials\x12\x12\n\nmodel_name\x18\x02 \x01(\t\"\x8a\x01\n\x0bModelDetail\x12\x12\n\nmodel_name\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\x12\x0f\n\x07version\x18\x03 \x01(\t\x12\x19\n\x11supported_actions\x18\x04 \x01(\t\x12\x10\n\x08\x61\x63\x63uracy\x18\x05 \x01(\x01\x12\x14\n\x0clast_updated\x18\x06 \x01(\t\",\n\x13GetServicesResponse\x12\x15\n\rservice_names\x18\x01 \x03(\t\"7\n\x0c\x43hunkRequest\x12\x12\n\nchunk_data\x18\x01 \x01(\x0c\x12\x13\n\x0b\x61\x63tion_type\x18\x02 \x01(\t\"2\n\rChunkResponse\x12\x0e\n\x06result\x18\x01 \x01(\t\x12\x11\n\tworker_id\x18\x02 \x01(\t\"\x0f\n\rHealthRequest\" \n\x0eHealthResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\"V\n\x12RequestDataRespond\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x16\n\x0erequest_status\x18\x02 \x01(\t\x12\x14\n\x0crequest_date\x18\x03 \x01(\t\"E\n\x12WorkerRegistration\x12\x11\n\tworker_id\x18\x01 \x01(\t\x12\x0b\n\x03tag\x18\x02 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x03 \x01(\t\"7\n\x14RegistrationResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x1f\n\x10WorkerTagRequest\x12\x0b\n\x03tag\x18\x01 \x01(\t\"/\n\x0fWorkersResponse\x12\x1c\n\x07workers\x18\x01 \x03(\x0b\x32\x0b.WorkerInfo\"=\n\nWorkerInfo\x12\x11\n\tworker_id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x0b\n\x03tag\x18\x03 \x01(\t2\xc3\x04\n\rMasterService\x12;\n\x0cProcessImage\x12\x14.ProcessImageRequest\x1a\x15.ProcessImageResponse\x12=\n\x0eReprocessImage\x12\x11.ReprocessRequest\x1a\x18.ReprocessResultResponse\x12-\n\x0bQueryResult\x12\r.QueryRequest\x1a\x0f.ResultResponse\x12\x32\n\x0bGetServices\x12\r.EmptyRequest\x1a\x14.GetServicesResponse\x12(\n\tGetModels\x12\r.ModelRequest\x1a\n.ModelInfo0\x01\x12\x34\n\x0fGetModelDetails\x12\x13.ModelDetailRequest\x1a\x0c.ModelDetail\x12<\n\x11GetAllUserRequest\x12\x10.UserCredentials\x1a\x13.RequestDataRespond0\x01\x12?\n\x17\x44\x65leteProcessingRequest\x12\r.QueryRequest\x1a\x15.ProcessImageResponse\x12\x36\n\x0fGetWorkersByTag\x12\x11.WorkerTagRequest\x1a\x10.WorkersResponse\x12<\n\x0eRegisterWorker\x12\x13.WorkerRegistration\x1a\x15.RegistrationResponse2n\n\rWorkerService\x12-\n\x0cProcessChunk\x12\r.ChunkRequest\x1a\x0e.ChunkResponse\x12.\n\x0bHealthCheck\x12\x0e.HealthRequest\x1a\x0f.HealthResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16image_processing.proto\"D\n\x0fUserCredentials\x12\r\n\x05\x65mail\x18\x01 \x01(\t\x12\x10\n\x08username\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\"\xad\x01\n\x13ProcessImageRequest\x12\x1e\n\x04user\x18\x02 \x01(\x0b\x32\x10.UserCredentials\x12\x1a\n\x06images\x18\x03 \x03(\x0b\x32\n.ImageData\x12\x12\n\nmodel_name\x18\x04 \x01(\t\x12\x13\n\x0b\x61\x63tion_type\x18\x05 \x01(\t\x12\x1f\n\x17number_of_remote_images\x18\x06 \x01(\x03\x12\x10\n\x08priority\x18\x07 \x01(\x05\"V\n\tImageData\x12\x12\n\nimage_data\x18\x02 \x01(\x0c\x12\x10\n\x08image_id\x18\x01 \x01(\x03\x12\x11\n\timage_url\x18\x03 \x01(\t\x12\x10\n\x08location\x18\x04 \x01(\t\"\xa6\x01\n\x10ImageUploadChunk\x12\x1e\n\x04user\x18\x01 \x01(\x0b\x32\x10.UserCredentials\x12\x12\n\nmodel_name\x18\x02 \x01(\t\x12\x13\n\x0b\x61\x63tion_type\x18\x03 \x01(\t\x12\x10\n\x08image_id\x18\x04 \x01(\x03\x12\x12\n\nchunk_data\x18\x05 \x01(\x0c\x12\x11\n\timage_url\x18\x06 \x01(\t\x12\x10\n\x08priority\x18\x07 \x01(\x05\"G\n\x12RemoteImageRequest\x12\x1e\n\x04user\x18\x01 \x01(\x0b\x32\x10.UserCredentials\x12\x11\n\timage_url\x18\x02 \x01(\t\"*\n\x14ProcessImageResponse\x12\x12\n\nrequest_id\x18\x01 \x01(\t\"B\n\x0cQueryRequest\x12\x1e\n\x04user\x18\x01 \x01(\x0b\x32\x10.UserCredentials\x12\x12\n\nrequest_id\x18\x02 \x01(\t\"5\n\x0eResultResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x13\n\x0bresult_data\x18\x02 \x01(\t\"\x0e\n\x0c\x45mptyRequest\"X\n\x10ReprocessRequest\x12\x1e\n\x04user\x18\x01 \x01(\x0b\x32\x10.UserCredentials\x12\x12\n\nrequest_id\x18\x02 \x01(\t\x12\x10\n\x08priority\x18\x03 \x01(\x05\"N\n\x17ReprocessResultResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x12\n\nrequest_id\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\".\n\x0cModelRequest\x12\x1e\n\x04user\x18\x01 \x01(\x0b\x32\x10.UserCredentials\"r\n\tModelInfo\x12\x12\n\nmodel_name\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\x12\x0f\n\x07version\x18\x03 \x01(\t\x12\x19\n\x11supported_actions\x18\x04 \x01(\t\x12\x10\n\x08\x61\x63\x63uracy\x18\x05 \x01(\x01\"H\n\x12ModelDetailRequest\x12\x1e\n\x04user\x18\x01 \x01(\x0b\x32\x10.UserCredentials\x12\x12\n\nmodel_name\x18\x02 \x01(\t\"\x8a\x01\n\x0bModelDetail\x12\x12\n\nmodel_name\x18\x01 \x01(\t\x12\x13\n\x0b\x64\x65scription\x18\x02 \x01(\t\x12\x0f\n\x07version\x18\x03 \x01(\t\x12\x19\n\x11supported_actions\x18\x04 \x01(\t\x12\x10\n\x08\x61\x63\x63uracy\x18\x05 \x01(\x01\x12\x14\n\x0clast_updated\x18\x06 \x01(\t\",\n\x13GetServicesResponse\x12\x15\n\rservice_names\x18\x01 \x03(\t\"7\n\x0c\x43hunkRequest\x12\x12\n\nchunk_data\x18\x01 \x01(\x0c\x12\x13\n\x0b\x61\x63tion_type\x18\x02 \x01(\t\"2\n\rChunkResponse\x12\x0e\n\x06result\x18\x01 \x01(\t\x12\x11\n\tworker_id\x18\x02 \x01(\t\">\n\x0c\x42\x61tchRequest\x12\x19\n\x05items\x18\x01 \x03(\x0b\x32\n.BatchItem\x12\x13\n\x0b\x61\x63tion_type\x18\x02 \x01(\t\"1\n\tBatchItem\x12\x10\n\x08image_id\x18\x01 \x01(\x03\x12\x12\n\nchunk_data\x18\x02 \x01(\x0c\"\\\n\rBatchResponse\x12!\n\x07results\x18\x01 \x03(\x0b\x32\x10.BatchItemResult\x12\x11\n\tworker_id\x18\x02 \x01(\t\x12\x15\n\rmodel_version\x18\x03 \x01(\t\"B\n\x0f\x42\x61tchItemResult\x12\x10\n\x08image_id\x18\x01 \x01(\x03\x12\x0e\n\x06result\x18\x02 \x01(\t\x12\r\n\x05\x65rror\x18\x03 \x01(\t\"\x0f\n\rHealthRequest\" \n\x0eHealthResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\"V\n\x12RequestDataRespond\x12\x12\n\nrequest_id\x18\x01 \x01(\t\x12\x16\n\x0erequest_status\x18\x02 \x01(\t\x12\x14\n\x0crequest_date\x18\x03 \x01(\t\"\x9b\x01\n\x12WorkerRegistration\x12\x11\n\tworker_id\x18\x01 \x01(\t\x12\x0b\n\x03tag\x18\x02 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x03 \x01(\t\x12\x12\n\nmodel_type\x18\x04 \x01(\t\x12\x13\n\x0b\x61\x63tion_type\x18\x05 \x01(\t\x12\x14\n\x0cmodel_format\x18\x06 \x01(\t\x12\x15\n\rmodel_version\x18\x07 \x01(\t\"7\n\x14RegistrationResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x1f\n\x10WorkerTagRequest\x12\x0b\n\x03tag\x18\x01 \x01(\t\"/\n\x0fWorkersResponse\x12\x1c\n\x07workers\x18\x01 \x03(\x0b\x32\x0b.WorkerInfo\"_\n\nWorkerInfo\x12\x11\n\tworker_id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x0b\n\x03tag\x18\x03 \x01(\t\x12\r\n\x05vm_id\x18\x04 \x01(\t\x12\x11\n\tvm_status\x18\x05 \x01(\t\" \n\x0fVMStatusRequest\x12\r\n\x05vm_id\x18\x01 \x01(\t\"X\n\x10VMStatusResponse\x12\r\n\x05vm_id\x18\x01 \x01(\t\x12\x0e\n\x06status\x18\x02 \x01(\t\x12\x12\n\nip_address\x18\x03 \x01(\t\x12\x11\n\tworker_id\x18\x04 \x01(\t2\xb3\x05\n\rMasterService\x12;\n\x0cProcessImage\x12\x14.ProcessImageRequest\x1a\x15.ProcessImageResponse\x12:\n\x0cUploadImages\x12\x11.ImageUploadChunk\x1a\x15.ProcessImageResponse(\x01\x12=\n\x0eReprocessImage\x12\x11.ReprocessRequest\x1a\x18.ReprocessResultResponse\x12-\n\x0bQueryResult\x12\r.QueryRequest\x1a\x0f.ResultResponse\x12\x32\n\x0bGetServices\x12\r.EmptyRequest\x1a\x14.GetServicesResponse\x12(\n\tGetModels\x12\r.ModelRequest\x1a\n.ModelInfo0\x01\x12\x34\n\x0fGetModelDetails\x12\x13.ModelDetailRequest\x1a\x0c.ModelDetail\x12<\n\x11GetAllUserRequest\x12\x10.UserCredentials\x1a\x13.RequestDataRespond0\x01\x12?\n\x17\x44\x65leteProcessingRequest\x12\r.QueryRequest\x1a\x15.ProcessImageResponse\x12\x36\n\x0fGetWorkersByTag\x12\x11.WorkerTagRequest\x1a\x10.WorkersResponse\x12<\n\x0eRegisterWorker\x12\x13.WorkerRegistration\x1a\x15.RegistrationResponse\x12\x32\n\x0bGetVMStatus\x12\x10.VMStatusRequest\x1a\x11.VMStatusResponse2\x9d\x01\n\rWorkerService\x12-\n\x0cProcessChunk\x12\r.ChunkRequest\x1a\x0e.ChunkResponse\x12-\n\x0cProcessBatch\x12\r.BatchRequest\x1a\x0e.BatchResponse\x12.\n\x0bHealthCheck\x12\x0e.HealthRequest\x1a\x0f.HealthResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -34,55 +34,69 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_USERCREDENTIALS']._serialized_start=26
   _globals['_USERCREDENTIALS']._serialized_end=94
   _globals['_PROCESSIMAGEREQUEST']._serialized_start=97
-  _globals['_PROCESSIMAGEREQUEST']._serialized_end=252
-  _globals['_IMAGEDATA']._serialized_start=254
-  _globals['_IMAGEDATA']._serialized_end=340
-  _globals['_REMOTEIMAGEREQUEST']._serialized_start=342
-  _globals['_REMOTEIMAGEREQUEST']._serialized_end=413
-  _globals['_PROCESSIMAGERESPONSE']._serialized_start=415
-  _globals['_PROCESSIMAGERESPONSE']._serialized_end=457
-  _globals['_QUERYREQUEST']._serialized_start=459
-  _globals['_QUERYREQUEST']._serialized_end=525
-  _globals['_RESULTRESPONSE']._serialized_start=527
-  _globals['_RESULTRESPONSE']._serialized_end=580
-  _globals['_EMPTYREQUEST']._serialized_start=582
-  _globals['_EMPTYREQUEST']._serialized_end=596
-  _globals['_REPROCESSREQUEST']._serialized_start=598
-  _globals['_REPROCESSREQUEST']._serialized_end=668
-  _globals['_REPROCESSRESULTRESPONSE']._serialized_start=670
-  _globals['_REPROCESSRESULTRESPONSE']._serialized_end=748
-  _globals['_MODELREQUEST']._serialized_start=750
-  _globals['_MODELREQUEST']._serialized_end=796
-  _globals['_MODELINFO']._serialized_start=798
-  _globals['_MODELINFO']._serialized_end=912
-  _globals['_MODELDETAILREQUEST']._serialized_start=914
-  _globals['_MODELDETAILREQUEST']._serialized_end=986
-  _globals['_MODELDETAIL']._serialized_start=989
-  _globals['_MODELDETAIL']._serialized_end=1127
-  _globals['_GETSERVICESRESPONSE']._serialized_start=1129
-  _globals['_GETSERVICESRESPONSE']._serialized_end=1173
-  _globals['_CHUNKREQUEST']._serialized_start=1175
-  _globals['_CHUNKREQUEST']._serialized_end=1230
-  _globals['_CHUNKRESPONSE']._serialized_start=1232
-  _globals['_CHUNKRESPONSE']._serialized_end=1282
-  _globals['_HEALTHREQUEST']._serialized_start=1284
-  _globals['_HEALTHREQUEST']._serialized_end=1299
-  _globals['_HEALTHRESPONSE']._serialized_start=1301
-  _globals['_HEALTHRESPONSE']._serialized_end=1333
-  _globals['_REQUESTDATARESPOND']._serialized_start=1335
-  _globals['_REQUESTDATARESPOND']._serialized_end=1421
-  _globals['_WORKERREGISTRATION']._serialized_start=1423
-  _globals['_WORKERREGISTRATION']._serialized_end=1492
-  _globals['_REGISTRATIONRESPONSE']._serialized_start=1494
-  _globals['_REGISTRATIONRESPONSE']._serialized_end=1549
-  _globals['_WORKERTAGREQUEST']._serialized_start=1551
-  _globals['_WORKERTAGREQUEST']._serialized_end=1582
-  _globals['_WORKERSRESPONSE']._serialized_start=1584
-  _globals['_WORKERSRESPONSE']._serialized_end=1631
-  _globals['_WORKERINFO']._serialized_start=1633
-  _globals['_WORKERINFO']._serialized_end=1694
-  _globals['_MASTERSERVICE']._serialized_start=1697
-  _globals['_MASTERSERVICE']._serialized_end=2276
-  _globals['_WORKERSERVICE']._serialized_start=2278
-  _globals['_WORKERSERVICE']._serialized_end=2388
+  _globals['_PROCESSIMAGEREQUEST']._serialized_end=270
+  _globals['_IMAGEDATA']._serialized_start=272
+  _globals['_IMAGEDATA']._serialized_end=358
+  _globals['_IMAGEUPLOADCHUNK']._serialized_start=361
+  _globals['_IMAGEUPLOADCHUNK']._serialized_end=527
+  _globals['_REMOTEIMAGEREQUEST']._serialized_start=529
+  _globals['_REMOTEIMAGEREQUEST']._serialized_end=600
+  _globals['_PROCESSIMAGERESPONSE']._serialized_start=602
+  _globals['_PROCESSIMAGERESPONSE']._serialized_end=644
+  _globals['_QUERYREQUEST']._serialized_start=646
+  _globals['_QUERYREQUEST']._serialized_end=712
+  _globals['_RESULTRESPONSE']._serialized_start=714
+  _globals['_RESULTRESPONSE']._serialized_end=767
+  _globals['_EMPTYREQUEST']._serialized_start=769
+  _globals['_EMPTYREQUEST']._serialized_end=783
+  _globals['_REPROCESSREQUEST']._serialized_start=785
+  _globals['_REPROCESSREQUEST']._serialized_end=873
+  _globals['_REPROCESSRESULTRESPONSE']._serialized_start=875
+  _globals['_REPROCESSRESULTRESPONSE']._serialized_end=953
+  _globals['_MODELREQUEST']._serialized_start=955
+  _globals['_MODELREQUEST']._serialized_end=1001
+  _globals['_MODELINFO']._serialized_start=1003
+  _globals['_MODELINFO']._serialized_end=1117
+  _globals['_MODELDETAILREQUEST']._serialized_start=1119
+  _globals['_MODELDETAILREQUEST']._serialized_end=1191
+  _globals['_MODELDETAIL']._serialized_start=1194
+  _globals['_MODELDETAIL']._serialized_end=1332
+  _globals['_GETSERVICESRESPONSE']._serialized_start=1334
+  _globals['_GETSERVICESRESPONSE']._serialized_end=1378
+  _globals['_CHUNKREQUEST']._serialized_start=1380
+  _globals['_CHUNKREQUEST']._serialized_end=1435
+  _globals['_CHUNKRESPONSE']._serialized_start=1437
+  _globals['_CHUNKRESPONSE']._serialized_end=1487
+  _globals['_BATCHREQUEST']._serialized_start=1489
+  _globals['_BATCHREQUEST']._serialized_end=1551
+  _globals['_BATCHITEM']._serialized_start=1553
+  _globals['_BATCHITEM']._serialized_end=1602
+  _globals['_BATCHRESPONSE']._serialized_start=1604
+  _globals['_BATCHRESPONSE']._serialized_end=1696
+  _globals['_BATCHITEMRESULT']._serialized_start=1698
+  _globals['_BATCHITEMRESULT']._serialized_end=1764
+  _globals['_HEALTHREQUEST']._serialized_start=1766
+  _globals['_HEALTHREQUEST']._serialized_end=1781
+  _globals['_HEALTHRESPONSE']._serialized_start=1783
+  _globals['_HEALTHRESPONSE']._serialized_end=1815
+  _globals['_REQUESTDATARESPOND']._serialized_start=1817
+  _globals['_REQUESTDATARESPOND']._serialized_end=1903
+  _globals['_WORKERREGISTRATION']._serialized_start=1906
+  _globals['_WORKERREGISTRATION']._serialized_end=2061
+  _globals['_REGISTRATIONRESPONSE']._serialized_start=2063
+  _globals['_REGISTRATIONRESPONSE']._serialized_end=2118
+  _globals['_WORKERTAGREQUEST']._serialized_start=2120
+  _globals['_WORKERTAGREQUEST']._serialized_end=2151
+  _globals['_WORKERSRESPONSE']._serialized_start=2153
+  _globals['_WORKERSRESPONSE']._serialized_end=2200
+  _globals['_WORKERINFO']._serialized_start=2202
+  _globals['_WORKERINFO']._serialized_end=2297
+  _globals['_VMSTATUSREQUEST']._serialized_start=2299
+  _globals['_VMSTATUSREQUEST']._serialized_end=2331
+  _globals['_VMSTATUSRESPONSE']._serialized_start=2333
+  _globals['_VMSTATUSRESPONSE']._serialized_end=2421
+  _globals['_MASTERSERVICE']._serialized_start=2424
+  _globals['_MASTERSERVICE']._serialized_end=3115
+  _globals['_WORKERSERVICE']._serialized_start=3118
+  _globals['_WORKERSERVICE']._serialized_end=3275
 # @@protoc_insertion_point(module_scope)
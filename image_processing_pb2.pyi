@@ -16,18 +16,20 @@ class UserCredentials(_message.Message):
     def __init__(self, email: _Optional[str] = ..., username: _Optional[str] = ..., password: _Optional[str] = ...) -> None: ...
 
 class ProcessImageRequest(_message.Message):
-    __slots__ = ("user", "images", "model_name", "action_type", "number_of_remote_images")
+    __slots__ = ("user", "images", "model_name", "action_type", "number_of_remote_images", "priority")
     USER_FIELD_NUMBER: _ClassVar[int]
     IMAGES_FIELD_NUMBER: _ClassVar[int]
     MODEL_NAME_FIELD_NUMBER: _ClassVar[int]
     ACTION_TYPE_FIELD_NUMBER: _ClassVar[int]
     NUMBER_OF_REMOTE_IMAGES_FIELD_NUMBER: _ClassVar[int]
+    PRIORITY_FIELD_NUMBER: _ClassVar[int]
     user: UserCredentials
     images: _containers.RepeatedCompositeFieldContainer[ImageData]
     model_name: str
     action_type: str
     number_of_remote_images: int
-    def __init__(self, user: _Optional[_Union[UserCredentials, _Mapping]] = ..., images: _Optional[_Iterable[_Union[ImageData, _Mapping]]] = ..., model_name: _Optional[str] = ..., action_type: _Optional[str] = ..., number_of_remote_images: _Optional[int] = ...) -> None: ...
+    priority: int
+    def __init__(self, user: _Optional[_Union[UserCredentials, _Mapping]] = ..., images: _Optional[_Iterable[_Union[ImageData, _Mapping]]] = ..., model_name: _Optional[str] = ..., action_type: _Optional[str] = ..., number_of_remote_images: _Optional[int] = ..., priority: _Optional[int] = ...) -> None: ...
 
 class ImageData(_message.Message):
     __slots__ = ("image_data", "image_id", "image_url", "location")
@@ -41,6 +43,24 @@ class ImageData(_message.Message):
     location: str
     def __init__(self, image_data: _Optional[bytes] = ..., image_id: _Optional[int] = ..., image_url: _Optional[str] = ..., location: _Optional[str] = ...) -> None: ...
 
+class ImageUploadChunk(_message.Message):
+    __slots__ = ("user", "model_name", "action_type", "image_id", "chunk_data", "image_url", "priority")
+    USER_FIELD_NUMBER: _ClassVar[int]
+    MODEL_NAME_FIELD_NUMBER: _ClassVar[int]
+    ACTION_TYPE_FIELD_NUMBER: _ClassVar[int]
+    IMAGE_ID_FIELD_NUMBER: _ClassVar[int]
+    CHUNK_DATA_FIELD_NUMBER: _ClassVar[int]
+    IMAGE_URL_FIELD_NUMBER: _ClassVar[int]
+    PRIORITY_FIELD_NUMBER: _ClassVar[int]
+    user: UserCredentials
+    model_name: str
+    action_type: str
+    image_id: int
+    chunk_data: bytes
+    image_url: str
+    priority: int
+    def __init__(self, user: _Optional[_Union[UserCredentials, _Mapping]] = ..., model_name: _Optional[str] = ..., action_type: _Optional[str] = ..., image_id: _Optional[int] = ..., chunk_data: _Optional[bytes] = ..., image_url: _Optional[str] = ..., priority: _Optional[int] = ...) -> None: ...
+
 class RemoteImageRequest(_message.Message):
     __slots__ = ("user", "image_url")
     USER_FIELD_NUMBER: _ClassVar[int]
@@ -76,12 +96,14 @@ class EmptyRequest(_message.Message):
     def __init__(self) -> None: ...
 
 class ReprocessRequest(_message.Message):
-    __slots__ = ("user", "request_id")
+    __slots__ = ("user", "request_id", "priority")
     USER_FIELD_NUMBER: _ClassVar[int]
     REQUEST_ID_FIELD_NUMBER: _ClassVar[int]
+    PRIORITY_FIELD_NUMBER: _ClassVar[int]
     user: UserCredentials
     request_id: str
-    def __init__(self, user: _Optional[_Union[UserCredentials, _Mapping]] = ..., request_id: _Optional[str] = ...) -> None: ...
+    priority: int
+    def __init__(self, user: _Optional[_Union[UserCredentials, _Mapping]] = ..., request_id: _Optional[str] = ..., priority: _Optional[int] = ...) -> None: ...
 
 class ReprocessResultResponse(_message.Message):
     __slots__ = ("status", "request_id", "message")
@@ -159,6 +181,42 @@ class ChunkResponse(_message.Message):
     worker_id: str
     def __init__(self, result: _Optional[str] = ..., worker_id: _Optional[str] = ...) -> None: ...
 
+class BatchRequest(_message.Message):
+    __slots__ = ("items", "action_type")
+    ITEMS_FIELD_NUMBER: _ClassVar[int]
+    ACTION_TYPE_FIELD_NUMBER: _ClassVar[int]
+    items: _containers.RepeatedCompositeFieldContainer[BatchItem]
+    action_type: str
+    def __init__(self, items: _Optional[_Iterable[_Union[BatchItem, _Mapping]]] = ..., action_type: _Optional[str] = ...) -> None: ...
+
+class BatchItem(_message.Message):
+    __slots__ = ("image_id", "chunk_data")
+    IMAGE_ID_FIELD_NUMBER: _ClassVar[int]
+    CHUNK_DATA_FIELD_NUMBER: _ClassVar[int]
+    image_id: int
+    chunk_data: bytes
+    def __init__(self, image_id: _Optional[int] = ..., chunk_data: _Optional[bytes] = ...) -> None: ...
+
+class BatchResponse(_message.Message):
+    __slots__ = ("results", "worker_id", "model_version")
+    RESULTS_FIELD_NUMBER: _ClassVar[int]
+    WORKER_ID_FIELD_NUMBER: _ClassVar[int]
+    MODEL_VERSION_FIELD_NUMBER: _ClassVar[int]
+    results: _containers.RepeatedCompositeFieldContainer[BatchItemResult]
+    worker_id: str
+    model_version: str
+    def __init__(self, results: _Optional[_Iterable[_Union[BatchItemResult, _Mapping]]] = ..., worker_id: _Optional[str] = ..., model_version: _Optional[str] = ...) -> None: ...
+
+class BatchItemResult(_message.Message):
+    __slots__ = ("image_id", "result", "error")
+    IMAGE_ID_FIELD_NUMBER: _ClassVar[int]
+    RESULT_FIELD_NUMBER: _ClassVar[int]
+    ERROR_FIELD_NUMBER: _ClassVar[int]
+    image_id: int
+    result: str
+    error: str
+    def __init__(self, image_id: _Optional[int] = ..., result: _Optional[str] = ..., error: _Optional[str] = ...) -> None: ...
+
 class HealthRequest(_message.Message):
     __slots__ = ()
     def __init__(self) -> None: ...
@@ -180,14 +238,22 @@ class RequestDataRespond(_message.Message):
     def __init__(self, request_id: _Optional[str] = ..., request_status: _Optional[str] = ..., request_date: _Optional[str] = ...) -> None: ...
 
 class WorkerRegistration(_message.Message):
-    __slots__ = ("worker_id", "tag", "address")
+    __slots__ = ("worker_id", "tag", "address", "model_type", "action_type", "model_format", "model_version")
     WORKER_ID_FIELD_NUMBER: _ClassVar[int]
     TAG_FIELD_NUMBER: _ClassVar[int]
     ADDRESS_FIELD_NUMBER: _ClassVar[int]
+    MODEL_TYPE_FIELD_NUMBER: _ClassVar[int]
+    ACTION_TYPE_FIELD_NUMBER: _ClassVar[int]
+    MODEL_FORMAT_FIELD_NUMBER: _ClassVar[int]
+    MODEL_VERSION_FIELD_NUMBER: _ClassVar[int]
     worker_id: str
     tag: str
     address: str
-    def __init__(self, worker_id: _Optional[str] = ..., tag: _Optional[str] = ..., address: _Optional[str] = ...) -> None: ...
+    model_type: str
+    action_type: str
+    model_format: str
+    model_version: str
+    def __init__(self, worker_id: _Optional[str] = ..., tag: _Optional[str] = ..., address: _Optional[str] = ..., model_type: _Optional[str] = ..., action_type: _Optional[str] = ..., model_format: _Optional[str] = ..., model_version: _Optional[str] = ...) -> None: ...
 
 class RegistrationResponse(_message.Message):
     __slots__ = ("status", "message")
@@ -210,11 +276,33 @@ class WorkersResponse(_message.Message):
     def __init__(self, workers: _Optional[_Iterable[_Union[WorkerInfo, _Mapping]]] = ...) -> None: ...
 
 class WorkerInfo(_message.Message):
-    __slots__ = ("worker_id", "address", "tag")
+    __slots__ = ("worker_id", "address", "tag", "vm_id", "vm_status")
     WORKER_ID_FIELD_NUMBER: _ClassVar[int]
     ADDRESS_FIELD_NUMBER: _ClassVar[int]
     TAG_FIELD_NUMBER: _ClassVar[int]
+    VM_ID_FIELD_NUMBER: _ClassVar[int]
+    VM_STATUS_FIELD_NUMBER: _ClassVar[int]
     worker_id: str
     address: str
     tag: str
-    def __init__(self, worker_id: _Optional[str] = ..., address: _Optional[str] = ..., tag: _Optional[str] = ...) -> None: ...
+    vm_id: str
+    vm_status: str
+    def __init__(self, worker_id: _Optional[str] = ..., address: _Optional[str] = ..., tag: _Optional[str] = ..., vm_id: _Optional[str] = ..., vm_status: _Optional[str] = ...) -> None: ...
+
+class VMStatusRequest(_message.Message):
+    __slots__ = ("vm_id",)
+    VM_ID_FIELD_NUMBER: _ClassVar[int]
+    vm_id: str
+    def __init__(self, vm_id: _Optional[str] = ...) -> None: ...
+
+class VMStatusResponse(_message.Message):
+    __slots__ = ("vm_id", "status", "ip_address", "worker_id")
+    VM_ID_FIELD_NUMBER: _ClassVar[int]
+    STATUS_FIELD_NUMBER: _ClassVar[int]
+    IP_ADDRESS_FIELD_NUMBER: _ClassVar[int]
+    WORKER_ID_FIELD_NUMBER: _ClassVar[int]
+    vm_id: str
+    status: str
+    ip_address: str
+    worker_id: str
+    def __init__(self, vm_id: _Optional[str] = ..., status: _Optional[str] = ..., ip_address: _Optional[str] = ..., worker_id: _Optional[str] = ...) -> None: ...
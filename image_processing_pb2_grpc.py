@@ -39,6 +39,11 @@ class MasterServiceStub(object):
                 request_serializer=image__processing__pb2.ProcessImageRequest.SerializeToString,
                 response_deserializer=image__processing__pb2.ProcessImageResponse.FromString,
                 _registered_method=True)
+        self.UploadImages = channel.stream_unary(
+                '/MasterService/UploadImages',
+                request_serializer=image__processing__pb2.ImageUploadChunk.SerializeToString,
+                response_deserializer=image__processing__pb2.ProcessImageResponse.FromString,
+                _registered_method=True)
         self.ReprocessImage = channel.unary_unary(
                 '/MasterService/ReprocessImage',
                 request_serializer=image__processing__pb2.ReprocessRequest.SerializeToString,
@@ -84,6 +89,11 @@ class MasterServiceStub(object):
                 request_serializer=image__processing__pb2.WorkerRegistration.SerializeToString,
                 response_deserializer=image__processing__pb2.RegistrationResponse.FromString,
                 _registered_method=True)
+        self.GetVMStatus = channel.unary_unary(
+                '/MasterService/GetVMStatus',
+                request_serializer=image__processing__pb2.VMStatusRequest.SerializeToString,
+                response_deserializer=image__processing__pb2.VMStatusResponse.FromString,
+                _registered_method=True)
 
 
 class MasterServiceServicer(object):
@@ -96,11 +106,15 @@ class MasterServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
-    def ReprocessImage(self, request, context):
-        """// Handles incoming image requests for remote images from a url
-        rpc ProcessRemoteImage (RemoteImageRequest) returns (ProcessImageResponse);
+    def UploadImages(self, request_iterator, context):
+        """Handles image requests whose images are streamed from the client in chunks
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
 
-        Handles incoming image reprocessing requests
+    def ReprocessImage(self, request, context):
+        """Handles incoming image reprocessing requests
         """
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
@@ -162,6 +176,13 @@ class MasterServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetVMStatus(self, request, context):
+        """RPC for Checking VM status for workers
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_MasterServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -170,6 +191,11 @@ def add_MasterServiceServicer_to_server(servicer, server):
                     request_deserializer=image__processing__pb2.ProcessImageRequest.FromString,
                     response_serializer=image__processing__pb2.ProcessImageResponse.SerializeToString,
             ),
+            'UploadImages': grpc.stream_unary_rpc_method_handler(
+                    servicer.UploadImages,
+                    request_deserializer=image__processing__pb2.ImageUploadChunk.FromString,
+                    response_serializer=image__processing__pb2.ProcessImageResponse.SerializeToString,
+            ),
             'ReprocessImage': grpc.unary_unary_rpc_method_handler(
                     servicer.ReprocessImage,
                     request_deserializer=image__processing__pb2.ReprocessRequest.FromString,
@@ -215,6 +241,11 @@ def add_MasterServiceServicer_to_server(servicer, server):
                     request_deserializer=image__processing__pb2.WorkerRegistration.FromString,
                     response_serializer=image__processing__pb2.RegistrationResponse.SerializeToString,
             ),
+            'GetVMStatus': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetVMStatus,
+                    request_deserializer=image__processing__pb2.VMStatusRequest.FromString,
+                    response_serializer=image__processing__pb2.VMStatusResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'MasterService', rpc_method_handlers)
@@ -253,6 +284,33 @@ class MasterService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def UploadImages(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/MasterService/UploadImages',
+            image__processing__pb2.ImageUploadChunk.SerializeToString,
+            image__processing__pb2.ProcessImageResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def ReprocessImage(request,
             target,
@@ -496,6 +554,33 @@ class MasterService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GetVMStatus(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/MasterService/GetVMStatus',
+            image__processing__pb2.VMStatusRequest.SerializeToString,
+            image__processing__pb2.VMStatusResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class WorkerServiceStub(object):
     """Missing associated documentation comment in .proto file."""
@@ -511,6 +596,11 @@ class WorkerServiceStub(object):
                 request_serializer=image__processing__pb2.ChunkRequest.SerializeToString,
                 response_deserializer=image__processing__pb2.ChunkResponse.FromString,
                 _registered_method=True)
+        self.ProcessBatch = channel.unary_unary(
+                '/WorkerService/ProcessBatch',
+                request_serializer=image__processing__pb2.BatchRequest.SerializeToString,
+                response_deserializer=image__processing__pb2.BatchResponse.FromString,
+                _registered_method=True)
         self.HealthCheck = channel.unary_unary(
                 '/WorkerService/HealthCheck',
                 request_serializer=image__processing__pb2.HealthRequest.SerializeToString,
@@ -528,6 +618,13 @@ class WorkerServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ProcessBatch(self, request, context):
+        """Processes several images in a single call
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def HealthCheck(self, request, context):
         """Health check for worker readiness
         """
@@ -543,6 +640,11 @@ def add_WorkerServiceServicer_to_server(servicer, server):
                     request_deserializer=image__processing__pb2.ChunkRequest.FromString,
                     response_serializer=image__processing__pb2.ChunkResponse.SerializeToString,
             ),
+            'ProcessBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.ProcessBatch,
+                    request_deserializer=image__processing__pb2.BatchRequest.FromString,
+                    response_serializer=image__processing__pb2.BatchResponse.SerializeToString,
+            ),
             'HealthCheck': grpc.unary_unary_rpc_method_handler(
                     servicer.HealthCheck,
                     request_deserializer=image__processing__pb2.HealthRequest.FromString,
@@ -586,6 +688,33 @@ class WorkerService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ProcessBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/WorkerService/ProcessBatch',
+            image__processing__pb2.BatchRequest.SerializeToString,
+            image__processing__pb2.BatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def HealthCheck(request,
             target,
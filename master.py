@@ -1,19 +1,27 @@
 import asyncio
-import os
 import time
 import grpc
 import json
 from uuid import uuid4
 import warnings
 
-from CloudServer.database_manager import database_handler, auth
+from CloudServer.database_manager import async_database_handler
+from CloudServer.database_manager.write_behind import ResultWriteBuffer
 from CloudServer.description_generator.description_generator import generate_descriptions
-from CloudServer.processImages.process_image import process_image
+from CloudServer.dispatch_manager.dispatcher import dispatch_images, get_model_workers
+from CloudServer.dispatch_manager.result_cache import model_fingerprint
+from CloudServer.image_store.content_store import image_store
+from CloudServer.processImages.image_payload import image_reference
+from CloudServer.processImages.process_image import abort_rejected, process_image, process_image_stream, queue_request, \
+    release_stored_images, remove_unreferenced_images
+from CloudServer.state_manager.admission_control import AdmissionRejected
 import image_processing_pb2
 import image_processing_pb2_grpc
 from CloudServer.virtualization.datacenter import Datacenter
 from CloudServer.virtualization.host import Host
-from CloudServer.worker_manager.scale_worker import scale_workers, monitor_workers
+from CloudServer.virtualization.placement import PlacementScheduler
+from CloudServer.worker_manager.autoscaler import Autoscaler
+from CloudServer.worker_manager.scale_worker import monitor_workers
 from CloudServer.state_manager.shared_request_state import SharedState
 from CloudServer.state_manager.shared_worker_state import SharedWorkerState
 from CloudServer.virtualization.virtual_machine import VirtualMachine
@@ -22,8 +30,11 @@ from CloudServer.virtualization.virtual_machine import VirtualMachine
 shared_request_state = SharedState()
 shared_worker_state = SharedWorkerState()
 
-# Define the directory for saving images
-IMAGE_STORAGE_DIR = os.path.join(os.getcwd(), "images")
+# Results and status updates are written to the database in batches
+result_write_buffer = ResultWriteBuffer()
+
+# Sizes the worker pools from the load recorded by the request path
+autoscaler = Autoscaler(shared_worker_state, shared_request_state.load_metrics)
 
 available_models = {
     "Yolov5s": {
@@ -41,15 +52,11 @@ class MasterServiceServicer(image_processing_pb2_grpc.MasterServiceServicer):
     def __init__(self):
         self.workers = {}
 
-    def ProcessImage(self, request, context):
-        # Run the async function in the event loop
-        return asyncio.run(self._process_image_async(request, context))
-
-    async def _process_image_async(self, request, context):
+    async def ProcessImage(self, request, context):
         user_credentials = request.user
 
         # Authenticate user before adding request to queue or processing
-        if not auth.authenticate_user(
+        if not await async_database_handler.authenticate_user(
                 user_credentials.username, user_credentials.email, user_credentials.password
         ):
             print("Authentication failed. Request denied.")
@@ -57,13 +64,32 @@ class MasterServiceServicer(image_processing_pb2_grpc.MasterServiceServicer):
 
         return await process_image(shared_request_state, request, context)
 
-    def ReprocessImage(self, request, context):
+    async def UploadImages(self, request_iterator, context):
+        # The first chunk carries the user credentials and request details
+        first_chunk = await anext(request_iterator, None)
+        if first_chunk is None:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("No images were uploaded.")
+            return image_processing_pb2.ProcessImageResponse()
+
+        user_credentials = first_chunk.user
+
+        # Authenticate user before storing any uploaded image
+        if not await async_database_handler.authenticate_user(
+                user_credentials.username, user_credentials.email, user_credentials.password
+        ):
+            print("Authentication failed. Request denied.")
+            return image_processing_pb2.ProcessImageResponse(request_id="Cannot authorize user")
+
+        return await process_image_stream(shared_request_state, first_chunk, request_iterator, context)
+
+    async def ReprocessImage(self, request, context):
         # Extract request details
         request_id = request.request_id
         user_credentials = request.user
 
         # Authenticate the user
-        if not auth.authenticate_user(
+        if not await async_database_handler.authenticate_user(
                 user_credentials.username, user_credentials.email, user_credentials.password
         ):
             return image_processing_pb2.ReprocessResultResponse(
@@ -73,43 +99,70 @@ class MasterServiceServicer(image_processing_pb2_grpc.MasterServiceServicer):
             )
 
         # Get Request from the database
-        saved_request = database_handler.get_request(request_id, user_credentials.email)
-
-        # Locate the image in the filesystem
-        # todo Update so that images are looked up based on the fact that their names contains the request_id
-        # todo This is because some request can have multiple images and the image name will be the (requestid_imageid.jpg)
-        raw_image_path = os.path.join(IMAGE_STORAGE_DIR, f"{request_id}.jpg")
-        image_path = os.path.normpath(raw_image_path)  # Normalize the path to handle extra slashes
-        if not os.path.exists(image_path):
+        saved_request = await async_database_handler.get_request(request_id, user_credentials.email)
+        if not saved_request:
             return image_processing_pb2.ReprocessResultResponse(
                 status="failed",
                 message=f"No existing request found with ID: {request_id}",
                 request_id=""
-
             )
 
-        # Read the image and convert it to bytes
+        # Look up the stored images of the original request. The new request refers to the same files, pinned
+        # until it is recorded for them so a concurrent deletion of the original cannot remove them
+        stored_images = await async_database_handler.get_request_images(request_id)
+        for _, digest, _ in stored_images:
+            image_store.pin(digest)
+        recorded = False
         try:
-            with open(image_path, "rb") as image_file:
-                image_data = image_file.read()
-        except Exception as e:
-            print(f"Failed to read image: {e}")
-            return image_processing_pb2.ReprocessResultResponse(
-                status="failed",
-                message="Error occurred while reading the stored image.",
-                request_id=""
-            )
+            processed_images = [
+                image_reference(image_id, digest, image_store.path_for(digest), size)
+                for image_id, digest, size in stored_images if image_store.exists(digest)
+            ]
+            if not processed_images:
+                return image_processing_pb2.ReprocessResultResponse(
+                    status="failed",
+                    message=f"No stored images found for request ID: {request_id}",
+                    request_id=""
+                )
+
+            model_name, action_type = saved_request
+            new_request_id = str(uuid4())  # Create a new request ID for tracking
+            try:
+                shared_request_state.admission.admit(
+                    user_credentials.email, sum(image["size"] for image in processed_images)
+                )
+            except AdmissionRejected as rejection:
+                await abort_rejected(context, rejection)
+
+            # The reservation is returned if the request cannot be recorded or queued
+            try:
+                await async_database_handler.add_request(
+                    new_request_id, user_credentials.email, model_name, action_type
+                )
+                await async_database_handler.add_request_images(
+                    new_request_id, [(image["id"], image["digest"], image["size"]) for image in processed_images]
+                )
+                recorded = True
+            except BaseException:
+                shared_request_state.admission.release(
+                    user_credentials.email, sum(image["size"] for image in processed_images)
+                )
+                raise
+        finally:
+            # If the original request was deleted meanwhile, images the new one was not recorded for are removed
+            await release_stored_images([digest for _, digest, _ in stored_images], recorded)
 
         # Add the reprocessing request to the queue
-        new_request_id = str(uuid4())  # Create a new request ID for tracking
-        with shared_request_state.state_lock:
-            shared_request_state.request_state[new_request_id] = {"status": "pending", "result": None}
-        shared_request_state.request_queue.put((new_request_id, image_data, user_credentials))
-
-        # Add the reprocess request to the database
-        database_handler.add_request(
-            new_request_id, user_credentials.email, saved_request.model_name, saved_request.action_type
-        )
+        try:
+            await queue_request(
+                shared_request_state, new_request_id, processed_images, model_name, action_type,
+                user_credentials.email, request.priority
+            )
+        except BaseException:
+            shared_request_state.admission.release(
+                user_credentials.email, sum(image["size"] for image in processed_images)
+            )
+            raise
         print(f"Reprocessing request {new_request_id} added to the queue.")
 
         return image_processing_pb2.ReprocessResultResponse(
@@ -118,12 +171,20 @@ class MasterServiceServicer(image_processing_pb2_grpc.MasterServiceServicer):
             request_id=new_request_id
         )
 
-    def QueryResult(self, request, context):
+    async def QueryResult(self, request, context):
         request_id = request.request_id
 
+        # Completed requests are answered from memory, which also covers results not yet flushed to the database
+        async with shared_request_state.state_lock:
+            request_state = shared_request_state.request_state.get(request_id)
+        if request_state and request_state["status"] == "completed":
+            return image_processing_pb2.ResultResponse(
+                status="completed", result_data=json.dumps(request_state["result"])
+            )
+
         # If not in memory, check the database
         try:
-            result = database_handler.get_result_by_request_id(request_id)
+            result = await async_database_handler.get_result_by_request_id(request_id)
             if result:
                 return image_processing_pb2.ResultResponse(status="completed", result_data=result)
             else:
@@ -133,10 +194,10 @@ class MasterServiceServicer(image_processing_pb2_grpc.MasterServiceServicer):
             return image_processing_pb2.ResultResponse(status="error",
                                                        result_data="An error occurred while fetching the result.")
 
-    def HealthCheck(self, request, context):
+    async def HealthCheck(self, request, context):
         return image_processing_pb2.HealthResponse(status="ready")
 
-    def GetAllUserRequest(self, request, context):
+    async def GetAllUserRequest(self, request, context):
         """
         Fetches all requests made by the user from the database and streams them back.
 
@@ -149,13 +210,13 @@ class MasterServiceServicer(image_processing_pb2_grpc.MasterServiceServicer):
         """
         try:
             # Validate user credentials
-            if not auth.authenticate_user(request.username, request.email, request.password):
+            if not await async_database_handler.authenticate_user(request.username, request.email, request.password):
                 context.set_code(grpc.StatusCode.UNAUTHENTICATED)
                 context.set_details("Invalid user credentials.")
                 return
 
             # Fetch user requests from the database
-            user_requests = database_handler.get_all_requests(request.email)
+            user_requests = await async_database_handler.get_all_requests(request.email)
 
             # Stream each request back to the client
             for user_request in user_requests:
@@ -169,7 +230,7 @@ class MasterServiceServicer(image_processing_pb2_grpc.MasterServiceServicer):
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(f"Failed to fetch user requests: {str(e)}")
 
-    def DeleteProcessingRequest(self, request, context):
+    async def DeleteProcessingRequest(self, request, context):
         """
         Deletes a request and all associated results from the database.
 
@@ -182,15 +243,15 @@ class MasterServiceServicer(image_processing_pb2_grpc.MasterServiceServicer):
         """
         try:
             # Validate user credentials
-            if not auth.authenticate_user(request.user.username, request.user.email, request.user.password):
+            if not await async_database_handler.authenticate_user(request.user.username, request.user.email, request.user.password):
                 context.set_code(grpc.StatusCode.UNAUTHENTICATED)
                 context.set_details("Invalid user credentials.")
                 return image_processing_pb2.ProcessImageResponse(request_id=request.request_id)
 
-            # Delete the request from the database
-            is_deleted = database_handler.delete_request(request.request_id, request.user.email)
-            print(f"is deleted: {is_deleted}")
-            if is_deleted:
+            # Delete the request from the database, then the stored images no other request refers to
+            digests = await async_database_handler.delete_request(request.request_id, request.user.email)
+            if digests is not None:
+                await remove_unreferenced_images(digests)
                 return image_processing_pb2.ProcessImageResponse(request_id=request.request_id)
             else:
                 context.set_code(grpc.StatusCode.NOT_FOUND)
@@ -201,7 +262,44 @@ class MasterServiceServicer(image_processing_pb2_grpc.MasterServiceServicer):
             context.set_details(f"Failed to delete the request: {str(e)}")
             return image_processing_pb2.ProcessImageResponse(request_id=request.request_id)
 
-    def GetModels(self, request, context):
+    async def RegisterWorker(self, request, context):
+        # Starting workers call this once their model is loaded, which ends the wait in start_worker
+        if shared_worker_state.mark_worker_ready(request.address):
+            print(f"Worker {request.worker_id} at {request.address} registered for {request.model_type}.")
+            if request.model_version:
+                # The version identifies the weights the worker loaded; results of other versions are stale
+                pool = shared_worker_state.get_pool(request.model_type, request.action_type)
+                pool.record_model_version(request.model_format, request.model_version, model_fingerprint(
+                    request.model_type, request.action_type, request.model_format
+                ))
+                shared_request_state.result_cache.set_version(
+                    request.model_type, request.model_format, request.action_type, request.model_version
+                )
+            return image_processing_pb2.RegistrationResponse(status="success", message="Worker registered.")
+        return image_processing_pb2.RegistrationResponse(
+            status="failure", message=f"No worker is being started at {request.address}."
+        )
+
+    async def GetWorkersByTag(self, request, context):
+        # The tag is the model name a worker registered with; its pools hold the matching workers
+        workers = []
+        with shared_worker_state.worker_lock:
+            pools = [pool for pool in shared_worker_state.worker_pools.values() if pool.model_name == request.tag]
+            for pool in pools:
+                for worker_address in pool.worker_addresses():
+                    info = shared_worker_state.worker_registry.get(worker_address)
+                    if info is None:
+                        continue
+                    workers.append(image_processing_pb2.WorkerInfo(
+                        worker_id=info["vm"].vm_id,
+                        address=worker_address,
+                        tag=pool.model_name,
+                        vm_id=info["vm"].vm_id,
+                        vm_status=info["vm"].health_check(),
+                    ))
+        return image_processing_pb2.WorkersResponse(workers=workers)
+
+    async def GetModels(self, request, context):
         for model_name, model_info in available_models.items():
             yield image_processing_pb2.ModelInfo(
                 model_name=model_name,
@@ -211,89 +309,127 @@ class MasterServiceServicer(image_processing_pb2_grpc.MasterServiceServicer):
 
 
 # Threads
-async def async_process_requests(shared_state, shared_worker_state):
-    while True:
-        try:
-            # Dequeue the next request
-            request_id, processed_images, model_requested, action_type, user_email = await asyncio.wait_for(
-                shared_state.request_queue.get(), timeout=10
-            )
-        except asyncio.TimeoutError:
-            continue
+async def handle_queued_request(shared_state, shared_worker_state, result_write_buffer, autoscaler, request):
+    request_id, processed_images, model_requested, action_type, user_email = request
+    print(f"Processing request {request_id}...")
+    shared_state.load_metrics.record_start(request_id)
+
+    # Images the model the pool serves has processed before are answered from the result cache. Until a worker
+    # has reported its model version, or when the next worker may load different weights, nothing is cached
+    result_cache = shared_state.result_cache
+    pool = shared_worker_state.get_pool(model_requested, action_type)
+    served = pool.served_model(model_fingerprint(model_requested, action_type, pool.model_format))
+    cached_results = [None] * len(processed_images)
+    if served is not None:
+        model_format, version = served
+        cached_results = await result_cache.get_many([
+            (image["digest"], model_requested, model_format, version, action_type) for image in processed_images
+        ])
+    # Results are keyed by the position of the image in the request, as clients may repeat image ids
+    results = {}
+    uncached_positions = []
+    for position, cached in enumerate(cached_results):
+        if cached is not None:
+            results[position] = cached
+        else:
+            uncached_positions.append(position)
+    uncached_images = [processed_images[position] for position in uncached_positions]
+
+    worker_count = 0
+    dispatch_started = time.monotonic()
+    if uncached_images:
+        # Nothing can serve this request until the first worker for its model has registered. The autoscaler
+        # sizes the pools on its own thread; it is only woken here so that a cold pool is started at once
+        deadline = time.monotonic() + shared_worker_state.WORKER_START_TIMEOUT
+        while not get_model_workers(shared_worker_state, model_requested, action_type) \
+                and time.monotonic() < deadline:
+            autoscaler.wake()
+            await asyncio.sleep(0.2)
+
+        # Fan the images out to all workers serving the requested model
+        worker_count = len(get_model_workers(shared_worker_state, model_requested, action_type))
+        dispatch_started = time.monotonic()
+        dispatched_results = await dispatch_images(
+            shared_worker_state, uncached_images, model_requested, action_type
+        )
+        # Each result is cached under the version of the worker that produced it, in the format the pool
+        # serves; results of a worker that registered with a different model than the pool's are not cached
+        model_format, version = pool.model_format, pool.model_version
+        for index, (result, served_version) in dispatched_results.items():
+            results[uncached_positions[index]] = result
+            if served_version and served_version == version:
+                result_cache.put(
+                    (uncached_images[index]["digest"], model_requested, model_format, version, action_type), result
+                )
+    shared_state.load_metrics.record_completion(
+        request_id, len(uncached_images), time.monotonic() - dispatch_started, worker_count
+    )
+    all_detections = [results[position] for position in sorted(results)]
 
-        print(f"Processing request {request_id}...")
+    # Ensure valid detections before generating descriptions
+    if not all_detections:
+        print(f"Warning: No detections were received for request {request_id}.")
+        descriptions = []
+    else:
+        descriptions = [generate_descriptions(json.dumps(det)) for det in all_detections]
 
-        # Determine required number of workers
-        required_workers = max(
-            shared_worker_state.MIN_WORKERS,
-            min(shared_worker_state.MAX_WORKERS, shared_state.request_queue.qsize()),
-        )
-        print(
-            f"Scaling workers. Current: {len(shared_worker_state.worker_registry)}, Required: {required_workers}"
-        )
-        scale_workers(shared_worker_state, required_workers, model_requested, action_type)
-
-        all_detections = []
-
-        for image_data in processed_images:
-            worker_count = 0
-            while (
-                worker_count < len(shared_worker_state.worker_registry)
-                and not shared_worker_state.available_workers.empty()
-            ):
-                worker_address = shared_worker_state.available_workers.get()
-                print(f"Assigning task to worker {worker_address}...")
-
-                try:
-                    with grpc.insecure_channel(worker_address) as channel:
-                        stub = image_processing_pb2_grpc.WorkerServiceStub(channel)
-                        response = stub.ProcessChunk(
-                            image_processing_pb2.ChunkRequest(
-                                chunk_data=image_data["image_bytes"], action_type=action_type
-                            )
-                        )
-                        print(f"Worker {worker_address} processed chunk successfully.")
-
-                        # Ensure response is treated as a string
-                        if isinstance(response.result, str):
-                            try:
-                                result_data = json.loads(response.result)  # Convert string to dictionary
-                                all_detections.append(result_data)
-                            except json.JSONDecodeError:
-                                print(f"Failed to parse JSON response from worker {worker_address}: {response.result}")
-                        else:
-                            print(f"Unexpected response format from worker {worker_address}: {response.result}")
-
-                        with shared_worker_state.worker_lock:
-                            shared_worker_state.worker_registry[worker_address]["last_active"] = time.time()
-                        shared_worker_state.available_workers.put(worker_address)
-                    worker_count += 1
-                except Exception as e:
-                    print(f"Worker {worker_address} failed: {e}")
-
-        # Ensure valid detections before generating descriptions
-        if not all_detections:
-            print(f"Warning: No detections were received for request {request_id}.")
-            descriptions = []
-        else:
-            descriptions = [generate_descriptions(json.dumps(det)) for det in all_detections]
+    # Queue the result for the database; the write-behind buffer commits it with others
+    result_write_buffer.add_result(request_id, json.dumps(descriptions), user_email)
+    result_write_buffer.update_request_status(request_id, "Success")
 
-        # Store result in the database
-        database_handler.add_result(request_id, json.dumps(descriptions), user_email)
-        database_handler.update_request_status(request_id, "Success")
+    async with shared_state.state_lock:
+        shared_state.request_state[request_id] = {"status": "completed", "result": descriptions}
 
-        async with shared_state.state_lock:
-            shared_state.request_state[request_id] = {"status": "completed", "result": descriptions}
+    print(f"Request {request_id} processed with {len(all_detections)} detections.")
 
-        print(f"Request {request_id} processed with {len(all_detections)} detections.")
-        shared_state.request_queue.task_done()
 
+async def async_process_requests(shared_state, shared_worker_state, result_write_buffer, autoscaler):
+    # Up to MAX_CONCURRENT_REQUESTS requests are dispatched at once; the fair scheduler decides whose request
+    # gets the next free slot and holds back users that are at their own concurrency cap
+    dispatch_slots = asyncio.Semaphore(shared_state.MAX_CONCURRENT_REQUESTS)
+    running_tasks = set()
 
-def process_requests():
+    async def run(request, user_email):
+        try:
+            await handle_queued_request(
+                shared_state, shared_worker_state, result_write_buffer, autoscaler, request
+            )
+        except Exception as e:
+            request_id = request[0]
+            print(f"Error processing request {request_id}: {e}")
+            async with shared_state.state_lock:
+                shared_state.request_state[request_id] = {"status": "failed", "error": str(e)}
+        finally:
+            # The request's images are no longer held, so its admission reservation is returned
+            shared_state.admission.release(user_email, sum(image["size"] for image in request[1]))
+            await shared_state.request_queue.complete(user_email)
+            dispatch_slots.release()
+
+    try:
+        while True:
+            await dispatch_slots.acquire()
+            # Dequeue the next request in fair-share order
+            request, user_email = await shared_state.request_queue.get()
+            task = asyncio.create_task(run(request, user_email))
+            running_tasks.add(task)
+            task.add_done_callback(running_tasks.discard)
+    finally:
+        for task in running_tasks:
+            task.cancel()
+        await asyncio.gather(*running_tasks, return_exceptions=True)
+
+
+async def process_requests():
+    # Runs on the master server's event loop, next to the servicer that fills the request queue
     print("process_requests function started...")
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(async_process_requests(shared_request_state, shared_worker_state))
+    result_write_buffer.start()
+    autoscaler.start()
+    try:
+        await async_process_requests(shared_request_state, shared_worker_state, result_write_buffer, autoscaler)
+    finally:
+        autoscaler.stop()
+        # Write out everything still buffered before the master shuts down
+        await result_write_buffer.close()
 
 
 def serve():
@@ -316,6 +452,14 @@ def serve():
     }
     shared_worker_state.available_workers.put(worker_host.host_id)
 
+    # Worker VMs are placed on the registered worker hosts by their declared CPU and RAM, so registering
+    # another worker host above adds capacity
+    shared_worker_state.placement_scheduler = PlacementScheduler(
+        datacenter,
+        policy=shared_worker_state.PLACEMENT_POLICY,
+        eligible=lambda host: shared_worker_state.worker_host_registry.get(host.host_id, {}).get("status") == "Healthy"
+    )
+
     # Initialize and start the Master VM within the master host
     master_vm = VirtualMachine("master", "master_vm", ram=16, cpu=4, storage=100)
     master_host.allocate_vm(master_vm)
@@ -1,3 +1,5 @@
+import argparse
+import os
 import sys
 import grpc
 import json
@@ -6,15 +8,31 @@ from concurrent import futures
 import torch
 import torchvision
 from torch.nn.functional import softmax
-from PIL import Image
-import io
 import time
 from torchvision.transforms import functional as f
 import torchvision.transforms as transforms
 
 import image_processing_pb2
 import image_processing_pb2_grpc
+from CloudServer.inference_engine.image_decoder import decode_image, scale_box, scale_detection
+from CloudServer.inference_engine.micro_batcher import MicroBatcher
+from CloudServer.inference_engine.quantization import quantize_dynamic_int8, select_quantized_engine
+from CloudServer.inference_engine.yolov5_torchscript import TorchScriptYoloV5
+from CloudServer.model_manager.model_manger import get_quantized_path, get_torchscript_path
+from CloudServer.model_manager.model_version import models_version
 from CloudServer.model_training.melanoma_model import create_model
+from CloudServer.worker_manager.thread_budget import physical_cores, thread_budget
+
+# Micro-batching: concurrent chunks are grouped into one forward pass of up to MAX_BATCH_SIZE images,
+# waiting at most MAX_BATCH_DELAY_MS for a batch to fill
+MAX_BATCH_SIZE = 8
+MAX_BATCH_DELAY_MS = 10
+
+# Sizes the models resize their input to; images are decoded at the nearest larger size the codec allows
+YOLO_INPUT_SIZE = (640, 640)
+MELANOMA_INPUT_SIZE = (256, 256)
+FASTER_RCNN_INPUT_SIZE = (800, 800)  # Faster R-CNN scales the shorter side of an image to 800
+RESNET_INPUT_SIZE = (224, 224)
 
 
 def detect_objects(self, request, context):
@@ -31,11 +49,10 @@ def detect_objects(self, request, context):
     try:
         # Load image from the received bytes
         image_data = request.chunk_data
-        image = Image.open(io.BytesIO(image_data))
+        image, scale = decode_image(image_data, YOLO_INPUT_SIZE)
 
-        # Use YOLOv5 to process the image
-        results = self.model(image)
-        detections = results.pandas().xyxy[0].to_dict(orient="records")
+        # Use YOLOv5 to process the image as part of a batch, reporting boxes in the original image's pixels
+        detections = [scale_detection(detection, scale) for detection in self.batcher.infer(image)]
 
         # Return results as JSON
         result_json = json.dumps(detections)
@@ -61,18 +78,14 @@ def detect_melanoma(self, request, context):
     try:
         # Load image from the received bytes
         image_data = request.chunk_data
-        image = Image.open(io.BytesIO(image_data))
+        image, _ = decode_image(image_data, MELANOMA_INPUT_SIZE)
 
         # Preprocess the image (resize, normalize, etc., as needed)
         image_tensor = preprocess_image_for_melanoma(image)
         print("Image tensor shape:", image_tensor.shape)
 
-        # Set the model to evaluation mode
-        # self.melanoma_model.eval()
-
-        # Perform inference
-        with torch.no_grad():
-            outputs = self.melanoma_model(image_tensor)
+        # Perform inference as part of a batch
+        outputs = self.batcher.infer(image_tensor)
 
         # Interpret the model's output
         diagnosis = interpret_melanoma_results(outputs)
@@ -99,11 +112,11 @@ def preprocess_image_for_melanoma(image):
         Preprocessed image suitable for melanoma model input (PyTorch Tensor).
     """
     preprocess = transforms.Compose([
-        transforms.Resize((256, 256)),  # Match the model's input size
+        transforms.Resize(MELANOMA_INPUT_SIZE),  # Match the model's input size
         transforms.ToTensor(),  # Convert to PyTorch Tensor
         transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])  # Normalize using ImageNet stats
     ])
-    return preprocess(image).unsqueeze(0)  # Add a batch dimension
+    return preprocess(image)  # The batch dimension is added when the batch is stacked
 
 
 def interpret_melanoma_results(results):
@@ -135,6 +148,46 @@ def interpret_melanoma_results(results):
     return diagnosis
 
 
+def run_yolo_batch(model, images):
+    """
+    Runs a batch of PIL images through YOLOv5.
+
+    Returns:
+        list: Detection records for each image, in input order.
+    """
+    if isinstance(model, TorchScriptYoloV5):
+        return model.detect(images)
+    results = model(images)
+    return [detections.to_dict(orient="records") for detections in results.pandas().xyxy]
+
+
+def run_melanoma_batch(model, image_tensors):
+    """
+    Runs a batch of preprocessed images through the melanoma classifier.
+
+    Returns:
+        list: Raw model outputs for each image, each with a batch dimension of one.
+    """
+    with torch.no_grad():
+        outputs = model(torch.stack(image_tensors))
+    return [output.unsqueeze(0) for output in outputs]
+
+
+def run_faster_rcnn_batch(model, image_tensors):
+    """
+    Runs a batch of image tensors through Faster R-CNN. The images may differ in size.
+
+    Returns:
+        list: Prediction dictionaries for each image, in input order.
+    """
+    with torch.no_grad():  # Disable gradient computation for inference
+        predictions = model(image_tensors)
+    # A scripted Faster R-CNN returns (losses, detections)
+    if isinstance(predictions, tuple):
+        predictions = predictions[1]
+    return predictions
+
+
 def detect_defect(self, request, context):
     """
     Identifies and classifies defects in manufactured products using Faster R-CNN.
@@ -147,23 +200,19 @@ def detect_defect(self, request, context):
         ChunkResponse with defect detection results.
     """
     try:
-        # Set model to evaluation mode
-        self.faster_rcnn.eval()
-
         # Load the image from the request
         image_data = request.chunk_data
-        image = Image.open(io.BytesIO(image_data)).convert("RGB")  # Ensure the image is RGB
-        image_tensor = f.to_tensor(image).unsqueeze(0)  # Add batch dimension
+        image, scale = decode_image(image_data, FASTER_RCNN_INPUT_SIZE)
+        image_tensor = f.to_tensor(image)
 
-        # Run the image through the model
-        with torch.no_grad():  # Disable gradient computation for inference
-            predictions = self.faster_rcnn(image_tensor)[0]
+        # Run the image through the model as part of a batch
+        predictions = self.batcher.infer(image_tensor)
 
         # Parse the predictions
         results = []
         for box, label, score in zip(predictions['boxes'], predictions['labels'], predictions['scores']):
             results.append({
-                'box': box.tolist(),
+                'box': scale_box(box.tolist(), scale),
                 'label': int(label),
                 'score': float(score)
             })
@@ -192,7 +241,7 @@ def detect_crop_disease(self, request, context):
     """
     try:
         image_data = request.chunk_data
-        image = Image.open(io.BytesIO(image_data))
+        image, _ = decode_image(image_data, RESNET_INPUT_SIZE)
         image_tensor = f.to_tensor(image).unsqueeze(0)
         # Add actual crop disease detection logic here
 
@@ -204,12 +253,149 @@ def detect_crop_disease(self, request, context):
         return image_processing_pb2.ChunkResponse(result="{}", worker_id=self.worker_id)
 
 
+def load_torchscript_models(action_type, model_path):
+    """
+    Loads the TorchScript artifacts exported by export_torchscript for an action type.
+    No hub or network lookups are made, and the frozen graphs skip the Python module code at inference.
+
+    Returns:
+        A dictionary mapping the WorkerServiceServicer attribute names to the loaded models, or None if no
+        artifact has been exported for the model.
+    """
+    torchscript_path = get_torchscript_path(action_type, model_path)
+    if not os.path.exists(torchscript_path):
+        print(f"No TorchScript artifact at {torchscript_path}; loading the eager model instead.")
+        return None
+
+    print(f"Loading TorchScript model from {torchscript_path}...")
+    if action_type == "detect_objects":
+        return {"model": TorchScriptYoloV5.load(torchscript_path)}
+
+    module = torch.jit.load(torchscript_path, map_location="cpu")
+    module.eval()
+    if action_type == "detect_melanoma":
+        return {"melanoma_model": module}
+    elif action_type == "detect_defect":
+        return {"faster_rcnn": module}
+    elif action_type == "detect_crop_disease":
+        return {"resnet": module}
+    else:
+        raise ValueError(f"Unknown action type: {action_type}")
+
+
+def load_quantized_models(action_type, model_path):
+    """
+    Loads the statically quantized int8 artifacts saved by quantization_report --save for an action type.
+
+    Returns:
+        A dictionary mapping the WorkerServiceServicer attribute names to the loaded models, or None if no
+        artifact has been saved for the model.
+    """
+    quantized_path = get_quantized_path(action_type, model_path)
+    if not os.path.exists(quantized_path):
+        print(f"No int8 artifact at {quantized_path}; loading the fp32 model instead.")
+        return None
+
+    # The quantized kernels must come from the engine the model was quantized for
+    select_quantized_engine()
+    print(f"Loading int8 model from {quantized_path}...")
+    module = torch.jit.load(quantized_path, map_location="cpu")
+    module.eval()
+    if action_type == "detect_melanoma":
+        return {"melanoma_model": module}
+    elif action_type == "detect_crop_disease":
+        return {"resnet": module}
+    else:
+        raise ValueError(f"No int8 model for action type: {action_type}")
+
+
+def load_models(action_type, model_path, model_format="eager"):
+    """
+    Loads the models a worker needs for an action type.
+
+    Args:
+        action_type: The action the worker performs.
+        model_path: Path to the YOLOv5 model or other models.
+        model_format: "eager" to build the models from their weights, "torchscript" to load the exported
+            TorchScript artifacts, "int8_dynamic" to quantize the Linear layers of the classifiers on load,
+            or "int8_static" to load the int8 artifacts of quantization_report. Models without the requested
+            variant fall back to eager.
+
+    Returns:
+        A dictionary mapping the WorkerServiceServicer attribute names to the loaded models.
+    """
+    if model_format == "torchscript":
+        models = load_torchscript_models(action_type, model_path)
+        if models is not None:
+            return models
+    elif model_format == "int8_static" and action_type in ("detect_melanoma", "detect_crop_disease"):
+        models = load_quantized_models(action_type, model_path)
+        if models is not None:
+            return models
+    elif model_format == "int8_dynamic" and action_type in ("detect_melanoma", "detect_crop_disease"):
+        models = load_eager_models(action_type, model_path)
+        print("Quantizing the Linear layers to int8...")
+        return {name: quantize_dynamic_int8(model) for name, model in models.items()}
+    elif model_format != "eager":
+        print(f"No {model_format} variant for {action_type}; loading the eager model instead.")
+
+    return load_eager_models(action_type, model_path)
+
+
+def load_eager_models(action_type, model_path):
+    """ Builds the models for an action type from their weights """
+    if action_type == "detect_objects":
+        print(f"Loading YOLOv5 model from {model_path}...")
+        return {"model": torch.hub.load('ultralytics/yolov5', 'custom', path=model_path)}
+    elif action_type == "detect_melanoma":
+        print(f"Loading melanoma model from {model_path}...")
+        # Create the model architecture with the correct number of classes (3)
+        melanoma_model = create_model(num_classes=3)
+        # Load the state dictionary
+        melanoma_model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
+        melanoma_model.eval()  # Set to evaluation mode
+        return {"melanoma_model": melanoma_model}
+    elif action_type == "detect_defect":
+        print("Loading Faster R-CNN model for defect detection...")
+        faster_rcnn = torchvision.models.detection.fasterrcnn_resnet50_fpn(pretrained=True)
+        faster_rcnn.eval()  # Set to evaluation mode
+        return {"faster_rcnn": faster_rcnn}
+    elif action_type == "detect_crop_disease":
+        print("Loading ResNet model for crop disease detection...")
+        return {"resnet": torchvision.models.resnet18(pretrained=True)}
+    else:
+        raise ValueError(f"Unknown action type: {action_type}")
+
+
+class BatchItemContext:
+    """
+    Collects the status a handler reports for a single image of a ProcessBatch call.
+    """
+
+    def __init__(self):
+        self.code = None
+        self.details = ""
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+    def error(self):
+        """ Returns the reported error details, or an empty string if the image was processed """
+        if self.code is None or self.code == grpc.StatusCode.OK:
+            return ""
+        return self.details or str(self.code)
+
+
 class WorkerServiceServicer(image_processing_pb2_grpc.WorkerServiceServicer):
     """
     Implements the WorkerService, handling image processing tasks and providing health checks.
     """
 
-    def __init__(self, worker_id, master_address, action_type, model_path):
+    def __init__(self, worker_id, master_address, action_type, model_path, max_batch_size=MAX_BATCH_SIZE,
+                 max_batch_delay_ms=MAX_BATCH_DELAY_MS, models=None, model_format="eager", model_version=None):
         """
         Initialize the worker and load models as required.
 
@@ -217,31 +403,43 @@ class WorkerServiceServicer(image_processing_pb2_grpc.WorkerServiceServicer):
             worker_id: Unique identifier for the worker.
             master_address: Address of the master service.
             model_path: Path to the YOLOv5 model or other models.
+            max_batch_size: Maximum number of images per batched forward pass.
+            max_batch_delay_ms: Maximum time an image waits for its batch to fill.
+            models: Already loaded models as returned by load_models, or None to load them here.
+            model_format: "eager", "torchscript", "int8_dynamic" or "int8_static", see load_models.
+            model_version: Version of the preloaded models as returned by models_version, or None to compute it.
         """
         self.worker_id = worker_id
         self.master_address = master_address
         self.model_path = model_path
+        self.model_format = model_format
+        self.model_version = ""
+        # Images of a ProcessBatch call are handled concurrently so that they reach the micro-batcher together
+        self.batch_executor = futures.ThreadPoolExecutor(max_workers=max_batch_size)
         print(f"Initializing Worker {worker_id}...")
 
         try:
+            # Models preloaded by a fork server are shared with it copy-on-write instead of being loaded again
+            if models is None:
+                models = load_models(action_type, model_path, model_format)
+            for name, model in models.items():
+                setattr(self, name, model)
+            # Results are tagged with the version of the weights that produced them, for the master's result cache
+            self.model_version = model_version if model_version is not None else models_version(models)
+
             if action_type == "detect_objects":
-                print(f"Loading YOLOv5 model from {model_path}...")
-                self.model = torch.hub.load('ultralytics/yolov5', 'custom', path=model_path)
+                batch_fn = lambda images: run_yolo_batch(self.model, images)
             elif action_type == "detect_melanoma":
-                print(f"Loading melanoma model from {model_path}...")
-                # Create the model architecture with the correct number of classes (3)
-                self.melanoma_model = create_model(num_classes=3)
-                # Load the state dictionary
-                self.melanoma_model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
-                self.melanoma_model.eval()  # Set to evaluation mode
+                batch_fn = lambda image_tensors: run_melanoma_batch(self.melanoma_model, image_tensors)
             elif action_type == "detect_defect":
-                print("Loading Faster R-CNN model for defect detection...")
-                self.faster_rcnn = torchvision.models.detection.fasterrcnn_resnet50_fpn(pretrained=True)
-            elif action_type == "detect_crop_disease":
-                print("Loading ResNet model for crop disease detection...")
-                self.resnet = torchvision.models.resnet18(pretrained=True)
+                batch_fn = lambda image_tensors: run_faster_rcnn_batch(self.faster_rcnn, image_tensors)
             else:
-                raise ValueError(f"Unknown action type: {action_type}")
+                batch_fn = None
+
+            # Concurrent chunks share one forward pass through the loaded model
+            self.batcher = MicroBatcher(
+                batch_fn, max_batch_size, max_batch_delay_ms, name=f"{worker_id}-batcher"
+            ) if batch_fn else None
 
             print(f"Worker {worker_id} initialized with model for action type: {action_type}.")
         except Exception as e:
@@ -276,6 +474,32 @@ class WorkerServiceServicer(image_processing_pb2_grpc.WorkerServiceServicer):
             context.set_code(grpc.StatusCode.INTERNAL)
             return image_processing_pb2.ChunkResponse(result="{}", worker_id=self.worker_id)
 
+    def ProcessBatch(self, request, context):
+        """
+        Processes several images of the same action type in a single call.
+
+        Args:
+            request: BatchRequest containing the images and their ids.
+            context: gRPC context.
+
+        Returns:
+            BatchResponse with one result per image, in request order. Images that failed carry an error.
+        """
+        def process_item(item):
+            item_context = BatchItemContext()
+            response = self.ProcessChunk(
+                image_processing_pb2.ChunkRequest(chunk_data=item.chunk_data, action_type=request.action_type),
+                item_context
+            )
+            return image_processing_pb2.BatchItemResult(
+                image_id=item.image_id, result=response.result, error=item_context.error()
+            )
+
+        results = list(self.batch_executor.map(process_item, request.items))
+        return image_processing_pb2.BatchResponse(
+            results=results, worker_id=self.worker_id, model_version=self.model_version
+        )
+
     def HealthCheck(self, request, context):
         """
         Responds to health check requests.
@@ -290,7 +514,56 @@ class WorkerServiceServicer(image_processing_pb2_grpc.WorkerServiceServicer):
         return image_processing_pb2.HealthResponse(status="ready")
 
 
-def serve(worker_port, worker_id, master_address, action_type, model_path):
+def register_with_master(master_address, worker_id, worker_address, model_name, action_type, model_format="",
+                         model_version="", attempts=5):
+    """
+    Tells the master that this worker has loaded its model and is serving requests, and which version of the
+    model it serves.
+
+    Returns:
+        True if the master accepted the registration, False otherwise.
+    """
+    registration = image_processing_pb2.WorkerRegistration(
+        worker_id=worker_id, tag=model_name, address=worker_address, model_type=model_name, action_type=action_type,
+        model_format=model_format, model_version=model_version
+    )
+    for attempt in range(attempts):
+        try:
+            with grpc.insecure_channel(master_address) as channel:
+                stub = image_processing_pb2_grpc.MasterServiceStub(channel)
+                response = stub.RegisterWorker(registration, timeout=5)
+            print(f"Worker {worker_id} registered with master: {response.status} {response.message}")
+            return response.status == "success"
+        except grpc.RpcError as e:
+            print(f"Worker {worker_id} failed to register with master (attempt {attempt + 1}): {e}")
+            time.sleep(1)
+    return False
+
+
+def apply_thread_budget(cpu, cores=None):
+    """
+    Sizes torch's thread pools to the worker VM's cpu and pins the process to the VM's cores.
+
+    Returns:
+        dict: The thread budget, see thread_budget.
+    """
+    budget = thread_budget(cpu)
+    cpus = physical_cores(cores)
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(budget["intra_op"])
+    try:
+        torch.set_num_interop_threads(budget["inter_op"])
+    except RuntimeError as e:
+        # Only possible before any inter-op work has run, which a fork server may already have done
+        print(f"Keeping the inter-op thread count of {torch.get_num_interop_threads()}: {e}")
+    print(f"Using {budget['intra_op']} intra-op, {budget['inter_op']} inter-op and {budget['grpc']} gRPC threads"
+          f"{f' on CPUs {sorted(cpus)}' if cpus else ''}.")
+    return budget
+
+
+def serve(worker_port, worker_id, master_address, action_type, model_path, model_name="", models=None,
+          model_format="eager", cpu=None, cores=None, model_version=None):
     """
     Starts the gRPC server for the worker.
 
@@ -299,17 +572,42 @@ def serve(worker_port, worker_id, master_address, action_type, model_path):
         worker_id: Unique identifier for the worker.
         master_address: Address of the master service.
         model_path: Path to the YOLOv5 model.
+        model_name: Name of the model, reported to the master on registration.
+        models: Already loaded models as returned by load_models, or None to load them.
+        model_format: "eager", "torchscript", "int8_dynamic" or "int8_static", see load_models.
+        cpu: CPU cores of the worker's VM, which the thread pools are sized to. None keeps torch's defaults.
+        cores: Host cores reserved for the worker's VM, which the process is pinned to.
+        model_version: Version of the preloaded models, computed once by the fork server, or None to compute it.
     """
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-    image_processing_pb2_grpc.add_WorkerServiceServicer_to_server(
-        WorkerServiceServicer(worker_id, master_address, action_type, model_path), server
+    grpc_threads = 10
+    if cpu:
+        grpc_threads = apply_thread_budget(cpu, cores)["grpc"]
+
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=grpc_threads),
+        options=[
+            # Accept the keepalive pings the master sends on its pooled idle channels
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.min_ping_interval_without_data_ms", 10000),
+        ],
+    )
+    servicer = WorkerServiceServicer(
+        worker_id, master_address, action_type, model_path, models=models, model_format=model_format,
+        model_version=model_version
     )
+    image_processing_pb2_grpc.add_WorkerServiceServicer_to_server(servicer, server)
 
     server_address = f"[::]:{worker_port}"
     server.add_insecure_port(server_address)
     print(f"Worker {worker_id} started at {server_address}")
     server.start()
 
+    # Readiness is signalled to the master instead of the master polling for it
+    register_with_master(
+        master_address, worker_id, f"localhost:{worker_port}", model_name, action_type, model_format,
+        servicer.model_version
+    )
+
     try:
         while True:
             time.sleep(86400)
@@ -319,13 +617,19 @@ def serve(worker_port, worker_id, master_address, action_type, model_path):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 5:
-        print("Usage: python worker.py <port> <worker_id> <master_address> <model_path>")
-        sys.exit(1)
-
-    port = int(sys.argv[1])
-    worker_id = sys.argv[2]
-    master_address = sys.argv[3]
-    action_type = sys.argv[4]
-    model_path = sys.argv[5]
-    serve(port, worker_id, master_address, action_type, model_path)
+    parser = argparse.ArgumentParser(description="Run an image processing worker.")
+    parser.add_argument("port", type=int, help="Port the worker listens on")
+    parser.add_argument("worker_id", help="Unique identifier of the worker")
+    parser.add_argument("master_address", help="Address of the master service")
+    parser.add_argument("action_type", help="Action the worker performs")
+    parser.add_argument("model_path", help="Path to the YOLOv5 model or other models")
+    parser.add_argument("model_name", nargs="?", default="", help="Model name reported to the master")
+    parser.add_argument("model_format", nargs="?", default="eager",
+                        help="eager, torchscript, int8_dynamic or int8_static")
+    parser.add_argument("--cpu", type=int, help="CPU cores of the worker's VM, used to size the thread pools")
+    parser.add_argument("--cores", type=lambda value: [int(core) for core in value.split(",") if core],
+                        help="Comma-separated host cores to pin the worker to")
+    args = parser.parse_args()
+
+    serve(args.port, args.worker_id, args.master_address, args.action_type, args.model_path, args.model_name,
+          model_format=args.model_format, cpu=args.cpu, cores=args.cores)